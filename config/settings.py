@@ -13,7 +13,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+import json
 import os
+import sys
+import tempfile
 import dj_database_url
 
 load_dotenv()
@@ -34,6 +37,8 @@ SECRET_KEY = os.environ.get('SECRET_KEY', default='your secret key')
 
 DEBUG = 'RENDER' not in os.environ
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = []
 
 RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
@@ -73,9 +78,14 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'core.middleware.RequestIdMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     "django.middleware.security.SecurityMiddleware",
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.CompressionMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
+    'core.middleware.DatabaseRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -118,6 +128,104 @@ DATABASES = {
     )
 }
 
+# Réplicas de solo lectura (DATABASE_REPLICA_URLS separadas por coma)
+# Los tests corren siempre contra primaria + una réplica sqlite local
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+    if url.strip()
+]
+if TESTING:
+    DATABASE_REPLICA_URLS = ['sqlite:///' + str(BASE_DIR / 'replica.sqlite3')]
+
+DATABASE_REPLICAS = []
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=600)
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Tras una escritura, el cliente lee de la primaria durante estos segundos
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_COOKIE = 'db_primary_pin'
+
+
+# Cache
+# Por defecto en archivos: la versión del menú y los payloads cacheados se
+# comparten entre los workers de gunicorn sin servicios externos
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'delivery-ihc-cache')),
+    }
+}
+if TESTING:
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+# Compresión br/gzip de respuestas (core.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+
+# Publicar automáticamente el menú en cada cambio del staff (como antes de
+# las versiones). False = los cambios quedan en borrador hasta publicar desde
+# el admin (Versiones del menú) o POST /api/menu/versions/publish/
+MENU_AUTO_PUBLISH = os.getenv('MENU_AUTO_PUBLISH', 'True') == 'True'
+
+# Las ventas/cancelaciones que cambian la disponibilidad por stock se
+# publican juntas en una sola versión del menú pasados estos segundos
+MENU_AVAILABILITY_PUBLISH_DELAY = float(os.getenv('MENU_AVAILABILITY_PUBLISH_DELAY', 0 if TESTING else 5))
+
+# Segundos que la cache guarda la copia de la versión vigente del menú
+# (la fuente de verdad es la fila MenuState en la BD)
+MENU_STATE_TTL = int(os.getenv('MENU_STATE_TTL', 5))
+
+# Snapshot compilado del menú, mapeado en memoria por todos los workers
+# (vacío = snapshot por proceso)
+MENU_SNAPSHOT_DIR = os.getenv('MENU_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'delivery-ihc-menu'))
+if TESTING:
+    MENU_SNAPSHOT_DIR = os.path.join(tempfile.gettempdir(), 'delivery-ihc-menu-test')
+
+# Búsqueda del menú: 'memory' (índice sobre el snapshot) o 'database' (FTS de PostgreSQL)
+MENU_SEARCH_BACKEND = os.getenv('MENU_SEARCH_BACKEND', 'memory')
+MENU_SEARCH_MAX_RESULTS = int(os.getenv('MENU_SEARCH_MAX_RESULTS', 100))
+
+# Destacados: 'manual' (is_featured) o 'popular' (más vendidos con decaimiento)
+FEATURED_RANKING = os.getenv('FEATURED_RANKING', 'manual')
+POPULARITY_TOP_K = int(os.getenv('POPULARITY_TOP_K', 10))
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv('POPULARITY_HALF_LIFE_DAYS', 7))
+# Cada cuántos segundos se vuelcan a la BD las ventas acumuladas (0 = inmediato)
+POPULARITY_FLUSH_INTERVAL = float(os.getenv('POPULARITY_FLUSH_INTERVAL', 0 if TESTING else 60))
+
+# "Se compran juntos": vecinos por producto y mínimo de pedidos compartidos
+RECOMMENDATIONS_TOP_N = int(os.getenv('RECOMMENDATIONS_TOP_N', 10))
+RECOMMENDATIONS_MIN_SUPPORT = int(os.getenv('RECOMMENDATIONS_MIN_SUPPORT', 2))
+
+# Miniaturas de productos: de dónde se descargan los originales y dónde se guardan
+# (IMAGE_FETCHER='menu.images.LocalFileFetcher' lee de IMAGE_FETCHER_ROOT)
+IMAGE_FETCHER = os.getenv('IMAGE_FETCHER', 'menu.images.HttpImageFetcher')
+IMAGE_FETCHER_ROOT = os.getenv('IMAGE_FETCHER_ROOT', os.path.join(BASE_DIR, 'media', 'originals'))
+THUMBNAIL_ROOT = os.getenv('THUMBNAIL_ROOT', os.path.join(BASE_DIR, 'media', 'thumbs'))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+# Encolar automáticamente las imágenes que aún no tienen miniaturas
+THUMBNAIL_AUTO_ENQUEUE = os.getenv('THUMBNAIL_AUTO_ENQUEUE', 'True') == 'True' and not TESTING
+
+# QR de pago: cache en disco direccionado por contenido (sin directorio en tests)
+# y cantidad de imágenes en el LRU en memoria de cada proceso
+QR_CACHE_ROOT = None if TESTING else os.getenv('QR_CACHE_ROOT', os.path.join(BASE_DIR, 'media', 'qr-cache'))
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', 256))
+
+# Webhook del banco: secreto compartido para la firma HMAC (sin secreto el
+# endpoint no existe) y antigüedad máxima aceptada de la firma, en segundos
+PAYMENT_WEBHOOK_SECRET = os.getenv('PAYMENT_WEBHOOK_SECRET', '')
+PAYMENT_WEBHOOK_TOLERANCE = int(os.getenv('PAYMENT_WEBHOOK_TOLERANCE', 300))
+# POST /api/payments/{id}/confirm/ (pago simulado, sin banco): activo hasta
+# configurar el webhook real (PAYMENT_WEBHOOK_SECRET), que lo desactiva.
+# PAYMENT_SIMULATION=False lo apaga también sin webhook
+PAYMENT_SIMULATION = os.getenv('PAYMENT_SIMULATION', 'True') == 'True'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -170,22 +278,54 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-
+    # Los tokens llevan el hash de la contraseña: cambiarla los revoca (core.auth)
+    'CHECK_REVOKE_TOKEN': True,
 }
+# Segundos que el usuario de un JWT queda en cache (se invalida al guardarlo)
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', 60))
 
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_BOT_SECRET = os.getenv('BOT_SECRET')  # o el nombre que uses
+# Vigencia del initData de la Mini App (segundos desde auth_date; 0 = sin vencimiento)
+TELEGRAM_INIT_DATA_MAX_AGE = int(os.getenv('TELEGRAM_INIT_DATA_MAX_AGE', 24 * 3600))
+# Cache en memoria de sesiones validadas y usuarios (por worker)
+TELEGRAM_AUTH_CACHE_TTL = int(os.getenv('TELEGRAM_AUTH_CACHE_TTL', 300))
+TELEGRAM_AUTH_CACHE_SIZE = int(os.getenv('TELEGRAM_AUTH_CACHE_SIZE', 10000))
+# Cada cuántos segundos se guardan los cambios de perfil de Telegram (0 = inmediato)
+TELEGRAM_PROFILE_FLUSH_INTERVAL = float(os.getenv('TELEGRAM_PROFILE_FLUSH_INTERVAL', 0 if TESTING else 30))
 API_URL = os.getenv('API_URL')
 
+# Vigencia (segundos) del token de cotización del carrito
+ORDER_QUOTE_TTL = int(os.getenv('ORDER_QUOTE_TTL', 300))
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "core.auth.TelegramHeaderAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.auth.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # orjson si está instalado; si no, el JSON de DRF
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    # Token bucket por scope (core.throttling): capacidad/período
+    "DEFAULT_THROTTLE_RATES": {
+        "login": os.getenv('THROTTLE_LOGIN', '10/min'),
+        "register": os.getenv('THROTTLE_REGISTER', '5/min'),
+        # El bot llama desde una sola IP: el límite fino es por id de Telegram
+        "telegram_auth": os.getenv('THROTTLE_TELEGRAM_AUTH', '20/min'),
+        "telegram_auth_ip": os.getenv('THROTTLE_TELEGRAM_AUTH_IP', '600/min'),
+        "order_create": os.getenv('THROTTLE_ORDER_CREATE', '10/min'),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
@@ -216,10 +356,63 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'x-telegram-init-data',  
+    'x-request-id',
 ]
 
+CORS_EXPOSE_HEADERS = ['x-request-id']
+
 
 X_FRAME_OPTIONS = 'ALLOW-FROM https://web.telegram.org'
 
 
 
+
+
+# Perfil por request con Server-Timing (ver core.profiling); apagado por defecto
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+# Fracción de requests perfilados (X-Profile: 1 fuerza el perfil)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+# Requests más lentos que se guardan por endpoint
+PROFILING_SLOW_TOP_N = int(os.getenv('PROFILING_SLOW_TOP_N', 10))
+
+# Métricas Prometheus en /admin/metrics/ (ver core.metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# Un archivo por proceso; sin directorio (tests) las métricas quedan en memoria
+METRICS_DIR = None if TESTING else os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'delivery-ihc-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# Token para el scraper de Prometheus (además del acceso de staff)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Logging estructurado (ver core.log): JSON a stderr desde un thread aparte.
+# Los mensajes de depuración del flujo de pedidos son DEBUG: apagados en producción
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING' if TESTING else 'DEBUG' if DEBUG else 'INFO')
+# Fracción de registros (< WARNING) que se conserva por logger, ej. {'orders': 0.1}
+LOG_SAMPLING = json.loads(os.getenv('LOG_SAMPLING', '{}'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'core.log.RequestIdFilter'},
+        'sampling': {'()': 'core.log.SamplingFilter', 'rates': LOG_SAMPLING},
+    },
+    'formatters': {
+        'json': {'()': 'core.log.JsonFormatter'},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'core.log.QueueHandler',
+            'stream': 'ext://sys.stderr',
+            'formatter': 'json',
+            'filters': ['request_id', 'sampling'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'level': os.getenv('DJANGO_LOG_LEVEL', 'ERROR' if TESTING else 'INFO')},
+        'core': {'level': LOG_LEVEL},
+        'menu': {'level': LOG_LEVEL},
+        'orders': {'level': LOG_LEVEL},
+        'payments': {'level': LOG_LEVEL},
+    },
+}
@@ -1,8 +1,15 @@
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from core.views import metrics_view, slow_requests
+from menu.views import product_thumbnail
+from payments.views import payment_qr
 
 urlpatterns = [
+    # Requests más lentos (staff, con PROFILING_ENABLED)
+    path('admin/profiling/slow/', slow_requests, name='profiling-slow'),
+    # Métricas Prometheus (staff o METRICS_TOKEN)
+    path('admin/metrics/', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
 
     # Users
@@ -12,6 +19,11 @@ urlpatterns = [
     path('api/orders/', include('orders.urls')),
     path('api/', include('payments.urls')),
 
+    # Miniaturas de productos (públicas, cacheables por un año)
+    path('media/thumbs/<str:key>/<str:size>.<str:fmt>', product_thumbnail, name='product-thumbnail'),
+    # QR de pago por referencia (se generan al pedirlos, cacheables por un año)
+    path('media/qr/<str:reference>.<str:fmt>', payment_qr, name='payment-qr'),
+
     # Swagger
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -5,12 +5,29 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
+
+create_app() deja todo importado antes del fork de gunicorn --preload
+(los workers comparten esas páginas de memoria y arrancan sin importar
+nada) y sin conexiones abiertas que los workers hereden.
 """
 
 import os
 
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_wsgi_application()
+def create_app():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    app = get_wsgi_application()
+
+    from django.db import connections
+    from django.urls import get_resolver
+
+    # Resolver las URLs importa todas las vistas (y sus serializers)
+    get_resolver().url_patterns
+    # Una conexión abierta en el master quedaría compartida entre workers
+    connections.close_all()
+    return app
+
+
+application = create_app()
@@ -2,9 +2,10 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from .models import User
+from .routers import ReplicaChangeListMixin
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ReplicaChangeListMixin, BaseUserAdmin):
     ordering = ("email",)
     list_display = ("email", "role", "is_active", "is_staff")
     list_filter = ("role", "is_active", "is_staff")
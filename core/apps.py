@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from . import routers  # noqa: F401  (señales de read-after-write)
+        from . import telegram, user_cache  # noqa: F401  (invalidan usuarios cacheados)
+        from . import metrics  # noqa: F401  (cuenta transiciones de pedidos y pagos)
@@ -1,80 +1,80 @@
 # delivery-ihc/core/auth.py
 import logging
 from django.conf import settings
-from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
 from rest_framework import authentication, exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
-from core.middleware import validate_telegram_webapp_data  # ajusta el import si es otra ruta
+from core import profiling, telegram
+from core.metrics import cache_lookup
+from core.user_cache import user_cache_key
 
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 class TelegramHeaderAuthentication(authentication.BaseAuthentication):
     """
     Authenticate requests that include the X-Telegram-Init-Data header.
     If present and valid, returns (user, None). Otherwise returns None
     so DRF falls back to the next authentication class.
+
+    Reuses the result of TelegramWebAppAuthMiddleware when it already ran
+    for this request (single validation, see core.telegram).
     """
     def authenticate(self, request):
-        init_data = request.META.get("HTTP_X_TELEGRAM_INIT_DATA")
-        if not init_data:
-            return None
-
-        bot_token = getattr(settings, "TELEGRAM_BOT_TOKEN", None)
-        if not bot_token:
-            logger.warning("TelegramHeaderAuthentication: TELEGRAM_BOT_TOKEN not set")
+        if not request.META.get("HTTP_X_TELEGRAM_INIT_DATA"):
             return None
 
-        validated = validate_telegram_webapp_data(init_data, bot_token)
-        if not validated:
+        result = telegram.authenticate_request(request)
+        if result is None:
             raise exceptions.AuthenticationFailed("Invalid Telegram init data")
 
-        # validated is expected to be a dict with keys: id, first_name, last_name, username, language_code
-        tg_id = validated.get("id")
-        if not tg_id:
-            raise exceptions.AuthenticationFailed("Telegram user id not found in init data")
+        user, data = result
+        logger.debug("Authenticated via TelegramHeaderAuthentication: tg_%s", data["id"])
+        return (user, None)
 
-        tg_username = validated.get("username", "") or ""
-        first_name = validated.get("first_name", "") or ""
-        last_name = validated.get("last_name", "") or ""
 
-        # Use telegram_chat_id as the unique identifier in local User model
-        try:
-            user, created = User.objects.get_or_create(
-                telegram_chat_id=str(tg_id),
-                defaults={
-                    "telegram_username": tg_username,
-                    "first_name": first_name,
-                    "last_name": last_name,
-                    "email": f"telegram_{tg_id}@temp.com",
-                    "role": "CUSTOMER",
-                    "is_telegram_verified": True,
-                },
-            )
-            if not created:
-                # keep user data in sync if desired (optional)
-                updated = False
-                if user.telegram_username != tg_username:
-                    user.telegram_username = tg_username
-                    updated = True
-                if user.first_name != first_name:
-                    user.first_name = first_name
-                    updated = True
-                if user.last_name != last_name:
-                    user.last_name = last_name
-                    updated = True
-                if updated:
-                    user.save()
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user from the cache (JWT_USER_CACHE_TTL)
+    instead of loading the row on every request.
 
-        except Exception as exc:
-            logger.exception("Error getting/creating user for Telegram id %s: %s", tg_id, exc)
-            raise exceptions.AuthenticationFailed("Internal error during Telegram auth")
+    The cached user is checked like a fresh one on every request: inactive
+    users and tokens whose password-hash claim (token version, always issued
+    since SIMPLE_JWT sets CHECK_REVOKE_TOKEN) no longer matches are rejected.
+    The cache key is the user id alone so that saving or deleting the user
+    drops the single entry (core.user_cache); a password change therefore
+    reloads the user and the old tokens fail the claim check.
+    """
+    def authenticate(self, request):
+        with profiling.span("auth"):
+            return super().authenticate(request)
 
-        # Ensure DRF/get_user cache reflects this user
+    def get_user(self, validated_token):
         try:
-            request._cached_user = user  # some code uses this cache
-        except Exception:
-            setattr(request, "_cached_user", user)
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        key = user_cache_key(user_id)
+        user = cache_lookup("jwt_user", cache.get(key))
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            cache.set(key, user, settings.JWT_USER_CACHE_TTL)
+
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+
+        return user
 
-        logger.debug("[DEBUG-AUTH] Authenticated via TelegramHeaderAuthentication: tg_%s", tg_id)
-        return (user, None)
\ No newline at end of file
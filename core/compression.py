@@ -0,0 +1,104 @@
+# core/compression.py
+"""
+Compresión br/gzip de respuestas
+
+- negotiate: elige br o gzip según Accept-Encoding (respetando q=0)
+- compress: comprime un cuerpo completo
+- compress_stream / compress_async_stream: comprimen un StreamingHttpResponse
+  chunk por chunk sin cargarlo entero en memoria
+"""
+
+import gzip
+import zlib
+
+import brotli
+from django.conf import settings
+
+# Preferencia cuando el cliente acepta ambas con el mismo q
+ENCODINGS = ('br', 'gzip')
+# Tipos que vale la pena comprimir (imágenes y zips ya vienen comprimidos)
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+
+def negotiate(accept_encoding):
+    """'gzip, deflate, br;q=0.9' → 'gzip' | 'br' | None"""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith('+json')
+
+
+def compress(content, encoding, quality=None):
+    """
+    Comprimir un cuerpo completo; quality alto solo para contenido que se
+    comprime una vez y se reutiliza (payloads cacheados)
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=quality or settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0: mismo contenido → mismos bytes (sirve para cachear y comparar)
+    return gzip.compress(content, compresslevel=quality or settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class _Compressor:
+    """Compresor incremental con la misma interfaz para br y gzip"""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def chunk(self, data):
+        # flush por chunk: un stream (SSE, export largo) no queda retenido en el compresor
+        return self._compress(data) + self._flush()
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_stream(chunks, encoding):
+    compressor = _Compressor(encoding)
+    for data in chunks:
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    compressor = _Compressor(encoding)
+    async for data in chunks:
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
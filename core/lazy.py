@@ -0,0 +1,27 @@
+# core/lazy.py
+"""
+Importación diferida de módulos pesados y opcionales
+
+    np = lazy_import('numpy')
+
+devuelve el módulo sin ejecutarlo; se importa de verdad en el primer acceso
+a un atributo (np.array). Así numpy o qrcode no se cargan al arrancar cada
+worker o comando, solo en el código que los usa.
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,190 @@
+# core/log.py
+"""
+Logging estructurado y sin bloquear el request
+
+- RequestIdMiddleware (core.middleware) fija un id por request; cada registro
+  lo lleva (RequestIdFilter)
+- SamplingFilter deja pasar solo una fracción de los registros de ciertos
+  loggers (LOG_SAMPLING); WARNING o más siempre pasa
+- QueueHandler solo encola: el formateo a JSON y la escritura a stderr los
+  hace un thread aparte. Si la cola se llena, el registro se descarta
+- JsonFormatter escribe una línea JSON por registro con los campos de
+  `extra`, ocultando initData de Telegram, JWT, contraseñas y tokens
+
+La configuración está en settings.LOGGING.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# Id del request en curso (lo fija core.middleware.RequestIdMiddleware)
+request_id = ContextVar('request_id', default=None)
+
+REDACTED = '[redacted]'
+SENSITIVE_KEYS = {
+    'access',
+    'authorization',
+    'hash',
+    'http_authorization',
+    'http_x_telegram_init_data',
+    'init_data',
+    'initdata',
+    'password',
+    'quote_token',
+    'refresh',
+    'secret',
+    'token',
+}
+SENSITIVE_PATTERNS = (
+    # Authorization: Bearer <jwt>
+    (re.compile(r'(?i)(bearer\s+)[^\s\'",]+'), r'\1' + REDACTED),
+    # JWT sueltos
+    (re.compile(r'eyJ[\w-]+\.[\w-]+\.[\w-]*'), REDACTED),
+    # Campos de un initData de Telegram (query string)
+    (re.compile(r'\b(hash|signature|user|query_id)=[^&\s\'",]+'), r'\1=' + REDACTED),
+    # 'password': 'x' / token=x en dicts y query strings impresos
+    (
+        re.compile(r'(?i)([\'"]?(?:password|token|quote_token|secret|refresh|access)[\'"]?\s*[:=]\s*)[\'"]?[^\'",\s}&]+[\'"]?'),
+        r'\1' + REDACTED,
+    ),
+)
+
+# Atributos propios de LogRecord (lo demás viene de `extra`)
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+def redact(value):
+    """Ocultar secretos en strings, dicts y listas (recursivo)"""
+    if isinstance(value, str):
+        for pattern, replacement in SENSITIVE_PATTERNS:
+            value = pattern.sub(replacement, value)
+        return value
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class RequestIdFilter(logging.Filter):
+    """Agrega record.request_id (se evalúa en el thread del request)"""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo por logger: {'orders': 0.1} deja pasar ~10% de los registros de
+    'orders' y sus hijos (gana el prefijo más largo). WARNING o más no se muestrea.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+
+    def rate_for(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + '.'):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los secretos ocultos"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(record.getMessage()),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = REDACTED if key.lower() in SENSITIVE_KEYS else redact(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola los registros; un QueueListener los formatea y escribe en `stream`
+
+    El formatter configurado para este handler lo usa el listener. Con la
+    cola llena el registro se descarta (el request nunca espera al log).
+    Tras un fork (gunicorn --preload) el hijo arranca su propio listener:
+    el thread del proceso padre no existe en el hijo.
+    """
+
+    def __init__(self, stream=None, maxsize=10_000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._start_listener()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_listener(self):
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._running = True
+
+    def _after_fork(self):
+        if self._running:
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._dropped_lock = threading.Lock()
+            self._start_listener()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Se resuelve el mensaje ahora (los args pueden cambiar después);
+        # el JSON se arma en el listener
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self):
+        # logging.shutdown (al salir) cierra los handlers: se vacía la cola
+        if self._running:
+            self._running = False
+            self.listener.stop()
+            self.target.close()
+        super().close()
@@ -0,0 +1,121 @@
+# core/management/commands/benchmark_json.py
+
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.models import User
+from core.renderers import FastJSONRenderer, orjson
+from menu.models import Category, Product
+from menu.serializers import CategoryWithProductsSerializer
+from menu.snapshot import MenuSnapshot, hydrate_menu
+from menu.versions import publish_menu
+from orders.models import Order, OrderItem
+from orders.serializers import OrderListSerializer, OrderSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tiempo de render JSON (DRF vs FastJSONRenderer) de los payloads "
+        "with-products y my-orders con datos de prueba (no se guarda nada)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=300)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("⚠️ orjson no está instalado: FastJSONRenderer usa el JSON de DRF")
+
+        try:
+            with transaction.atomic():
+                payloads = self.build_payloads(options['products'], options['orders'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        slow, fast = JSONRenderer(), FastJSONRenderer()
+        for name, data in payloads.items():
+            reference = slow.render(data)
+            if json.loads(fast.render(data)) != json.loads(reference):
+                self.stderr.write(self.style.ERROR(f"✗ {name}: la salida no coincide"))
+                continue
+
+            drf = self.measure(slow, data, options['repeat'])
+            accelerated = self.measure(fast, data, options['repeat'])
+            self.stdout.write(
+                f"{name:<14} {len(reference) / 1024:8.1f} KB   "
+                f"DRF {drf * 1000:7.2f} ms   rápido {accelerated * 1000:7.2f} ms   "
+                f"x{drf / accelerated:.1f}"
+            )
+
+    def measure(self, renderer, data, repeat):
+        """Mejor tiempo de `repeat` renders (menos ruido que el promedio)"""
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            renderer.render(data)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def build_payloads(self, product_count, order_count):
+        categories = Category.objects.bulk_create(
+            [Category(name=f'Benchmark {i}', description='Categoría de prueba') for i in range(10)]
+        )
+        products = Product.objects.bulk_create([
+            Product(
+                category=categories[i % len(categories)],
+                name=f'Producto benchmark {i}',
+                description='Descripción con acentos y ñ ' * 4,
+                price=Decimal('10.50') + i,
+                image_url='',
+            )
+            for i in range(product_count)
+        ])
+        version = publish_menu(notes='Benchmark')
+
+        client = User.objects.create_user(email='benchmark@example.com', password='x', role='CUSTOMER')
+        orders = Order.objects.bulk_create([
+            Order(
+                order_number=f'BENCH-{i:06d}',
+                client=client,
+                delivery_latitude=Decimal('-17.783300'),
+                delivery_longitude=Decimal('-63.182100'),
+                delivery_address='Av. Benchmark 123',
+                subtotal=Decimal('31.50'),
+                delivery_fee=Decimal('10.00'),
+                total=Decimal('41.50'),
+                menu_version=version,
+            )
+            for i in range(order_count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=products[(i + j) % len(products)],
+                quantity=1,
+                unit_price=Decimal('10.50'),
+                subtotal=Decimal('10.50'),
+            )
+            for i, order in enumerate(orders)
+            for j in range(3)
+        ])
+
+        orders = Order.objects.filter(client=client).select_related('client', 'driver').prefetch_related('items__product')
+        return {
+            'with-products': CategoryWithProductsSerializer(
+                hydrate_menu(MenuSnapshot.build(version.id)), many=True
+            ).data,
+            'my-orders': OrderListSerializer(orders, many=True).data,
+            'my-deliveries': OrderSerializer(orders[:100], many=True).data,
+        }
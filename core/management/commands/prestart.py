@@ -0,0 +1,37 @@
+# core/management/commands/prestart.py
+
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    help = (
+        "Preparación antes de gunicorn en un solo proceso: migra solo si hay "
+        "migraciones pendientes y carga el menú inicial solo si cambió (load_menu)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-menu', action='store_true', help="No correr load_menu")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan:
+            self.stdout.write(f"Aplicando {len(plan)} migraciones...")
+            call_command('migrate', interactive=False, verbosity=options['verbosity'])
+        else:
+            self.stdout.write("Migraciones al día")
+
+        if not options['skip_menu']:
+            from menu.scripts import load_menu
+
+            load_menu.run()
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Listo en {time.perf_counter() - started:.2f}s"))
@@ -0,0 +1,69 @@
+# core/management/commands/profile_startup.py
+
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Qué se importa en el proceso nuevo
+TARGETS = {
+    'wsgi': 'import config.wsgi',
+    'setup': 'import django; django.setup()',
+}
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def parse_importtime(output):
+    """
+    Salida de python -X importtime → [(módulo, propio_us, acumulado_us, nivel)]
+
+    nivel 0 son los imports de primer nivel (su acumulado suma el total).
+    """
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules.append((name, int(own), int(cumulative), len(indent) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en un proceso nuevo (python -X importtime): tiempo total "
+        "y los módulos que más tardan en importarse"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS), default='wsgi',
+                            help="wsgi: lo que carga cada worker; setup: solo django.setup()")
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', TARGETS[options['target']]],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        wall = time.perf_counter() - started
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+
+        modules = parse_importtime(process.stderr)
+        total = sum(cumulative for _, _, cumulative, level in modules if level == 0)
+        index = 1 if options['sort'] == 'self' else 2
+
+        self.stdout.write(f"{'acumulado':>10} {'propio':>9}  módulo")
+        for name, own, cumulative, _ in sorted(modules, key=lambda m: -m[index])[:options['top']]:
+            self.stdout.write(f"{cumulative / 1000:>8.1f}ms {own / 1000:>7.1f}ms  {name}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(modules)} módulos, imports {total / 1e6:.3f}s, proceso completo {wall:.3f}s "
+            f"(target {options['target']})"
+        ))
@@ -0,0 +1,356 @@
+# core/metrics.py
+"""
+Métricas de operación en formato Prometheus (sin servicios externos)
+
+- Cada proceso acumula contadores e histogramas en memoria y los vuelca cada
+  METRICS_FLUSH_INTERVAL segundos a METRICS_DIR/<pid>-<uuid>.json
+  (escritura atómica: archivo temporal + os.replace). El uuid es nuevo en
+  cada proceso: un pid reutilizado no pisa el archivo de un worker muerto.
+  Ningún proceso escribe el archivo de otro, así que los workers no se pisan
+- Al exponer se suman los archivos de todos los procesos más lo que el
+  proceso actual tiene en memoria. Los archivos de workers que ya murieron
+  se suman a METRICS_DIR/archive.json y se borran (con un lock de archivo):
+  sus contadores no retroceden y el directorio no crece sin límite.
+  METRICS_DIR es por máquina (los pids se comprueban en el sistema local)
+- Sin METRICS_DIR (tests) todo queda en memoria del proceso
+
+Se exponen en /admin/metrics/ (staff o Authorization: Bearer METRICS_TOKEN).
+
+Métricas:
+- http_requests_total, http_request_duration_seconds, http_request_errors_total
+  y db_queries_total por nombre de URL (MetricsMiddleware)
+- cache_requests_total por cache y resultado (cache_lookup)
+- order_transitions_total por estado y payment_outcomes_total por estado
+  (señales de los historiales de pedido y de pago)
+- throttled_requests_total por scope (core.throttling)
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models.signals import post_save
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Valores acumulados de los workers que ya terminaron
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = '.lock'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        return True
+    return True
+
+
+def _file_pid(name):
+    """pid del nombre <pid>-<uuid>.json (o <pid>.json, formato anterior); None si no es de un proceso"""
+    pid = name[:-len('.json')].split('-')[0]
+    return int(pid) if name.endswith('.json') and pid.isdigit() else None
+
+
+def _add_values(totals, values):
+    for name, labels, value in values:
+        key = (name, tuple(labels))
+        if isinstance(value, list):
+            current = totals.setdefault(key, [0] * len(value))
+            totals[key] = [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _serialize(totals):
+    return [
+        [name, list(labels), list(value) if isinstance(value, list) else value]
+        for (name, labels), value in totals.items()
+    ]
+
+
+def _write_json(directory, name, data):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, os.path.join(directory, name))
+
+
+def _read_json(path, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Lock exclusivo entre procesos sobre METRICS_DIR (sin fcntl, p. ej. Windows, no bloquea)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(os.path.join(directory, LOCK_FILE), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Registry:
+    """
+    Valores de las métricas de este proceso
+
+    {(nombre, labels): valor} para contadores y
+    {(nombre, labels): [conteo por bucket..., suma, cantidad]} para histogramas
+    """
+
+    def __init__(self, directory=None, flush_interval=0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        # (pid, uuid) del proceso dueño del archivo; cambia después de un fork
+        self._instance = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._values[(name, labels)] = self._values.get((name, labels), 0) + amount
+        self._schedule_flush()
+
+    def observe(self, name, labels, value, buckets):
+        with self._lock:
+            series = self._values.get((name, labels))
+            if series is None:
+                series = self._values[(name, labels)] = [0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self.directory:
+            return
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except OSError:
+            logger.warning("No se pudieron guardar las métricas", exc_info=True)
+
+    def _filename(self):
+        pid = os.getpid()
+        if self._instance is None or self._instance[0] != pid:
+            self._instance = (pid, uuid.uuid4().hex[:12])
+        return f'{pid}-{self._instance[1]}.json'
+
+    def flush(self):
+        """Escribir los valores de este proceso en su archivo"""
+        with self._lock:
+            self._timer = None
+            values = _serialize(self._values)
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(self.directory, self._filename(), values)
+
+    def collect(self):
+        """Valores sumados de todos los procesos"""
+        with self._lock:
+            totals = {key: (list(value) if isinstance(value, list) else value) for key, value in self._values.items()}
+        if not self.directory or not os.path.isdir(self.directory):
+            return totals
+
+        own = self._filename()
+        with _directory_lock(self.directory):
+            files = [name for name in self._files() if name != own]
+            archive = self._archive_dead(files)
+            _add_values(totals, archive['values'])
+            for name in files:
+                if name not in archive['merged']:
+                    _add_values(totals, _read_json(os.path.join(self.directory, name), []))
+        return totals
+
+    def _archive_dead(self, files):
+        """
+        Sumar al archivo los workers muertos y borrar sus archivos
+
+        'merged' lista los archivos ya sumados que quizá no se pudieron borrar:
+        no se vuelven a contar aunque sigan en el directorio.
+        """
+        path = os.path.join(self.directory, ARCHIVE_FILE)
+        archive = _read_json(path, {'values': [], 'merged': []})
+        merged = set(archive['merged']) & set(files)
+        dead = [name for name in files if name not in merged and not _pid_alive(_file_pid(name))]
+        if dead or merged != set(archive['merged']):
+            totals = {}
+            _add_values(totals, archive['values'])
+            for name in dead:
+                _add_values(totals, _read_json(os.path.join(self.directory, name), []))
+            archive = {'values': _serialize(totals), 'merged': sorted(merged | set(dead))}
+            _write_json(self.directory, ARCHIVE_FILE, archive)
+        for name in archive['merged']:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        return archive
+
+    def _files(self):
+        """Archivos de los procesos (sin el archivo de los muertos)"""
+        return [
+            name
+            for name in os.listdir(self.directory)
+            if _file_pid(name) is not None
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        """Formato de texto de Prometheus"""
+        series = defaultdict(list)
+        for (name, labels), value in sorted(self.collect().items()):
+            series[name].append((labels, value))
+
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels, value in series.get(name, ()):
+                lines.extend(metric.samples(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        self.registry.inc(self.name, tuple(str(label) for label in labels), amount)
+
+    def samples(self, labels, value):
+        yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def observe(self, value, *labels):
+        self.registry.observe(self.name, tuple(str(label) for label in labels), value, self.buckets)
+
+    def samples(self, labels, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _number(bound))])} {cumulative}'
+        # Lo que no entró en ningún bucket solo cuenta para +Inf
+        yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", "+Inf")])} {value[-1]}'
+        yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(value[-2])}'
+        yield f'{self.name}_count{_labels(self.labelnames, labels)} {value[-1]}'
+
+
+REGISTRY = Registry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+requests_total = Counter(
+    'http_requests_total', 'Requests HTTP por nombre de URL', ('route', 'method', 'status')
+)
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Latencia de requests HTTP por nombre de URL', ('route', 'method')
+)
+request_errors = Counter(
+    'http_request_errors_total', 'Respuestas 5xx por nombre de URL', ('route', 'method')
+)
+db_queries = Counter('db_queries_total', 'Queries SQL por nombre de URL', ('route',))
+cache_requests = Counter('cache_requests_total', 'Lecturas de cache por resultado', ('cache', 'result'))
+order_transitions = Counter('order_transitions_total', 'Cambios de estado de pedidos', ('status',))
+payment_outcomes = Counter('payment_outcomes_total', 'Cambios de estado de pagos', ('status',))
+throttled_requests = Counter('throttled_requests_total', 'Requests rechazados por throttling', ('scope',))
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<sin ruta>'
+    return match.view_name or match.route
+
+
+def cache_lookup(cache_name, value):
+    """Contar un hit (value no es None) o un miss y devolver value"""
+    cache_requests.inc(cache_name, 'miss' if value is None else 'hit')
+    return value
+
+
+def _count_order_transition(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        order_transitions.inc(instance.status)
+
+
+def _count_payment_outcome(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        payment_outcomes.inc(instance.new_status)
+
+
+post_save.connect(_count_order_transition, sender='orders.OrderStatusHistory')
+post_save.connect(_count_payment_outcome, sender='payments.PaymentHistory')
@@ -1,75 +1,42 @@
 # users/middleware.py
 
-import hmac
-import hashlib
-import json
-import logging
-from urllib.parse import parse_qsl
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
-from .models import User
+from . import compression, log, metrics, profiling, routers, telegram
 
 
-def validate_telegram_webapp_data(init_data: str, bot_token: str) -> dict | None:
+class RequestIdMiddleware(MiddlewareMixin):
     """
-    Valida el initData de Telegram Web App según documentación oficial
-    https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+    Id por request para correlacionar los logs (core.log)
     
-    Returns:
-        dict con datos del usuario si es válido
-        None si la validación falla
+    - Se respeta X-Request-ID si viene de un proxy/cliente y es razonable
+    - Se devuelve en el header X-Request-ID de la respuesta
     """
-    try:
-        # Parsear el init_data
-        parsed_data = dict(parse_qsl(init_data))
-        
-        # Extraer el hash recibido
-        received_hash = parsed_data.pop('hash', None)
-        if not received_hash:
-            return None
-        
-        # Crear data_check_string
-        data_check_string_parts = []
-        for key in sorted(parsed_data.keys()):
-            data_check_string_parts.append(f"{key}={parsed_data[key]}")
-        data_check_string = '\n'.join(data_check_string_parts)
-        
-        # Crear secret_key
-        secret_key = hmac.new(
-            key=b"WebAppData",
-            msg=bot_token.encode(),
-            digestmod=hashlib.sha256
-        ).digest()
-        
-        # Calcular hash esperado
-        calculated_hash = hmac.new(
-            key=secret_key,
-            msg=data_check_string.encode(),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-        
-               # Verificar que coincidan
-        if calculated_hash != received_hash:
-            print(f"[DEBUG-HASH] ❌ Hash mismatch!\n  calculated: {calculated_hash}\n  received:   {received_hash}")
-            return None
-        else:
-            print(f"[DEBUG-HASH] ✅ Hash OK")
-        
-        # Parsear datos del usuario
-        user_data = json.loads(parsed_data.get('user', '{}'))
-        
-        return {
-            'id': user_data.get('id'),
-            'first_name': user_data.get('first_name', ''),
-            'last_name': user_data.get('last_name', ''),
-            'username': user_data.get('username', ''),
-            'language_code': user_data.get('language_code', 'en'),
-        }
-        
-    except Exception as e:
-        print(f"Error validating Telegram init data: {e}")
+    
+    VALID_ID = re.compile(r'^[\w.-]{1,64}$')
+    
+    def process_request(self, request):
+        incoming = request.META.get('HTTP_X_REQUEST_ID', '')
+        request.request_id = incoming if self.VALID_ID.match(incoming) else uuid.uuid4().hex
+        log.request_id.set(request.request_id)
         return None
+    
+    def process_response(self, request, response):
+        request_id = getattr(request, 'request_id', None)
+        if request_id:
+            response['X-Request-ID'] = request_id
+        # El worker reutiliza el thread: los logs fuera de un request no heredan el id
+        log.request_id.set(None)
+        return response
 
 
 class TelegramWebAppAuthMiddleware(MiddlewareMixin):
@@ -87,6 +54,7 @@ class TelegramWebAppAuthMiddleware(MiddlewareMixin):
         '/api/users/telegram/auth/',
         '/api/users/login/',
         '/api/users/register/',
+        '/api/payments/webhook/',  # firmado por el banco (payments.webhooks)
         '/static/',
         '/media/',
     ]
@@ -95,6 +63,7 @@ class TelegramWebAppAuthMiddleware(MiddlewareMixin):
     PUBLIC_GET_PATHS = [
         '/api/menu/categories/bot-menu/',
         '/api/menu/products/available/',
+        '/api/menu/products/search/',
     ]
     
     def process_request(self, request):
@@ -111,75 +80,173 @@ class TelegramWebAppAuthMiddleware(MiddlewareMixin):
             return None
         
         # Obtener initData del header
-        init_data = request.META.get('HTTP_X_TELEGRAM_INIT_DATA')
-        
-        if not init_data:
+        if not request.META.get('HTTP_X_TELEGRAM_INIT_DATA'):
             return JsonResponse({
                 'error': 'Missing Telegram authentication data',
                 'detail': 'X-Telegram-Init-Data header is required'
             }, status=401)
         
-               # Validar initData
-        bot_token = settings.TELEGRAM_BOT_TOKEN
-        print(f"[DEBUG-MIDDLEWARE] bot_token presente: {bool(bot_token)}, primeros 10 chars: {bot_token[:10] if bot_token else 'None'}")
-        print(f"[DEBUG-MIDDLEWARE] init_data primeros 80 chars: {init_data[:80]}")
-        validated_data = validate_telegram_webapp_data(init_data, bot_token)
-        
-        if not validated_data:
-            print(f"[DEBUG-MIDDLEWARE] ❌ Validación FALLÓ - hash HMAC no coincide o error en parseo")
+        # Validar initData y buscar/crear el usuario (cacheado, ver core.telegram)
+        result = telegram.authenticate_request(request)
+        if result is None:
             return JsonResponse({
                 'error': 'Invalid Telegram authentication data',
                 'detail': 'InitData signature verification failed'
             }, status=403)
-        else:
-            print(f"[DEBUG-MIDDLEWARE] ✅ Validación OK - usuario ID: {validated_data.get('id')}")
-        
-        # Buscar o crear usuario
-        telegram_id = str(validated_data['id'])
         
-        try:
-            user = User.objects.get(telegram_chat_id=telegram_id)
-            
-            # Actualizar datos si cambiaron
-            updated = False
-            if user.telegram_username != validated_data['username']:
-                user.telegram_username = validated_data['username']
-                updated = True
-            if user.first_name != validated_data['first_name']:
-                user.first_name = validated_data['first_name']
-                updated = True
-            if user.last_name != validated_data['last_name']:
-                user.last_name = validated_data['last_name']
-                updated = True
-            
-            if updated:
-                user.save()
-                
-        except User.DoesNotExist:
-            # Crear usuario automáticamente
-            user = User.objects.create(
-                telegram_chat_id=telegram_id,
-                telegram_username=validated_data['username'],
-                first_name=validated_data['first_name'],
-                last_name=validated_data['last_name'],
-                email=f'telegram_{telegram_id}@temp.com',
-                role='CUSTOMER',
-                is_telegram_verified=True,
+        user, validated_data = result
+        request.user = user
+        request._cached_user = user
+        request.telegram_data = validated_data
+
+        return None
+
+class DatabaseRoutingMiddleware(MiddlewareMixin):
+    """
+    Estado de ruteo primaria/réplica por request
+    
+    - Requests con escrituras recientes (cookie) quedan fijadas a la primaria
+    - Tras una escritura se renueva la cookie para que las lecturas
+      siguientes del mismo cliente no vean una réplica atrasada
+    """
+    
+    def process_request(self, request):
+        pinned = request.COOKIES.get(settings.REPLICA_PIN_COOKIE) is not None
+        request._db_routing_token = routers.begin_request(pinned=pinned)
+        return None
+    
+    def process_response(self, request, response):
+        token = getattr(request, '_db_routing_token', None)
+        if token is None:
+            return response
+        
+        state = routers.current_state()
+        wrote = request.method not in ('GET', 'HEAD', 'OPTIONS') or (state and state.wrote)
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax' if settings.DEBUG else 'None',
+                secure=not settings.DEBUG,
             )
         
-        # Asignar usuario al request
+        routers.end_request(token)
+        return response
 
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Comprime con br o gzip según Accept-Encoding
+    
+    - Solo tipos de texto/JSON de al menos COMPRESSION_MIN_SIZE bytes
+    - Respuestas que ya traen Content-Encoding (payloads del menú cacheados
+      ya comprimidos, archivos de WhiteNoise) pasan sin tocar
+    - StreamingHttpResponse se comprime chunk por chunk
+    """
+    
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 304:
+            return response
+        if not compression.is_compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.compress_async_stream(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = compression.compress_stream(
+                    response.streaming_content, encoding
+                )
+            del response['Content-Length']
+        else:
+            compressed = compression.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        
+        # Otra representación: el ETag fuerte pasa a débil (igual que GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Perfil muestreado por request con Server-Timing (ver core.profiling)
+    
+    Con PROFILING_ENABLED=False no se instala (MiddlewareNotUsed).
+    """
+    
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+        
+        profile, token = profiling.start()
         try:
-            request.user = user
-        except Exception:
-            setattr(request, "user", user)
-        try:
-            request._cached_user = user
-        except Exception:
-            setattr(request, "_cached_user", user)
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.sql))
+                response = self.get_response(request)
+        finally:
+            profiling.stop(token)
+        
+        profiling.record(request, response, profile)
+        return response
 
-        request.telegram_data = validated_data
-        logger = logging.getLogger(__name__)
-        logger.debug("[DEBUG-MIDDLEWARE] request.user fijado en middleware: %s", getattr(user, "id", None))
 
-        return None
\ No newline at end of file
+class MetricsMiddleware:
+    """
+    Requests, latencia, errores y queries por nombre de URL (ver core.metrics)
+    
+    Con METRICS_ENABLED=False no se instala (MiddlewareNotUsed).
+    """
+    
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        queries = 0
+        
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+        
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        
+        route = metrics.route_name(request)
+        metrics.requests_total.inc(route, request.method, response.status_code)
+        metrics.request_duration.observe(elapsed, route, request.method)
+        if response.status_code >= 500:
+            metrics.request_errors.inc(route, request.method)
+        if queries:
+            metrics.db_queries.inc(route, amount=queries)
+        return response
@@ -0,0 +1,30 @@
+# core/parsers.py
+"""
+JSONParser con orjson (si está instalado)
+
+Mismo resultado que el de DRF salvo enteros de más de 64 bits, que orjson
+devuelve como float (ningún payload de la API los usa).
+"""
+
+import codecs
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        # orjson solo lee UTF-8 y siempre rechaza NaN/Infinity (STRICT_JSON)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
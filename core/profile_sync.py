@@ -0,0 +1,106 @@
+# core/profile_sync.py
+"""
+Sincronización diferida (write-behind) del perfil de Telegram
+
+- Autenticar a un usuario existente nunca escribe: si cambió su username o
+  nombre, el cambio se aplica al objeto en memoria y se encola
+- El buffer se vuelca cada TELEGRAM_PROFILE_FLUSH_INTERVAL segundos con
+  bulk_update solo de los campos que cambiaron (sin tocar updated_at)
+- Varios cambios del mismo usuario antes del volcado quedan en uno solo
+"""
+
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+from .models import User
+from .user_cache import forget_users
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = ('telegram_username', 'first_name', 'last_name')
+
+
+def profile_changes(user, data):
+    """{campo: valor} del perfil de Telegram que difieren del usuario"""
+    values = {
+        'telegram_username': data.get('username') or '',
+        'first_name': data.get('first_name') or '',
+        'last_name': data.get('last_name') or '',
+    }
+    return {field: value for field, value in values.items() if getattr(user, field) != value}
+
+
+class ProfileSyncBuffer:
+    """Acumula cambios de perfil por usuario y los vuelca periódicamente"""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, user_id, changes):
+        with self._lock:
+            self._pending.setdefault(user_id, {}).update(changes)
+            if self.flush_interval > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.warning("No se pudieron guardar los perfiles de Telegram", exc_info=True)
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+
+        # bulk_update escribe los mismos campos en todas las filas: se agrupa por campos cambiados
+        groups = defaultdict(list)
+        for user_id, changes in pending.items():
+            groups[tuple(sorted(changes))].append(User(pk=user_id, **changes))
+        for fields, users in groups.items():
+            User.objects.bulk_update(users, fields, batch_size=500)
+        # bulk_update no emite post_save: se descartan los usuarios cacheados del JWT
+        forget_users(pending)
+        return len(pending)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ProfileSyncBuffer(settings.TELEGRAM_PROFILE_FLUSH_INTERVAL)
+            # Al apagar el worker se vuelca lo pendiente
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def queue_profile_update(user, changes):
+    """Aplicar los cambios al objeto en memoria y encolarlos para la BD"""
+    if not changes:
+        return
+    for field, value in changes.items():
+        setattr(user, field, value)
+    get_buffer().add(user.pk, changes)
@@ -0,0 +1,182 @@
+# core/profiling.py
+"""
+Perfil por request (opt-in y muestreado)
+
+Con PROFILING_ENABLED, ProfilingMiddleware (core.middleware) mide una
+fracción de los requests (PROFILING_SAMPLE_RATE, o los que traen
+X-Profile: 1):
+
+- sql: cantidad y tiempo de queries (connection.execute_wrapper)
+- auth, serialize, render, qr: tramos marcados con span() en el código
+- total: todo el request
+
+Se devuelven en el header Server-Timing, se loguean (logger core.profiling)
+y los más lentos por endpoint quedan en memoria del proceso (SlowRequests),
+visibles para staff en /admin/profiling/slow/.
+
+Sin un perfil activo span() devuelve un nullcontext compartido: el costo
+es leer una ContextVar. Con PROFILING_ENABLED=False el middleware ni se
+instala.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+# Orden de las métricas en Server-Timing
+METRICS = ('auth', 'sql', 'serialize', 'render', 'qr')
+
+_current = ContextVar('profile', default=None)
+_NOT_PROFILING = nullcontext()
+
+
+class Profile:
+    """Tiempos acumulados de un request: {nombre: [segundos, cantidad]}"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self._active = set()
+
+    def add(self, name, seconds):
+        timing = self.timings.setdefault(name, [0.0, 0])
+        timing[0] += seconds
+        timing[1] += 1
+
+    def sql(self, execute, sql, params, many, context):
+        """execute_wrapper: mide cada query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('sql', time.perf_counter() - start)
+
+    def span(self, name):
+        # Un tramo anidado con el mismo nombre (serializers anidados) no se cuenta dos veces
+        if name in self._active:
+            return _NOT_PROFILING
+        return _Span(self, name)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def metrics(self):
+        """{nombre: (ms, cantidad)} en el orden de METRICS"""
+        names = [name for name in METRICS if name in self.timings]
+        names += sorted(set(self.timings) - set(METRICS))
+        return {name: (round(self.timings[name][0] * 1000, 2), self.timings[name][1]) for name in names}
+
+
+class _Span:
+    __slots__ = ('profile', 'name', 'start')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._active.add(self.name)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profile._active.discard(self.name)
+        self.profile.add(self.name, time.perf_counter() - self.start)
+
+
+def span(name):
+    """Medir un tramo del request en curso (no hace nada si no se está perfilando)"""
+    profile = _current.get()
+    if profile is None:
+        return _NOT_PROFILING
+    return profile.span(name)
+
+
+def should_profile(request):
+    if request.META.get(PROFILE_HEADER) == '1':
+        return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate >= 1 or random.random() < rate
+
+
+def start():
+    profile = Profile()
+    return profile, _current.set(profile)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def server_timing(metrics, total_ms):
+    parts = [f'{name};dur={ms};desc="{count}"' for name, (ms, count) in metrics.items()]
+    parts.append(f'total;dur={total_ms}')
+    return ', '.join(parts)
+
+
+def endpoint_name(request):
+    """'GET api/orders/orders/<pk>/' (la ruta, no el path: acota las claves)"""
+    match = getattr(request, 'resolver_match', None)
+    return f'{request.method} {match.route if match else "<sin ruta>"}'
+
+
+class SlowRequests:
+    """Los N requests más lentos por endpoint (min-heap acotado por endpoint)"""
+
+    def __init__(self, size):
+        self.size = size
+        self._heaps = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, total_ms, entry):
+        item = (total_ms, next(self._counter), entry)
+        with self._lock:
+            heap = self._heaps.setdefault(endpoint, [])
+            if len(heap) < self.size:
+                heapq.heappush(heap, item)
+            elif total_ms > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: [entry for _, _, entry in sorted(heap, reverse=True)]
+                for endpoint, heap in sorted(self._heaps.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._heaps.clear()
+
+
+slow_requests = SlowRequests(settings.PROFILING_SLOW_TOP_N)
+
+
+def record(request, response, profile):
+    """Server-Timing, log y ranking de lentos para un request perfilado"""
+    total_ms = round(profile.total() * 1000, 2)
+    metrics = profile.metrics()
+    response['Server-Timing'] = server_timing(metrics, total_ms)
+
+    endpoint = endpoint_name(request)
+    entry = {
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'total_ms': total_ms,
+        'at': timezone.now().isoformat(),
+        **{f'{name}_ms': ms for name, (ms, _) in metrics.items()},
+        **{f'{name}_count': count for name, (_, count) in metrics.items()},
+    }
+    slow_requests.add(endpoint, total_ms, entry)
+    logger.info("Perfil de request", extra={'endpoint': endpoint, **entry})
@@ -0,0 +1,61 @@
+# core/renderers.py
+"""
+JSONRenderer rápido con orjson (si está instalado)
+
+Misma salida que el JSONRenderer de DRF (compacto, UTF-8, fechas ISO 8601
+con 'Z', \u2028/\u2029 escapados). Diferencia deliberada: un Decimal suelto
+en la respuesta sale como string (igual que los DecimalField con
+COERCE_DECIMAL_TO_STRING), no como float con pérdida de precisión.
+
+Sin orjson, con indentación (API navegable) o con tipos que orjson no
+acepta (enteros de más de 64 bits) se usa el renderer de DRF.
+"""
+
+import decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import profiling
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Tipos que orjson no serializa por sí mismo (Decimal, lazy strings, QuerySet...)"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj) if api_settings.COERCE_DECIMAL_TO_STRING else float(obj)
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer con orjson; misma salida compacta que el de DRF"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with profiling.span('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que DRF: JSON que también es JavaScript válido
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
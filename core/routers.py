@@ -0,0 +1,127 @@
+# core/routers.py
+
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+
+class RoutingState:
+    """Estado de ruteo de la request actual"""
+
+    def __init__(self, pinned=False):
+        # pinned: hubo (o hay reciente) una escritura, todo va a la primaria
+        self.pinned = pinned
+        self.wrote = False
+        self.use_replica = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def begin_request(pinned=False):
+    return _state.set(RoutingState(pinned=pinned))
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def current_state():
+    return _state.get()
+
+
+def pin_primary():
+    """Forzar la primaria durante el resto de la request"""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+        state.use_replica = False
+
+
+def read_from_replica():
+    """Enviar las lecturas restantes de la request a una réplica"""
+    state = _state.get()
+    if state is not None and not state.pinned:
+        state.use_replica = True
+
+
+@contextmanager
+def use_replica():
+    """Lecturas a la réplica dentro del bloque (si no hay escrituras previas)"""
+    token = None
+    if _state.get() is None:
+        token = _state.set(RoutingState())
+    state = _state.get()
+    previous = state.use_replica
+    read_from_replica()
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def pin_after_write(sender, **kwargs):
+    """Read-after-write: tras escribir, la request sigue en la primaria"""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+    pin_primary()
+
+
+class PrimaryReplicaRouter:
+    """
+    Escrituras siempre a 'default'; lecturas a una réplica solo cuando la
+    vista lo habilita explícitamente y la request no está fijada a la primaria
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        state = _state.get()
+        if replicas and state is not None and state.use_replica and not state.pinned:
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas contienen los mismos datos
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Mixin para ViewSets: las acciones en replica_actions leen de una réplica
+    (solo GET/HEAD/OPTIONS)
+    """
+
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and request.method in SAFE_METHODS:
+            read_from_replica()
+
+
+class ReplicaChangeListMixin:
+    """Mixin para ModelAdmin: el changelist (GET) se lee de una réplica"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in SAFE_METHODS:
+            return super().changelist_view(request, extra_context)
+
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # Renderizar aquí: el TemplateResponse evalúa los querysets al renderizar
+            if hasattr(response, 'render'):
+                response.render()
+        return response
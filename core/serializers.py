@@ -3,6 +3,7 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User
+from .sparse import SparseFieldsMixin
 
 
 class EmailLoginSerializer(serializers.Serializer):
@@ -26,7 +27,7 @@ class EmailLoginSerializer(serializers.Serializer):
         return attrs
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # ✅ NUEVO: Campo calculado para mostrar el nombre del rol
     role_display = serializers.CharField(source='get_role_display', read_only=True)
     
@@ -44,6 +45,7 @@ class UserSerializer(serializers.ModelSerializer):
             "created_at",  # ✅ Nuevo
         ]
         read_only_fields = ["id", "created_at"]
+        field_sources = {"role_display": ["role"]}
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
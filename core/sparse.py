@@ -0,0 +1,205 @@
+# core/sparse.py
+"""
+Respuestas parciales: ?fields= y ?expand=
+
+    GET /api/orders/orders/42/?fields=id,status,items.product_name,items.quantity
+    GET /api/orders/orders/?expand=client_details
+
+- Sin parámetros la respuesta es la de siempre
+- fields: solo esos campos; con punto se eligen campos de objetos anidados
+- Con fields o expand, los campos en Meta.expandable_fields (objetos
+  anidados pesados) solo se incluyen si se piden en expand o en fields
+- El queryset se arma con lo que el serializer va a leer: only() con esas
+  columnas, select_related de las FK usadas y Prefetch de las relaciones
+  inversas con sus propias columnas
+
+Los campos cuyo origen no es una columna (propiedades, SerializerMethodField)
+declaran sus dependencias en Meta.field_sources como lookups del ORM; si un
+campo no se puede resolver, ese nivel se consulta sin only().
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from . import profiling
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_paths(value):
+    """'id,items.quantity' → {'id': {}, 'items': {'quantity': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def requested_fields(request):
+    """(fields, expand) del query string, o None si no se pidió respuesta parcial"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+        return None
+    fields = parse_paths(params[FIELDS_PARAM]) if params.get(FIELDS_PARAM) else None
+    return fields, parse_paths(params.get(EXPAND_PARAM, ''))
+
+
+class SparseFieldsMixin:
+    """Serializer que respeta ?fields= / ?expand= (también anidado)"""
+
+    def _sparse_spec(self):
+        if hasattr(self, '_sparse'):
+            return self._sparse
+        # Solo el serializer raíz (o el hijo de un ListSerializer raíz) lee el request
+        parent = self.parent
+        if parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return requested_fields(self.context.get('request'))
+        return None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self._sparse_spec()
+        if spec is None:
+            return fields
+
+        selected, expand = spec
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        if selected is not None:
+            keep = [name for name in fields if name in selected]
+        else:
+            keep = [name for name in fields if name not in expandable or name in expand]
+
+        trimmed = {}
+        for name in keep:
+            field = fields[name]
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, SparseFieldsMixin):
+                nested._sparse = ((selected.get(name) or None) if selected else None, expand.get(name, {}))
+            trimmed[name] = field
+        return trimmed
+
+    def to_representation(self, instance):
+        # Tiempo de serialización para Server-Timing (los anidados no se suman dos veces)
+        with profiling.span('serialize'):
+            return super().to_representation(instance)
+
+
+class QueryPlan:
+    """Columnas y relaciones que necesita un serializer de un modelo"""
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = {model._meta.pk.name}
+        self.related = {}
+        self.prefetch = {}
+        self.complete = True
+
+    def relation(self, lookup):
+        """QueryPlan del modelo al final de lookup (agrega el join o Prefetch)"""
+        plan = self
+        for name in lookup.split('__'):
+            plan = plan._step(name)
+            if plan is None:
+                return None
+        return plan
+
+    def add(self, lookup):
+        name, _, rest = lookup.partition('__')
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            self.complete = False
+            return
+        if not field.is_relation or (not rest and field.concrete):
+            # Columna propia (para una FK basta el id, sin join)
+            self.columns.add(name)
+            return
+        plan = self._step(name)
+        if plan is not None and rest:
+            plan.add(rest)
+
+    def _step(self, name):
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            self.complete = False
+            return None
+        if field.many_to_one or (field.one_to_one and field.concrete):
+            self.columns.add(name)
+            return self.related.setdefault(name, QueryPlan(field.related_model))
+        if field.one_to_many or field.one_to_one:
+            plan = self.prefetch.setdefault(name, QueryPlan(field.related_model))
+            # La FK hacia este modelo hace falta para repartir el Prefetch
+            plan.columns.add(field.field.name)
+            return plan
+        self.complete = False
+        return None
+
+    def is_complete(self):
+        return self.complete and all(plan.is_complete() for plan in self.related.values())
+
+    def only_paths(self):
+        paths = set(self.columns)
+        for name, plan in self.related.items():
+            paths.update(f'{name}__{path}' for path in plan.only_paths())
+        return paths
+
+    def select_paths(self):
+        for name, plan in self.related.items():
+            yield name
+            yield from (f'{name}__{path}' for path in plan.select_paths())
+
+    def apply(self, queryset):
+        queryset = queryset.select_related(None).prefetch_related(None)
+        select = list(self.select_paths())
+        if select:
+            queryset = queryset.select_related(*select)
+        for name, plan in self.prefetch.items():
+            queryset = queryset.prefetch_related(
+                Prefetch(name, queryset=plan.apply(plan.model._default_manager.all()))
+            )
+        if self.is_complete():
+            queryset = queryset.only(*self.only_paths())
+        return queryset
+
+    @classmethod
+    def for_serializer(cls, serializer, plan=None):
+        plan = plan or cls(serializer.Meta.model)
+        sources = getattr(serializer.Meta, 'field_sources', {})
+        for name, field in serializer.fields.items():
+            if name in sources:
+                for lookup in sources[name]:
+                    plan.add(lookup)
+                continue
+
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if field.source == '*':
+                plan.complete = False
+            elif isinstance(nested, serializers.ModelSerializer):
+                related = plan.relation(field.source.replace('.', '__'))
+                if related is not None:
+                    cls.for_serializer(nested, related)
+            else:
+                plan.add(field.source.replace('.', '__'))
+        return plan
+
+
+class SparseQuerysetMixin:
+    """ViewSet: el queryset lee solo lo que pide ?fields= / ?expand="""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if requested_fields(self.request) is None:
+            return queryset
+
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin):
+            return queryset
+        return QueryPlan.for_serializer(serializer).apply(queryset)
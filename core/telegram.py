@@ -0,0 +1,216 @@
+# core/telegram.py
+"""
+Autenticación por initData de la Mini App de Telegram, una sola vez por request
+
+- La clave secreta (HMAC de "WebAppData" con el token del bot) se calcula
+  una vez por token
+- sha256(initData) → id de usuario en una cache en memoria acotada (LRU)
+  que vence como máximo cuando vence el initData (auth_date + MAX_AGE)
+- Los usuarios van a la cache compartida con la misma clave que el JWT
+  (core.user_cache): guardarlos o borrarlos en cualquier worker los
+  invalida para todos
+- El resultado se guarda en el request: el middleware y la autenticación de
+  DRF comparten la misma validación
+
+Una request repetida de la misma sesión no hace queries ni HMAC.
+"""
+
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import profiling
+from .metrics import cache_lookup
+from .models import User
+from .profile_sync import profile_changes, queue_profile_update
+from .user_cache import user_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Atributo del HttpRequest con el resultado (user, datos) o None si falló
+REQUEST_ATTR = '_telegram_auth'
+_MISSING = object()
+
+
+class TTLCache:
+    """Dict LRU acotado con vencimiento por entrada (seguro entre threads)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_sessions = TTLCache(settings.TELEGRAM_AUTH_CACHE_SIZE)
+
+
+def clear_cache():
+    _sessions.clear()
+
+
+@lru_cache(maxsize=4)
+def webapp_secret(bot_token):
+    return hmac.new(key=b"WebAppData", msg=bot_token.encode(), digestmod=hashlib.sha256).digest()
+
+
+def is_bot_request(request):
+    """El request trae en X-Bot-Token el secreto del bot (TELEGRAM_BOT_SECRET)"""
+    secret = settings.TELEGRAM_BOT_SECRET
+    received = request.headers.get('X-Bot-Token') or ''
+    return bool(secret) and hmac.compare_digest(received.encode(), secret.encode())
+
+
+def validate_init_data(init_data, bot_token):
+    """
+    Valida el initData según la documentación de Telegram
+    https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+
+    Returns:
+        dict con los datos del usuario (incluye auth_date) si es válido
+        None si la firma no coincide o el initData venció
+    """
+    try:
+        parsed_data = dict(parse_qsl(init_data))
+        received_hash = parsed_data.pop('hash', None)
+        if not received_hash:
+            return None
+
+        data_check_string = '\n'.join(f"{key}={parsed_data[key]}" for key in sorted(parsed_data))
+        calculated_hash = hmac.new(
+            key=webapp_secret(bot_token),
+            msg=data_check_string.encode(),
+            digestmod=hashlib.sha256
+        ).hexdigest()
+        if not hmac.compare_digest(calculated_hash, received_hash):
+            logger.debug("initData con firma inválida")
+            return None
+
+        auth_date = int(parsed_data.get('auth_date', 0))
+        max_age = settings.TELEGRAM_INIT_DATA_MAX_AGE
+        if max_age and time.time() - auth_date > max_age:
+            logger.debug("initData vencido (auth_date=%s)", auth_date)
+            return None
+
+        user_data = json.loads(parsed_data.get('user', '{}'))
+        return {
+            'id': user_data.get('id'),
+            'first_name': user_data.get('first_name', ''),
+            'last_name': user_data.get('last_name', ''),
+            'username': user_data.get('username', ''),
+            'language_code': user_data.get('language_code', 'en'),
+            'auth_date': auth_date,
+        }
+
+    except (ValueError, TypeError) as exc:
+        logger.warning("Error validando initData de Telegram: %s", exc)
+        return None
+
+
+def sync_telegram_user(data):
+    """
+    Buscar o crear el usuario de Telegram
+
+    Solo la creación escribe en la request; los cambios de username/nombre
+    de usuarios existentes se guardan diferidos (core.profile_sync)
+    """
+    telegram_id = str(data['id'])
+    user, created = User.objects.get_or_create(
+        telegram_chat_id=telegram_id,
+        defaults={
+            'telegram_username': data['username'] or '',
+            'first_name': data['first_name'] or '',
+            'last_name': data['last_name'] or '',
+            'email': f'telegram_{telegram_id}@temp.com',
+            'role': 'CUSTOMER',
+            'is_telegram_verified': True,
+        },
+    )
+    if not created:
+        queue_profile_update(user, profile_changes(user, data))
+    return user
+
+
+def _session_ttl(data):
+    ttl = settings.TELEGRAM_AUTH_CACHE_TTL
+    if settings.TELEGRAM_INIT_DATA_MAX_AGE:
+        ttl = min(ttl, data['auth_date'] + settings.TELEGRAM_INIT_DATA_MAX_AGE - time.time())
+    return ttl
+
+
+def authenticate_init_data(init_data):
+    """(user, datos) para un initData válido, o None"""
+    key = hashlib.sha256(init_data.encode()).digest()
+    session = cache_lookup('telegram_session', _sessions.get(key))
+    if session is None:
+        bot_token = settings.TELEGRAM_BOT_TOKEN
+        data = validate_init_data(init_data, bot_token) if bot_token else None
+        if not data or not data.get('id'):
+            return None
+        user = sync_telegram_user(data)
+        cache.set(user_cache_key(user.pk), user, settings.TELEGRAM_AUTH_CACHE_TTL)
+        _sessions.set(key, (user.pk, data), _session_ttl(data))
+    else:
+        user_id, data = session
+        user = cache_lookup('telegram_user', cache.get(user_cache_key(user_id)))
+        if user is None:
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                _sessions.pop(key)
+                return authenticate_init_data(init_data)
+            cache.set(user_cache_key(user_id), user, settings.TELEGRAM_AUTH_CACHE_TTL)
+
+    if not user.is_active:
+        return None
+    # Copia por request: los cambios de una vista no se filtran a otras
+    return copy.copy(user), data
+
+
+def authenticate_request(request):
+    """Validar X-Telegram-Init-Data una sola vez por request (memoizado en el request)"""
+    request = getattr(request, '_request', request)
+    result = getattr(request, REQUEST_ATTR, _MISSING)
+    if result is _MISSING:
+        init_data = request.META.get('HTTP_X_TELEGRAM_INIT_DATA')
+        with profiling.span('auth'):
+            result = authenticate_init_data(init_data) if init_data else None
+        setattr(request, REQUEST_ATTR, result)
+    return result
@@ -1,3 +1,446 @@
-from django.test import TestCase
+import datetime
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from menu.models import Category
+
+from . import log, metrics, profile_sync, profiling, telegram
+from .middleware import CompressionMiddleware, ProfilingMiddleware, RequestIdMiddleware
+from .models import User
+from .renderers import FastJSONRenderer
+from .throttling import consume
+from .user_cache import user_cache_key
+
+TEST_BOT_TOKEN = '123456:TEST-TOKEN'
+
+
+def telegram_init_data(tg_id=1001, first_name='Ana', username='ana', bot_token=TEST_BOT_TOKEN, auth_date=None):
+    """initData firmado igual que lo hace Telegram para la Mini App"""
+    data = {
+        'auth_date': str(auth_date or int(time.time())),
+        'query_id': 'AAHdF6IQAAAAAN0XohDhrOrc',
+        'user': json.dumps({
+            'id': tg_id,
+            'first_name': first_name,
+            'last_name': '',
+            'username': username,
+        }),
+    }
+    data_check_string = '\n'.join(f"{key}={data[key]}" for key in sorted(data))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    data['hash'] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(data)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN=TEST_BOT_TOKEN)
+class ReplicaRoutingTests(TestCase):
+    """Primaria + réplica local: cada base tiene datos distintos a propósito"""
+
+    databases = {'default', 'replica_0'}
+    url = '/api/menu/categories/'
+
+    def setUp(self):
+        cache.clear()
+        telegram.clear_cache()
+        Category.objects.using('default').create(name='En primaria')
+        Category(name='En réplica').save(using='replica_0')
+        # Usuario ya registrado (la primera request no escribe)
+        self.client.get(self.url, HTTP_X_TELEGRAM_INIT_DATA=telegram_init_data())
+        self.client.cookies.clear()
+
+    def get_names(self, tg_id=1001):
+        response = self.client.get(
+            self.url, HTTP_X_TELEGRAM_INIT_DATA=telegram_init_data(tg_id=tg_id)
+        )
+        return response, [category['name'] for category in response.json()]
+
+    def test_safe_read_goes_to_replica(self):
+        response, names = self.get_names()
+
+        self.assertEqual(names, ['En réplica'])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_recent_write_cookie_pins_primary(self):
+        self.client.cookies[settings.REPLICA_PIN_COOKIE] = '1'
+
+        response, names = self.get_names()
+
+        self.assertEqual(names, ['En primaria'])
+
+    def test_write_in_same_request_pins_primary(self):
+        # Usuario nuevo de Telegram: el middleware lo crea en esta request
+        response, names = self.get_names(tg_id=2002)
+
+        self.assertEqual(names, ['En primaria'])
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN=TEST_BOT_TOKEN)
+class TelegramAuthTests(TestCase):
+    """initData se valida una vez por request y las repetidas salen de la cache"""
+
+    url = '/api/menu/categories/'
+
+    def setUp(self):
+        cache.clear()
+        telegram.clear_cache()
+
+    def get(self, init_data):
+        return self.client.get(self.url, HTTP_X_TELEGRAM_INIT_DATA=init_data)
+
+    def test_repeat_request_skips_queries_and_hmac(self):
+        init_data = telegram_init_data()
+        with mock.patch('core.telegram.hmac.new', wraps=telegram.hmac.new) as new_hmac:
+            self.assertEqual(self.get(init_data).status_code, 200)
+        # Middleware + autenticación de DRF: una sola validación
+        self.assertEqual(new_hmac.call_count, 1)
+
+        with mock.patch('core.telegram.hmac.new') as new_hmac, self.assertNumQueries(1):
+            # La única query es el listado de categorías
+            self.assertEqual(self.get(init_data).status_code, 200)
+        new_hmac.assert_not_called()
+
+    def test_profile_changes_are_written_behind(self):
+        self.get(telegram_init_data(username='ana'))
+        user = User.objects.get(telegram_chat_id='1001')
+        buffer = profile_sync.ProfileSyncBuffer(flush_interval=3600)
+
+        with mock.patch('core.profile_sync.get_buffer', return_value=buffer), \
+                CaptureQueriesContext(connection) as queries:
+            self.get(telegram_init_data(username='ana_nueva', auth_date=int(time.time()) - 60))
+        # Usuario existente: solo lecturas en la request
+        self.assertFalse([q for q in queries.captured_queries if not q['sql'].startswith('SELECT')])
+        buffer._timer.cancel()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 1)
+        user.refresh_from_db()
+        self.assertEqual(user.telegram_username, 'ana_nueva')
+
+    def test_user_changes_reach_every_worker(self):
+        init_data = telegram_init_data()
+        self.assertEqual(self.get(init_data).status_code, 200)
+        user = User.objects.get(telegram_chat_id='1001')
+        # El usuario queda en la cache compartida, no en la memoria del proceso
+        self.assertEqual(cache.get(user_cache_key(user.pk)), user)
+
+        # Desactivarlo en cualquier worker borra la entrada que leen todos
+        user.is_active = False
+        user.save()
+        self.assertIsNone(cache.get(user_cache_key(user.pk)))
+        self.assertEqual(self.get(init_data).status_code, 403)
+
+    def test_expired_or_tampered_init_data_rejected(self):
+        expired = telegram_init_data(auth_date=int(time.time()) - 2 * 24 * 3600)
+        tampered = telegram_init_data().replace('ana', 'eve')
+
+        self.assertEqual(self.get(expired).status_code, 403)
+        self.assertEqual(self.get(tampered).status_code, 403)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """br/gzip negociado por Accept-Encoding, sin tocar cuerpos chicos ni ya comprimidos"""
+
+    def process(self, response, accept='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_large_json_is_compressed(self):
+        payload = {'items': [{'id': i, 'name': f'Producto {i}'} for i in range(200)]}
+        response = self.process(JsonResponse(payload), accept='gzip;q=1, br;q=0')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), payload)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_small_and_binary_bodies_untouched(self):
+        small = self.process(JsonResponse({'ok': True}))
+        image = self.process(HttpResponse(b'x' * 5000, content_type='image/webp'))
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+
+    def test_streaming_response_compressed_per_chunk(self):
+        chunks = [b'{"row": %d}\n' % i * 50 for i in range(20)]
+        response = self.process(StreamingHttpResponse(iter(chunks), content_type='application/json'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Misma salida que el JSONRenderer de DRF (salvo Decimal sueltos → string)"""
+
+    def test_matches_drf_output(self):
+        data = {
+            'id': 7,
+            'name': 'Salteña \u2028 picante',
+            'created_at': datetime.datetime(2025, 1, 17, 12, 30, 5, 123456, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2025, 1, 17),
+            'items': [{'price': '45.00', 'tags': ('a', 'b')}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_decimal_keeps_precision(self):
+        self.assertEqual(FastJSONRenderer().render({'total': Decimal('0.10')}), b'{"total":"0.10"}')
+
+    def test_indent_falls_back_to_drf(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(rendered, b'{\n    "a": 1\n}')
+
+
+class StructuredLoggingTests(SimpleTestCase):
+    """JSON por línea con request id, muestreo por logger y secretos ocultos"""
+
+    def test_record_carries_request_id_and_redacts_secrets(self):
+        stream = io.StringIO()
+        handler = log.QueueHandler(stream)
+        handler.setFormatter(log.JsonFormatter())
+        handler.addFilter(log.RequestIdFilter())
+        logger = logging.getLogger('core.tests.structured')
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+
+        def view(request):
+            logger.debug(
+                "Bearer eyJhbGciOi.eyJzdWIiOjF9.c2ln initData user=%7B%22id%22%3A1%7D&hash=abc123",
+                extra={'items': 2, 'token': 'secreto', 'data': {'password': 'x', 'notes': 'sin cebolla'}},
+            )
+            return HttpResponse()
+
+        try:
+            response = RequestIdMiddleware(view)(RequestFactory().get('/'))
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['request_id'], response['X-Request-ID'])
+        self.assertEqual(entry['level'], 'DEBUG')
+        self.assertEqual(entry['items'], 2)
+        self.assertEqual(entry['token'], log.REDACTED)
+        self.assertEqual(entry['data'], {'password': log.REDACTED, 'notes': 'sin cebolla'})
+        for secret in ('eyJhbGciOi', 'abc123', '%7B%22id'):
+            self.assertNotIn(secret, entry['message'])
+        self.assertIsNone(log.request_id.get())
+
+    def test_sampling_is_per_logger_and_keeps_warnings(self):
+        sampling = log.SamplingFilter({'orders': 0.0, 'orders.quotes': 1.0})
+
+        def passes(name, level=logging.DEBUG):
+            return sampling.filter(logging.LogRecord(name, level, '', 0, 'msg', None, None))
+
+        self.assertFalse(passes('orders.views'))
+        self.assertTrue(passes('orders.views', logging.WARNING))
+        self.assertTrue(passes('orders.quotes'))
+        self.assertTrue(passes('menu.views'))
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0)
+class ProfilingMiddlewareTests(TestCase):
+    """Server-Timing con SQL y tramos marcados, solo en requests muestreados"""
+
+    def setUp(self):
+        profiling.slow_requests.clear()
+
+    def view(self, request):
+        list(User.objects.all())
+        list(Category.objects.all())
+        with profiling.span('serialize'):
+            with profiling.span('serialize'):
+                pass
+        return JsonResponse({'ok': True})
+
+    def test_forced_request_reports_server_timing(self):
+        response = ProfilingMiddleware(self.view)(RequestFactory().get('/', HTTP_X_PROFILE='1'))
+
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('desc="2"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        [entry] = profiling.slow_requests.snapshot()['GET <sin ruta>']
+        self.assertEqual((entry['sql_count'], entry['serialize_count']), (2, 1))
+
+    def test_unsampled_request_untouched(self):
+        response = ProfilingMiddleware(self.view)(RequestFactory().get('/'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(profiling.slow_requests.snapshot(), {})
+
+    def test_disabled_middleware_not_installed(self):
+        with override_settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(self.view)
+
+
+class MetricsTests(TestCase):
+    """Registro compartido entre procesos por archivos y expuesto en formato Prometheus"""
+
+    def test_process_files_are_aggregated(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry(directory)
+        delivered = metrics.Counter('orders_total', 'Pedidos', ('status',), registry=registry)
+        latency = metrics.Histogram('latency_seconds', 'Latencia', buckets=(0.1, 1), registry=registry)
+
+        # Otro worker: mismo directorio, otro pid
+        with mock.patch('core.metrics.os.getpid', return_value=999_999):
+            delivered.inc('delivered', amount=3)
+            latency.observe(0.5)
+            latency.observe(5)
+        registry.clear()
+        delivered.inc('delivered', amount=2)
+        latency.observe(0.05)
+
+        text = registry.render()
+        self.assertIn('orders_total{status="delivered"} 5', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count 3', text)
+        self.assertIn('# TYPE latency_seconds histogram', text)
+
+    def test_dead_workers_are_archived(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry(directory)
+        delivered = metrics.Counter('orders_total', 'Pedidos', ('status',), registry=registry)
+
+        # Dos workers que terminaron con el mismo pid: archivos distintos
+        for amount in (3, 4):
+            worker = metrics.Registry(directory)
+            with mock.patch('core.metrics.os.getpid', return_value=999_999):
+                worker.inc('orders_total', ('delivered',), amount)
+        delivered.inc('delivered')
+        self.assertEqual(len([name for name in os.listdir(directory) if name.startswith('999999-')]), 2)
+
+        with mock.patch('core.metrics._pid_alive', side_effect=lambda pid: pid != 999_999):
+            self.assertIn('orders_total{status="delivered"} 8', registry.render())
+            # Sumados al archivo y borrados: el total no retrocede
+            self.assertFalse([name for name in os.listdir(directory) if name.startswith('999999-')])
+            self.assertIn('orders_total{status="delivered"} 8', registry.render())
+
+    def test_endpoint_is_staff_only_and_reports_routes(self):
+        self.client.get('/api/menu/products/available/')
+
+        self.assertEqual(self.client.get('/admin/metrics/').status_code, 302)
+
+        staff = User.objects.create_user(email='staff@example.com', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/admin/metrics/')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn('http_requests_total{route="product-available",method="GET",status="200"}', text)
+        self.assertIn('http_request_duration_seconds_bucket{route="product-available",method="GET",le="+Inf"}', text)
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_scraper_token(self):
+        response = self.client.get('/admin/metrics/', HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('cache_requests_total', response.content.decode())
+
+
+def with_throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottlingTests(TestCase):
+    """Token bucket en la cache: ráfaga hasta la capacidad y recarga continua"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_refills_continuously(self):
+        self.assertEqual([consume('bucket', 3, 60, now=0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(consume('bucket', 3, 60, now=0), 20)
+        self.assertAlmostEqual(consume('bucket', 3, 60, now=5), 15)
+        self.assertEqual(consume('bucket', 3, 60, now=20), 0)
+
+    @with_throttle_rates(telegram_auth='2/min')
+    @override_settings(TELEGRAM_BOT_SECRET='bot-secret')
+    def test_telegram_auth_sheds_load_before_queries(self):
+        def auth(chat_id):
+            return self.client.post(
+                '/api/users/telegram/auth/',
+                {'telegram_chat_id': chat_id},
+                content_type='application/json',
+                HTTP_X_BOT_TOKEN='bot-secret',
+            )
+
+        self.assertEqual(auth('555').status_code, 201)
+        self.assertEqual(auth('555').status_code, 200)
+        with self.assertNumQueries(0):
+            response = auth('555')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Otro id de Telegram tiene su propio balde
+        self.assertEqual(auth('556').status_code, 201)
+
+    @with_throttle_rates(telegram_auth='2/min')
+    @override_settings(TELEGRAM_BOT_SECRET='bot-secret')
+    def test_untrusted_body_uses_ip_bucket(self):
+        def auth(body, **headers):
+            return self.client.post('/api/users/telegram/auth/', body, content_type='application/json', **headers)
+
+        # Body que no es un objeto: 400 (sin id, cuenta para el balde de la IP)
+        self.assertEqual(auth([{'telegram_chat_id': '555'}], HTTP_X_BOT_TOKEN='bot-secret').status_code, 400)
+        # Sin el secreto del bot el body no elige el balde: se limita por IP
+        statuses = [auth({'telegram_chat_id': '555'}).status_code for _ in range(2)]
+        self.assertEqual(statuses, [403, 429])
+        # ...y el balde del usuario 555 sigue intacto
+        self.assertEqual(auth({'telegram_chat_id': '555'}, HTTP_X_BOT_TOKEN='bot-secret').status_code, 201)
+
+
+class StartupTests(SimpleTestCase):
+    """Arranque: numpy y qrcode no se importan al cargar la app"""
+
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        # lazy_import registra el módulo pero no lo ejecuta: sus submódulos no se cargan
+        code = (
+            "import sys, django; django.setup(); import config.urls; "
+            "print(','.join(m for m in ('numpy.linalg', 'qrcode.main', 'PIL.Image') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings'},
+        )
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_parse_importtime(self):
+        from core.management.commands.profile_startup import parse_importtime
+
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:       800 |       2500 | django\n"
+        )
+        self.assertEqual(parse_importtime(output), [('_io', 120, 120, 1), ('django', 800, 2500, 0)])
@@ -0,0 +1,154 @@
+# core/throttling.py
+"""
+Throttling con token bucket compartido entre workers
+
+Cada clave (scope + usuario / id de Telegram / IP) es un balde de N tokens
+que se recarga de forma continua a N por período ('10/min': ráfaga de 10,
+luego uno cada 6 s). Se implementa como GCRA: por clave se guarda un solo
+número en la cache de Django (por defecto en archivos, compartida entre
+los workers de gunicorn): el instante teórico en que el balde vuelve a
+estar lleno.
+
+El chequeo corre en APIView.initial(), antes del handler: un cliente que
+se pasó del límite recibe 429 (con Retry-After) sin ningún get_or_create ni
+transacción de pedido. La lectura/escritura de la cache no es atómica:
+dos requests simultáneos pueden gastar el mismo token (igual que los
+throttles de DRF), lo que no cambia el orden de magnitud del límite.
+
+Los límites se configuran por scope en REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+"""
+
+import math
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics, telegram
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' → (10, 60.0): capacidad del balde y segundos para llenarlo"""
+    num, period = rate.split('/')
+    return int(num), float(PERIODS[period[0]])
+
+
+def consume(key, capacity, period, now=None):
+    """
+    Tomar un token del balde `key`
+
+    Returns:
+        0 si se permitió, o los segundos que faltan para el próximo token
+    """
+    now = time.time() if now is None else now
+    interval = period / capacity
+    full_at = max(cache.get(key) or now, now)
+    new_full_at = full_at + interval
+    wait = new_full_at - period - now
+    if wait > 0:
+        return wait
+    # La entrada vence cuando el balde vuelve a estar lleno (es igual a no tenerla)
+    cache.set(key, new_full_at, timeout=math.ceil(new_full_at - now))
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle de DRF con token bucket; las subclases definen get_ident_key()
+
+    get_ident_key() devuelve None para no limitar el request.
+    """
+
+    scope = None
+    cache_prefix = 'throttle'
+
+    def __init__(self):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        if self.scope not in rates:
+            raise ImproperlyConfigured(f"Falta DEFAULT_THROTTLE_RATES['{self.scope}']")
+        self.rate = rates[self.scope]
+        self.wait_seconds = None
+
+    def get_ident_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        capacity, period = parse_rate(self.rate)
+        self.wait_seconds = consume(f'{self.cache_prefix}:{self.scope}:{ident}', capacity, period)
+        if self.wait_seconds:
+            metrics.throttled_requests.inc(self.scope)
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Por IP (respeta NUM_PROXIES para X-Forwarded-For)"""
+
+    def get_ident_key(self, request, view):
+        return f'ip:{self.get_ident(request)}'
+
+
+class UserThrottle(TokenBucketThrottle):
+    """Por usuario autenticado (por IP si es anónimo)"""
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class TelegramIdThrottle(TokenBucketThrottle):
+    """
+    Por id de Telegram: el del initData ya validado por el middleware o,
+    en el endpoint del bot, el telegram_chat_id del body
+
+    El body solo se usa si el request trae el secreto del bot: si no,
+    cualquiera podría gastar el balde de otro usuario. Sin id confiable se
+    limita por IP.
+    """
+
+    def get_ident_key(self, request, view):
+        data = getattr(request._request, 'telegram_data', None)
+        if data:
+            telegram_id = data['id']
+        elif telegram.is_bot_request(request) and isinstance(request.data, dict):
+            telegram_id = request.data.get('telegram_chat_id')
+        else:
+            telegram_id = None
+        if not telegram_id:
+            return f'ip:{self.get_ident(request)}'
+        return f'tg:{telegram_id}'
+
+
+# Scopes de los endpoints caros
+class LoginThrottle(IPThrottle):
+    scope = 'login'
+
+
+class RegisterThrottle(IPThrottle):
+    scope = 'register'
+
+
+class TelegramAuthIPThrottle(IPThrottle):
+    scope = 'telegram_auth_ip'
+
+
+class TelegramAuthThrottle(TelegramIdThrottle):
+    scope = 'telegram_auth'
+
+
+class OrderCreateThrottle(UserThrottle):
+    scope = 'order_create'
@@ -0,0 +1,26 @@
+# core/user_cache.py
+"""
+Usuarios cacheados para la autenticación JWT (core.auth.CachedJWTAuthentication)
+
+Se descartan al guardar o borrar el usuario (cambio de rol, desactivación,
+contraseña) y cuando se actualizan en bloque sin señales (core.profile_sync).
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_users(user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_saved_user(sender, instance, **kwargs):
+    forget_users([instance.pk])
@@ -1,11 +1,20 @@
 # users/views.py
+import hmac
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_safe
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import metrics, profiling, telegram
 from .models import User
+from .profile_sync import queue_profile_update
+from .throttling import LoginThrottle, RegisterThrottle, TelegramAuthIPThrottle, TelegramAuthThrottle
 from .serializers import (
     EmailLoginSerializer,
     UserSerializer,
@@ -17,6 +26,7 @@ from .serializers import (
 class LoginView(generics.GenericAPIView):
     serializer_class = EmailLoginSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [LoginThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -35,6 +45,7 @@ class LoginView(generics.GenericAPIView):
 class RegisterView(generics.CreateAPIView):
     serializer_class = UserRegisterSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [RegisterThrottle]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -91,18 +102,22 @@ class TelegramAuthView(APIView):
     Requiere un token secreto en lugar de JWT
     """
     permission_classes = [AllowAny]
+    throttle_classes = [TelegramAuthIPThrottle, TelegramAuthThrottle]
     
     def post(self, request):
-        # ✅ Validar token secreto del bot
-        bot_token = request.headers.get('X-Bot-Token')
-        from django.conf import settings
-        
-        if bot_token != getattr(settings, 'TELEGRAM_BOT_SECRET', 'your-secret-token'):
+        # ✅ Validar token secreto del bot (sin TELEGRAM_BOT_SECRET no se acepta ninguno)
+        if not telegram.is_bot_request(request):
             return Response(
                 {"error": "Token de bot inválido"}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "Se esperaba un objeto JSON"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         telegram_chat_id = request.data.get('telegram_chat_id')
         telegram_username = request.data.get('telegram_username', '')
         
@@ -124,11 +139,35 @@ class TelegramAuthView(APIView):
         )
         
         if not created:
-            # Actualizar username si cambió
-            user.telegram_username = telegram_username
-            user.save()
+            # Actualizar username si cambió (se guarda diferido, sin escribir en la request)
+            if user.telegram_username != telegram_username:
+                queue_profile_update(user, {'telegram_username': telegram_username})
         
         return Response({
             "user": UserSerializer(user).data,
             "created": created
-        }, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
\ No newline at end of file
+        }, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
+
+
+@require_safe
+@staff_member_required
+def slow_requests(request):
+    """Requests perfilados más lentos por endpoint (de este proceso, ver core.profiling)"""
+    return JsonResponse({
+        'sample_rate': settings.PROFILING_SAMPLE_RATE if settings.PROFILING_ENABLED else 0,
+        'endpoints': profiling.slow_requests.snapshot(),
+    })
+
+
+def _metrics_response(request):
+    return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@require_safe
+def metrics_view(request):
+    """Métricas en formato Prometheus (staff o Authorization: Bearer METRICS_TOKEN)"""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return _metrics_response(request)
+    return staff_member_required(_metrics_response)(request)
@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, MenuVersion, Product
+from .versions import publish_menu
+from core.routers import ReplicaChangeListMixin
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['name', 'is_active', 'active_products_count', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'description']
@@ -18,34 +20,70 @@ class CategoryAdmin(admin.ModelAdmin):
             'fields': ('is_active',)
         }),
     )
+    
+    def get_queryset(self, request):
+        # Evita un COUNT por fila en la columna active_products_count
+        return super().get_queryset(request).with_active_products_count()
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = [
         'name', 
         'category', 
         'price', 
         'is_available', 
         'is_featured',
+        'stock',
         'preparation_time', 
         'created_at'
     ]
     list_filter = ['category', 'is_available', 'is_featured', 'created_at']
     search_fields = ['name', 'description']
     ordering = ['category__name', 'name']
-    list_editable = ['is_available', 'is_featured', 'price']
+    list_editable = ['is_available', 'is_featured', 'price', 'stock']
     
     fieldsets = (
         ('Información Básica', {
             'fields': ('category', 'name', 'description', 'image_url')
         }),
         ('Precio y Disponibilidad', {
-            'fields': ('price', 'is_available', 'is_featured')
+            'fields': ('price', 'is_available', 'is_featured', 'stock')
         }),
         ('Configuración', {
             'fields': ('preparation_time',)
         }),
     )
     
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(MenuVersion)
+class MenuVersionAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    """Agregar una versión = publicar el borrador actual; las publicadas son de solo lectura"""
+    list_display = ['id', 'product_count', 'notes', 'published_by', 'published_at']
+    ordering = ['-id']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('data').select_related('published_by')
+    
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ['notes', 'checksum', 'product_count', 'published_by', 'published_at']
+        return []
+    
+    def get_fields(self, request, obj=None):
+        if obj is not None:
+            return ['notes', 'checksum', 'product_count', 'published_by', 'published_at']
+        return ['notes']
+    
+    def save_model(self, request, obj, form, change):
+        version = publish_menu(user=request.user, notes=obj.notes)
+        obj.pk = version.pk
+        obj._state.adding = False
+    
+    def has_change_permission(self, request, obj=None):
+        return obj is None
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
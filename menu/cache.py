@@ -0,0 +1,75 @@
+# menu/cache.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from core.compression import compress, negotiate
+from core.metrics import cache_lookup
+from core.renderers import FastJSONRenderer
+from .snapshot import get_menu_assets, get_menu_release
+
+# Se comprime una sola vez por versión: vale la pena la calidad máxima
+CACHED_QUALITY = {'br': 11, 'gzip': 9}
+
+
+def menu_etag(variant, release, assets=0):
+    version, tag = release
+    return f'"{variant}-{version}-{tag}.{assets}"'
+
+
+def etag_matches(etag, if_none_match):
+    """Comparación débil (If-None-Match): W/"x" y "x" son el mismo recurso"""
+    etag = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == etag for candidate in parse_etags(if_none_match))
+
+
+def _response(content, etag, encoding=None):
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = f'W/{etag}' if encoding else etag
+    response['Cache-Control'] = 'public, no-cache'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cached_menu_response(request, variant, build_payload):
+    """
+    Respuesta JSON del menú cacheada por versión publicada
+
+    - If-None-Match con la versión actual → 304 sin tocar BD ni serializers
+    - El JSON ya renderizado se guarda bajo (variante, versión, tag, assets) sin
+      vencimiento: una versión publicada nunca cambia
+    - También se guarda ya comprimido (br/gzip) según lo que acepte el cliente:
+      los hits repetidos no vuelven a comprimir
+    """
+    release = get_menu_release()
+    assets = get_menu_assets()
+    etag = menu_etag(variant, release, assets)
+
+    if etag_matches(etag, request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    key = f'menu:payload:{variant}:{release[0]}:{release[1]}:{assets}'
+    encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if encoding is not None:
+        compressed = cache_lookup('menu_payload_compressed', cache.get(f'{key}:{encoding}'))
+        if compressed is not None:
+            return _response(compressed, etag, encoding)
+
+    content = cache_lookup('menu_payload', cache.get(key))
+    if content is None:
+        content = FastJSONRenderer().render(build_payload())
+        cache.set(key, content, timeout=None)
+
+    if encoding is None or len(content) < settings.COMPRESSION_MIN_SIZE:
+        return _response(content, etag)
+
+    compressed = compress(content, encoding, quality=CACHED_QUALITY[encoding])
+    cache.set(f'{key}:{encoding}', compressed, timeout=None)
+    return _response(compressed, etag, encoding)
@@ -0,0 +1,314 @@
+# menu/catalog.py
+"""
+Importación masiva de catálogos (CSV / JSON / JSON Lines)
+
+- Las filas se leen en streaming, nunca se carga el archivo completo
+- Se comparan contra la BD por clave natural (categoría, nombre) usando
+  una sola lectura inicial; las filas sin cambios no generan escrituras
+- Altas y cambios se aplican por lotes con bulk_create(update_conflicts=True)
+- Con prune, los productos que ya no están en el catálogo se eliminan,
+  salvo los que tienen órdenes (OrderItem → PROTECT): esos se desactivan
+- Los cambios van al borrador; con publish se publica una versión al final
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Product
+
+# Columnas que el catálogo puede actualizar (además de category y name)
+PRODUCT_FIELDS = ['description', 'price', 'image_url', 'is_available', 'preparation_time', 'is_featured']
+PRODUCT_DEFAULTS = {
+    'description': '',
+    'image_url': '',
+    'is_available': True,
+    'preparation_time': 15,
+    'is_featured': False,
+}
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'si', 'sí', 'x'}
+CHUNK_SIZE = 1000
+
+
+class CatalogError(ValueError):
+    pass
+
+
+# -------------------------------------------------------
+# Lectura
+# -------------------------------------------------------
+def iter_csv(fh):
+    yield from csv.DictReader(fh)
+
+
+def iter_json(fh, chunk_size=64 * 1024):
+    """
+    Un array JSON de objetos (decodificado por partes) o JSON Lines
+    """
+    decoder = json.JSONDecoder()
+    buffer = fh.read(chunk_size)
+    start = len(buffer) - len(buffer.lstrip())
+
+    if buffer[start:start + 1] != '[':
+        # JSON Lines: un objeto por línea
+        for line in _lines(buffer, fh, chunk_size):
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    position = start + 1
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CatalogError("JSON incompleto o inválido")
+            chunk = fh.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield row
+
+
+def _lines(buffer, fh, chunk_size):
+    while True:
+        *lines, buffer = buffer.split('\n')
+        yield from lines
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            yield buffer
+            return
+        buffer += chunk
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+    'jsonl': iter_json,
+}
+
+
+def read_catalog(path, format=None):
+    """Filas (dict) del archivo; el formato se deduce de la extensión"""
+    path = Path(path)
+    format = format or path.suffix.lstrip('.').lower()
+    reader = READERS.get(format)
+    if reader is None:
+        raise CatalogError(f"Formato no soportado: {format}")
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        yield from reader(fh)
+
+
+# -------------------------------------------------------
+# Normalización
+# -------------------------------------------------------
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return _text(value).lower() in TRUE_VALUES
+
+
+def _price(value):
+    try:
+        price = Decimal(_text(value)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise CatalogError(f"Precio inválido: {value!r}")
+    if price < 0:
+        raise CatalogError(f"Precio negativo: {value!r}")
+    return price
+
+
+def _preparation_time(value):
+    try:
+        minutes = int(_text(value))
+    except ValueError:
+        raise CatalogError(f"Tiempo de preparación inválido: {value!r}")
+    if minutes < 1:
+        raise CatalogError("El tiempo de preparación debe ser al menos 1 minuto")
+    return minutes
+
+
+PARSERS = {
+    'description': _text,
+    'price': _price,
+    'image_url': _text,
+    'is_available': _bool,
+    'preparation_time': _preparation_time,
+    'is_featured': _bool,
+}
+
+
+def parse_row(row):
+    """
+    (categoría, descripción de la categoría, nombre, {campo: valor})
+    solo con los campos presentes en la fila
+    """
+    category = _text(row.get('category'))
+    category_description = row.get('category_description')
+    name = _text(row.get('name'))
+    if not category or not name:
+        raise CatalogError("Faltan 'category' o 'name'")
+
+    values = {}
+    for name_field, parser in PARSERS.items():
+        value = row.get(name_field)
+        # Vacío en columnas no textuales = no informado
+        if value is None or (value == '' and name_field not in ('description', 'image_url')):
+            continue
+        values[name_field] = parser(value)
+    if category_description is not None:
+        category_description = _text(category_description)
+    return category, category_description, name, values
+
+
+# -------------------------------------------------------
+# Importación
+# -------------------------------------------------------
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    deactivated: int = 0
+    categories_created: int = 0
+    categories_updated: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated or self.deleted
+                    or self.deactivated or self.categories_created or self.categories_updated)
+
+
+class CatalogImporter:
+
+    def __init__(self, chunk_size=CHUNK_SIZE, prune=False, dry_run=False, publish=False):
+        self.chunk_size = chunk_size
+        self.prune = prune
+        self.dry_run = dry_run
+        self.publish = publish
+
+    def run(self, rows):
+        self.result = ImportResult()
+        with transaction.atomic():
+            self._load()
+            for line, row in enumerate(rows, start=1):
+                try:
+                    self._add(*parse_row(row))
+                except CatalogError as exc:
+                    self.result.errors.append((line, str(exc)))
+            self._flush()
+            if self.prune:
+                self._prune()
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+            elif self.publish:
+                # Una sola versión nueva para toda la importación (ninguna si no cambió nada)
+                from .versions import publish_menu
+
+                publish_menu(notes='Importación de catálogo')
+        return self.result
+
+    def _load(self):
+        """Única lectura de lo existente: categorías y productos por clave natural"""
+        self.categories = {
+            name: [category_id, description]
+            for category_id, name, description in Category.objects.values_list('id', 'name', 'description')
+        }
+        self.products = {}
+        self.product_ids = {}
+        for product_id, category_id, name, *values in Product.objects.values_list(
+            'id', 'category_id', 'name', *PRODUCT_FIELDS
+        ):
+            key = (category_id, name)
+            self.products[key] = dict(zip(PRODUCT_FIELDS, values))
+            self.product_ids[key] = product_id
+        self.seen = set()
+        self.pending = {}
+
+    def _category_id(self, name, description=None):
+        """Las categorías son pocas: se crean/actualizan de a una la primera vez que aparecen"""
+        category = self.categories.get(name)
+        if category is None:
+            created = Category.objects.create(name=name, description=description or '')
+            category = self.categories[name] = [created.id, created.description]
+            self.result.categories_created += 1
+        elif description is not None and description != category[1]:
+            Category.objects.filter(id=category[0]).update(description=description, updated_at=timezone.now())
+            category[1] = description
+            self.result.categories_updated += 1
+        return category[0]
+
+    def _add(self, category_name, category_description, name, values):
+        key = (self._category_id(category_name, category_description), name)
+        current = self.products.get(key)
+
+        if current is None:
+            if 'price' not in values:
+                raise CatalogError(f"Producto nuevo sin precio: {name}")
+            merged = {**PRODUCT_DEFAULTS, **values}
+            self.result.created += 1
+        else:
+            merged = {**current, **values}
+            if merged == current:
+                if key not in self.seen:
+                    self.result.unchanged += 1
+                self.seen.add(key)
+                return
+            if key not in self.seen and key in self.product_ids:
+                self.result.updated += 1
+
+        self.seen.add(key)
+        self.products[key] = merged
+        self.pending[key] = Product(category_id=key[0], name=name, **merged)
+        if len(self.pending) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        Product.objects.bulk_create(
+            list(self.pending.values()),
+            update_conflicts=True,
+            unique_fields=['category', 'name'],
+            update_fields=PRODUCT_FIELDS + ['updated_at'],
+        )
+        self.pending.clear()
+
+    def _prune(self):
+        from orders.models import OrderItem
+
+        missing = [product_id for key, product_id in self.product_ids.items() if key not in self.seen]
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            referenced = set(
+                OrderItem.objects.filter(product_id__in=chunk).values_list('product_id', flat=True).distinct()
+            )
+            deletable = [product_id for product_id in chunk if product_id not in referenced]
+            if deletable:
+                self.result.deleted += Product.objects.filter(id__in=deletable).delete()[1].get('menu.Product', 0)
+            if referenced:
+                self.result.deactivated += Product.objects.filter(
+                    id__in=referenced, is_available=True
+                ).update(is_available=False, updated_at=timezone.now())
+
+
+def import_catalog(rows, **options):
+    return CatalogImporter(**options).run(rows)
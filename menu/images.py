@@ -0,0 +1,257 @@
+# menu/images.py
+"""
+Miniaturas de las imágenes de productos
+
+- Cada image_url se descarga una sola vez con el fetcher configurado
+  (HTTP por defecto; LocalFileFetcher para desarrollo/tests)
+- Pillow genera una miniatura WebP y una JPEG por tamaño en un worker
+  en segundo plano
+- Se guardan direccionadas por contenido: objects/<sha del original>/<tamaño>.<formato>
+  y refs/<sha de la URL> apunta al contenido, así dos URLs con la misma
+  imagen comparten archivos
+- Los refs leídos quedan en memoria: serializar productos con miniaturas
+  no lee el disco por producto
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Ancho máximo en px de cada tamaño
+THUMBNAIL_SIZES = {
+    'sm': 160,
+    'md': 320,
+    'lg': 640,
+}
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+}
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+class HttpImageFetcher:
+    """Descarga el original por HTTP"""
+
+    timeout = 15
+
+    def fetch(self, url):
+        import requests
+
+        try:
+            response = requests.get(url, timeout=self.timeout, stream=True)
+            response.raise_for_status()
+            content = response.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+        except requests.RequestException as exc:
+            raise ImageFetchError(str(exc)) from exc
+        if len(content) > MAX_SOURCE_BYTES:
+            raise ImageFetchError(f"Imagen demasiado grande: {url}")
+        return content
+
+
+class LocalFileFetcher:
+    """Lee el original de un directorio local usando el último segmento de la URL"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.IMAGE_FETCHER_ROOT)
+
+    def fetch(self, url):
+        name = os.path.basename(urlparse(url).path)
+        candidates = [self.root / name] + sorted(self.root.glob(f'{name}.*'))
+        for path in candidates:
+            if name and path.is_file():
+                return path.read_bytes()
+        raise ImageFetchError(f"No existe {name} en {self.root}")
+
+
+def get_fetcher():
+    return import_string(settings.IMAGE_FETCHER)()
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def _root():
+    return Path(settings.THUMBNAIL_ROOT)
+
+
+def _ref_path(key):
+    return _root() / 'refs' / key
+
+
+def _object_dir(content_hash):
+    return _root() / 'objects' / content_hash[:2] / content_hash
+
+
+# refs ya leídos {clave de URL: hash del contenido}. Un ref no cambia una vez
+# escrito, así que no vence; los que faltan no se guardan (otro worker puede
+# generarlos en cualquier momento)
+_resolved = OrderedDict()
+_resolved_lock = threading.Lock()
+RESOLVED_CACHE_SIZE = 10000
+
+
+def resolve(key):
+    """Hash del contenido para una URL ya procesada (o None)"""
+    with _resolved_lock:
+        content_hash = _resolved.get(key)
+        if content_hash is not None:
+            _resolved.move_to_end(key)
+            return content_hash
+    try:
+        content_hash = _ref_path(key).read_text().strip() or None
+    except OSError:
+        return None
+    if content_hash:
+        with _resolved_lock:
+            _resolved[key] = content_hash
+            while len(_resolved) > RESOLVED_CACHE_SIZE:
+                _resolved.popitem(last=False)
+    return content_hash
+
+
+def thumbnail_path(key, size, fmt):
+    if size not in THUMBNAIL_SIZES or fmt not in THUMBNAIL_FORMATS:
+        return None, None
+    content_hash = resolve(key) if key.isalnum() else None
+    if content_hash is None:
+        return None, None
+    path = _object_dir(content_hash) / f'{size}.{fmt}'
+    return (path, content_hash) if path.is_file() else (None, None)
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def render_thumbnails(source):
+    """{(tamaño, formato): bytes} a partir del original"""
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(source)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    rendered = {}
+    for size, width in THUMBNAIL_SIZES.items():
+        thumb = image.copy()
+        # Sin agrandar imágenes chicas; el alto sigue la proporción
+        thumb.thumbnail((width, width * 4), Image.LANCZOS)
+        for fmt, (pil_format, options) in THUMBNAIL_FORMATS.items():
+            buffer = BytesIO()
+            thumb.save(buffer, format=pil_format, **options)
+            rendered[(size, fmt)] = buffer.getvalue()
+    return rendered
+
+
+def process_image(url, fetcher=None):
+    """Descargar, generar y guardar las miniaturas de una URL (idempotente)"""
+    key = url_key(url)
+    if resolve(key):
+        return key
+
+    source = (fetcher or get_fetcher()).fetch(url)
+    content_hash = hashlib.sha256(source).hexdigest()
+    object_dir = _object_dir(content_hash)
+
+    if not all((object_dir / f'{size}.{fmt}').is_file()
+               for size in THUMBNAIL_SIZES for fmt in THUMBNAIL_FORMATS):
+        for (size, fmt), data in render_thumbnails(source).items():
+            _write_atomic(object_dir / f'{size}.{fmt}', data)
+
+    _write_atomic(_ref_path(key), content_hash.encode())
+    return key
+
+
+class ThumbnailWorker:
+    """Procesa URLs en segundo plano, sin repetir las que ya están en curso"""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnails')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def enqueue(self, url):
+        if not url or resolve(url_key(url)):
+            return False
+        with self._lock:
+            if url in self._pending:
+                return False
+            self._pending.add(url)
+        self._executor.submit(self._run, url)
+        return True
+
+    def _run(self, url):
+        try:
+            process_image(url)
+        except Exception:
+            logger.warning("No se pudo generar miniaturas de %s", url, exc_info=True)
+        else:
+            # Los payloads cacheados del menú deben incluir las miniaturas nuevas
+            from .snapshot import bump_menu_assets
+            bump_menu_assets()
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = ThumbnailWorker(settings.THUMBNAIL_WORKERS)
+        return _worker
+
+
+def thumbnail_urls(image_url):
+    """
+    Rutas de las miniaturas de image_url, o None si aún no existen
+    (en ese caso se encola el procesamiento y el cliente usa image_url)
+
+    Son rutas relativas al sitio: terminan en payloads cacheados por versión
+    del menú que se sirven a cualquier host
+    """
+    if not image_url:
+        return None
+
+    key = url_key(image_url)
+    if not resolve(key):
+        if settings.THUMBNAIL_AUTO_ENQUEUE:
+            get_worker().enqueue(image_url)
+        return None
+
+    urls = {}
+    for size in THUMBNAIL_SIZES:
+        urls[size] = {}
+        for fmt in THUMBNAIL_FORMATS:
+            urls[size][fmt] = reverse('product-thumbnail', kwargs={'key': key, 'size': size, 'fmt': fmt})
+    return urls
@@ -0,0 +1,171 @@
+# menu/inventory.py
+"""
+Stock opcional por producto (Product.stock; NULL = sin control)
+
+El descuento de un pedido completo es un solo UPDATE condicional:
+
+    UPDATE products SET stock = stock - q, is_available = (stock - q > 0 AND is_available),
+                        auto_disabled = ... (true si este pedido lo agotó)
+    WHERE id IN (...) AND stock IS NOT NULL AND stock >= q
+
+Si alguna fila con stock no cumple la condición el pedido se rechaza y la
+transacción revierte lo descontado. No hay SELECT ... FOR UPDATE previo: cada fila queda
+bloqueada solo lo que dura la transacción del pedido.
+
+Al cancelar un pedido solo se reactivan los productos que desactivó el
+stock (auto_disabled), no los que apagó el staff. Los cambios de
+disponibilidad se publican agrupados: varias ventas o cancelaciones
+seguidas generan una sola MenuVersion (MENU_AVAILABILITY_PUBLISH_DELAY).
+"""
+
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import BooleanField, Case, F, IntegerField, Q, Value, When
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+class OutOfStock(Exception):
+    """Algún producto no tiene stock suficiente"""
+
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(product.name for product in products)
+        super().__init__(f"Stock insuficiente para: {names}")
+
+
+def aggregate_quantities(lines):
+    """[(product_id, cantidad), ...] → {product_id: cantidad total}"""
+    quantities = Counter()
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+class AvailabilityPublisher:
+    """Junta los pedidos de publicación y publica una sola versión pasado `delay`"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def request(self):
+        if self.delay <= 0:
+            self.publish()
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._publish_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _publish_in_background(self):
+        try:
+            self.publish()
+        except Exception:
+            logger.warning("No se pudo publicar la disponibilidad por stock", exc_info=True)
+        finally:
+            connections.close_all()
+
+    def publish(self):
+        from .versions import publish_availability
+
+        with self._lock:
+            self._timer = None
+        publish_availability(notes='Disponibilidad por stock')
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = AvailabilityPublisher(settings.MENU_AVAILABILITY_PUBLISH_DELAY)
+        return _publisher
+
+
+def schedule_availability_publish():
+    get_publisher().request()
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(lines):
+    """
+    Descontar el stock de las líneas de un pedido (dentro de su transacción)
+
+    Qué productos controlan stock se decide en la BD (stock IS NOT NULL en el
+    mismo UPDATE), no en el snapshot publicado: un stock cargado en el
+    borrador también se descuenta. Lanza OutOfStock si falta stock.
+    """
+    quantities = aggregate_quantities(lines)
+    if not quantities:
+        return
+
+    quantity = _quantity_case(quantities)
+    tracked = Product.objects.filter(id__in=quantities, stock__isnull=False)
+    with transaction.atomic():
+        updated = tracked.filter(stock__gte=quantity).update(
+            stock=F('stock') - quantity,
+            # En UPDATE las expresiones ven los valores previos de la fila
+            is_available=Case(
+                When(stock__gt=quantity, then=F('is_available')),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            # Agotado por este pedido (estaba disponible): se reactiva al reponer
+            auto_disabled=Case(
+                When(Q(stock=quantity) & Q(is_available=True), then=Value(True)),
+                default=F('auto_disabled'),
+                output_field=BooleanField(),
+            ),
+        )
+        # Las filas descontadas quedan bloqueadas: si alguna con stock no se
+        # pudo descontar, se vuelve al savepoint para informar cuáles faltan
+        short = updated != tracked.count()
+        if short:
+            transaction.set_rollback(True)
+
+    if short:
+        raise OutOfStock(list(tracked.exclude(stock__gte=_quantity_case(quantities)).only('id', 'name')))
+
+    if updated and tracked.filter(stock=0).exists():
+        # Algún producto se agotó: se publica una versión del menú que lo muestre no disponible
+        transaction.on_commit(schedule_availability_publish, robust=True)
+
+
+def release_stock(lines):
+    """Devolver al inventario las líneas de un pedido cancelado"""
+    quantities = aggregate_quantities(lines)
+    if not quantities:
+        return
+
+    quantity = _quantity_case(quantities)
+    # Solo los que desactivó el stock vuelven a estar disponibles
+    restocked = Product.objects.filter(id__in=quantities, auto_disabled=True).exists()
+    Product.objects.filter(id__in=quantities, stock__isnull=False).update(
+        stock=F('stock') + quantity,
+        is_available=Case(
+            When(auto_disabled=True, then=Value(True)),
+            default=F('is_available'),
+            output_field=BooleanField(),
+        ),
+        auto_disabled=Value(False),
+    )
+    if restocked:
+        transaction.on_commit(schedule_availability_publish, robust=True)
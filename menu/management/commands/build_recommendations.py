@@ -0,0 +1,37 @@
+# menu/management/commands/build_recommendations.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from menu.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula los productos que se compran juntos a partir de los pedidos "
+        "entregados desde la última ejecución"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recalcular desde cero con todos los pedidos")
+        parser.add_argument('--top', type=int, help="Vecinos por producto (por defecto RECOMMENDATIONS_TOP_N)")
+        parser.add_argument(
+            '--min-support', type=int,
+            help="Mínimo de pedidos en común (por defecto RECOMMENDATIONS_MIN_SUPPORT)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = build_recommendations(
+            full=options['full'],
+            top_n=options['top'],
+            min_support=options['min_support'],
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Recomendaciones calculadas en {elapsed:.2f}s: "
+            f"{result.orders} pedidos nuevos ({result.orders_total} en total), "
+            f"{result.pairs} pares, {result.products} productos"
+        ))
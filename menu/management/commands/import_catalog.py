@@ -0,0 +1,55 @@
+# menu/management/commands/import_catalog.py
+
+import time
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.catalog import CHUNK_SIZE, READERS, CatalogError, import_catalog, read_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa/actualiza productos desde catálogos CSV o JSON "
+        "(columnas: category, name, description, price, image_url, is_available, "
+        "preparation_time, is_featured, category_description)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Archivos .csv, .json o .jsonl")
+        parser.add_argument('--format', choices=sorted(READERS), help="Forzar formato (por defecto según extensión)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Eliminar productos que no estén en el catálogo (los que tienen órdenes se desactivan)",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Calcular cambios sin guardarlos")
+        parser.add_argument('--publish', action='store_true', help="Publicar una versión del menú al terminar")
+
+    def handle(self, *args, **options):
+        rows = chain.from_iterable(read_catalog(path, options['format']) for path in options['paths'])
+        started = time.perf_counter()
+        try:
+            result = import_catalog(
+                rows,
+                chunk_size=options['chunk_size'],
+                prune=options['prune'],
+                dry_run=options['dry_run'],
+                publish=options['publish'],
+            )
+        except (CatalogError, OSError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        for line, message in result.errors[:20]:
+            self.stderr.write(f"  ✗ Fila {line}: {message}")
+        if len(result.errors) > 20:
+            self.stderr.write(f"  ... y {len(result.errors) - 20} errores más")
+
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}✅ Catálogo importado en {elapsed:.2f}s: "
+            f"{result.created} creados, {result.updated} actualizados, {result.unchanged} sin cambios, "
+            f"{result.deleted} eliminados, {result.deactivated} desactivados, "
+            f"{result.categories_created} categorías nuevas, {len(result.errors)} errores"
+        ))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_products(apps, schema_editor):
+    """
+    Renombrar los productos repetidos (misma categoría y nombre) antes de la
+    restricción única: el más antiguo conserva el nombre y los demás pasan a
+    "<nombre> (#<id>)". No se borra nada porque pueden tener órdenes
+    """
+    Product = apps.get_model("menu", "Product")
+    duplicates = (
+        Product.objects.values("category_id", "name")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        products = Product.objects.filter(
+            category_id=duplicate["category_id"], name=duplicate["name"]
+        ).order_by("id")
+        for product in products[1:]:
+            suffix = f" (#{product.id})"
+            product.name = product.name[: 200 - len(suffix)] + suffix
+            product.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_products, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.UniqueConstraint(
+                fields=("category", "name"), name="unique_product_per_category"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0002_product_natural_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="stock",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Unidades disponibles. Vacío = sin control de stock",
+                null=True,
+                verbose_name="Stock",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:22
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0003_product_stock"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                ("checksum", models.CharField(db_index=True, max_length=64)),
+                ("product_count", models.PositiveIntegerField(default=0)),
+                (
+                    "notes",
+                    models.CharField(blank=True, max_length=255, verbose_name="Notas"),
+                ),
+                ("published_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "published_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Publicado por",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Versión del menú",
+                "verbose_name_plural": "Versiones del menú",
+                "db_table": "menu_versions",
+                "ordering": ["-id"],
+            },
+        ),
+    ]
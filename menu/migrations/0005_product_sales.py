@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0004_menuversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSales",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="sales",
+                        serialize=False,
+                        to="menu.product",
+                    ),
+                ),
+                ("units_sold", models.PositiveBigIntegerField(default=0)),
+                ("popularity", models.FloatField(db_index=True, default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Ventas de producto",
+                "verbose_name_plural": "Ventas de productos",
+                "db_table": "product_sales",
+            },
+        ),
+    ]
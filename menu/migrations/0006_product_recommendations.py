@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0005_product_sales"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductRecommendations",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="recommendations",
+                        serialize=False,
+                        to="menu.product",
+                    ),
+                ),
+                ("orders", models.PositiveIntegerField(default=0)),
+                ("related", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Recomendaciones de producto",
+                "verbose_name_plural": "Recomendaciones de productos",
+                "db_table": "product_recommendations",
+            },
+        ),
+        migrations.CreateModel(
+            name="RecommendationRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delivered_until", models.DateTimeField()),
+                ("orders", models.PositiveIntegerField(default=0)),
+                ("orders_total", models.PositiveBigIntegerField(default=0)),
+                ("pairs", models.PositiveIntegerField(default=0)),
+                ("full", models.BooleanField(default=False)),
+                ("finished_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Cálculo de recomendaciones",
+                "verbose_name_plural": "Cálculos de recomendaciones",
+                "db_table": "recommendation_runs",
+                "ordering": ["-id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductPair",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("orders", models.PositiveIntegerField(default=0)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.product",
+                    ),
+                ),
+                (
+                    "related",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Par de productos",
+                "verbose_name_plural": "Pares de productos",
+                "db_table": "product_pairs",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "related"), name="unique_product_pair"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0006_product_recommendations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogSeed",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("checksum", models.CharField(max_length=64)),
+                ("loaded_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Carga inicial de catálogo",
+                "verbose_name_plural": "Cargas iniciales de catálogo",
+                "db_table": "catalog_seeds",
+            },
+        ),
+    ]
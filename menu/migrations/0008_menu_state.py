@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_state(apps, schema_editor):
+    """La fila única apunta a la última versión ya publicada"""
+    MenuState = apps.get_model("menu", "MenuState")
+    MenuVersion = apps.get_model("menu", "MenuVersion")
+    latest = MenuVersion.objects.order_by("-id").first()
+    MenuState.objects.get_or_create(pk=1, defaults={"version": latest})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0007_catalog_seed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("assets", models.PositiveIntegerField(default=0)),
+                (
+                    "version",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="menu.menuversion",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Estado del menú",
+                "verbose_name_plural": "Estado del menú",
+                "db_table": "menu_state",
+            },
+        ),
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:13
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def create_epoch(apps, schema_editor):
+    """Los puntajes existentes se calcularon con la época fija 2025-01-01"""
+    PopularityEpoch = apps.get_model("menu", "PopularityEpoch")
+    PopularityEpoch.objects.get_or_create(
+        pk=1, defaults={"epoch": datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0008_menu_state"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PopularityEpoch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("epoch", models.FloatField()),
+            ],
+            options={
+                "verbose_name": "Época de popularidad",
+                "verbose_name_plural": "Época de popularidad",
+                "db_table": "popularity_epoch",
+            },
+        ),
+        migrations.RunPython(create_epoch, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def create_unaccent(apps, schema_editor):
+    """unaccent() para la búsqueda full-text (solo PostgreSQL)"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0009_popularity_epoch"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_unaccent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0010_unaccent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="auto_disabled",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Desactivado por quedarse sin stock (se reactiva solo al reponer)",
+                verbose_name="Agotado",
+            ),
+        ),
+    ]
@@ -1,7 +1,21 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Count, Q
 from django.core.validators import MinValueValidator
 
 
+class CategoryQuerySet(models.QuerySet):
+    
+    def with_active_products_count(self):
+        """Anotar la cantidad de productos disponibles (un solo query)"""
+        return self.annotate(
+            num_active_products=Count('products', filter=Q(products__is_available=True))
+        )
+
+
 class Category(models.Model):
     """Categorías del menú (Entradas, Platos Fuertes, Bebidas, Postres)"""
     
@@ -21,6 +35,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         db_table = 'categories'
         ordering = ['name']
@@ -33,6 +49,8 @@ class Category(models.Model):
     @property
     def active_products_count(self):
         """Cantidad de productos activos en esta categoría"""
+        if hasattr(self, 'num_active_products'):
+            return self.num_active_products
         return self.products.filter(is_available=True).count()
 
 
@@ -81,6 +99,18 @@ class Product(models.Model):
         help_text="Marcar para destacar en el menú",
         verbose_name="Destacado"
     )
+    stock = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Unidades disponibles. Vacío = sin control de stock",
+        verbose_name="Stock"
+    )
+    auto_disabled = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Desactivado por quedarse sin stock (se reactiva solo al reponer)",
+        verbose_name="Agotado"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -94,7 +124,236 @@ class Product(models.Model):
             models.Index(fields=['category', 'is_available']),
             models.Index(fields=['is_featured', 'is_available']),
         ]
+        constraints = [
+            # Clave natural usada por la importación de catálogos
+            models.UniqueConstraint(fields=['category', 'name'], name='unique_product_per_category'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Sin stock no se puede vender; se recuerda que lo desactivó el stock
+        # y no el staff, para reactivarlo al reponer (menu.inventory)
+        if self.stock == 0 and self.is_available:
+            self.is_available = False
+            self.auto_disabled = True
+        elif self.is_available:
+            self.auto_disabled = False
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'is_available' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'auto_disabled'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         status = "✓" if self.is_available else "✗"
-        return f"{status} {self.name} - Bs. {self.price}"
\ No newline at end of file
+        return f"{status} {self.name} - Bs. {self.price}"
+
+
+class ProductSales(models.Model):
+    """
+    Contadores de ventas por producto (pedidos entregados)
+    
+    popularity acumula cantidad * e^(λ·t) con t desde la época de
+    PopularityEpoch: ordenar por este valor equivale a ordenar por ventas con
+    decaimiento exponencial, y cada venta nueva es un simple
+    F('popularity') + incremento.
+    """
+    
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales'
+    )
+    units_sold = models.PositiveBigIntegerField(default=0)
+    popularity = models.FloatField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_sales'
+        verbose_name = 'Ventas de producto'
+        verbose_name_plural = 'Ventas de productos'
+
+    def __str__(self):
+        return f"{self.product_id}: {self.units_sold} vendidos"
+
+
+class PopularityEpoch(models.Model):
+    """
+    Época de los pesos de ProductSales.popularity (una sola fila)
+    
+    e^(λ·t) desborda el float si t crece sin límite, así que cada tanto
+    (menu.popularity.REBASE_AFTER_HALF_LIVES) la época avanza y todos los
+    puntajes se multiplican por el mismo factor en un solo UPDATE.
+    """
+    
+    # Timestamp unix
+    epoch = models.FloatField()
+
+    class Meta:
+        db_table = 'popularity_epoch'
+        verbose_name = 'Época de popularidad'
+        verbose_name_plural = 'Época de popularidad'
+
+
+class ProductPair(models.Model):
+    """
+    Cantidad de pedidos entregados donde aparecen juntos dos productos
+    (matriz de co-ocurrencia dispersa; solo se guarda product_id < related_id)
+    """
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'product_pairs'
+        verbose_name = 'Par de productos'
+        verbose_name_plural = 'Pares de productos'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='unique_product_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.related_id}: {self.orders}"
+
+
+class ProductRecommendations(models.Model):
+    """Productos que se compran junto a este, precalculados por lift"""
+    
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recommendations'
+    )
+    # Pedidos entregados que incluyen el producto
+    orders = models.PositiveIntegerField(default=0)
+    # [[product_id, lift], ...] de mayor a menor lift
+    related = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_recommendations'
+        verbose_name = 'Recomendaciones de producto'
+        verbose_name_plural = 'Recomendaciones de productos'
+
+    def __str__(self):
+        return f"{self.product_id}: {len(self.related)} relacionados"
+
+
+class RecommendationRun(models.Model):
+    """Ejecución del cálculo de recomendaciones (marca hasta dónde se procesó)"""
+    
+    delivered_until = models.DateTimeField()
+    orders = models.PositiveIntegerField(default=0)
+    orders_total = models.PositiveBigIntegerField(default=0)
+    pairs = models.PositiveIntegerField(default=0)
+    full = models.BooleanField(default=False)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'recommendation_runs'
+        verbose_name = 'Cálculo de recomendaciones'
+        verbose_name_plural = 'Cálculos de recomendaciones'
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Recomendaciones hasta {self.delivered_until:%Y-%m-%d %H:%M}"
+
+class MenuVersion(models.Model):
+    """
+    Versión publicada del menú (inmutable)
+    
+    Category/Product son el borrador que edita el staff; publicar copia el
+    borrador completo a una versión nueva. Los pedidos guardan la versión
+    con la que se cotizaron, así se puede reconstruir el menú que vieron.
+    """
+    
+    # {'categories': [filas], 'products': [filas]} con las columnas de menu.snapshot
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    checksum = models.CharField(max_length=64, db_index=True)
+    product_count = models.PositiveIntegerField(default=0)
+    notes = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Notas"
+    )
+    published_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Publicado por"
+    )
+    published_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'menu_versions'
+        ordering = ['-id']
+        verbose_name = 'Versión del menú'
+        verbose_name_plural = 'Versiones del menú'
+
+    def __str__(self):
+        return f"Menú v{self.pk} ({self.product_count} productos)"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Las versiones publicadas del menú no se modifican")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Las versiones publicadas del menú no se eliminan")
+    
+    def rows(self):
+        """(productos, categorías) como filas de menu.snapshot (precio en Decimal)"""
+        products = [
+            (*row[:4], Decimal(row[4]), *row[5:])
+            for row in self.data['products']
+        ]
+        categories = [tuple(row) for row in self.data['categories']]
+        return products, categories
+
+
+class MenuState(models.Model):
+    """
+    Versión vigente del menú y generación de assets (una sola fila)
+    
+    Es el contador compartido por todos los workers: se cambia solo con
+    UPDATE atómicos (F('assets') + 1, y la versión solo avanza), así dos
+    publicaciones o lotes de miniaturas simultáneos no se pisan. La cache
+    guarda apenas una copia de corta duración (menu.snapshot.get_menu_state).
+    """
+    
+    version = models.ForeignKey(
+        MenuVersion,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    assets = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'menu_state'
+        verbose_name = 'Estado del menú'
+        verbose_name_plural = 'Estado del menú'
+
+
+class CatalogSeed(models.Model):
+    """
+    Último contenido cargado por un script de datos iniciales (load_menu)
+
+    Si el checksum de los datos no cambió desde la última carga, el script
+    no vuelve a importar nada al arrancar.
+    """
+    
+    name = models.CharField(max_length=100, unique=True)
+    checksum = models.CharField(max_length=64)
+    loaded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'catalog_seeds'
+        verbose_name = 'Carga inicial de catálogo'
+        verbose_name_plural = 'Cargas iniciales de catálogo'
+
+    def __str__(self):
+        return f"{self.name} ({self.checksum[:12]})"
@@ -0,0 +1,188 @@
+# menu/popularity.py
+"""
+Ranking de productos populares a partir de las ventas entregadas
+
+- Cada pedido entregado suma sus cantidades en un buffer en memoria
+- El buffer se vuelca cada POPULARITY_FLUSH_INTERVAL segundos con un solo
+  UPDATE ... SET popularity = popularity + CASE ... (F(), sin leer antes)
+- El decaimiento exponencial no requiere reescribir filas: cada venta pesa
+  e^(λ·t), así las ventas recientes valen más (vida media configurable)
+- t se mide desde PopularityEpoch; cuando pasan REBASE_AFTER_HALF_LIVES
+  vidas medias la época avanza y los puntajes se reescalan en un UPDATE,
+  así e^(λ·t) nunca desborda el float (con vida media de 1 día, sin
+  reescalar desbordaría en menos de 3 años)
+- Tras cada volcado se recalcula el top-K y se guarda en cache; el endpoint
+  featured solo lee esa lista
+"""
+
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+
+from core.metrics import cache_lookup
+
+from .models import PopularityEpoch, Product, ProductSales
+
+logger = logging.getLogger(__name__)
+
+POPULAR_KEY = 'menu:popular'
+# Con 64 vidas medias el factor máximo es 2^64: lejos del límite del float (~2^1024)
+REBASE_AFTER_HALF_LIVES = 64
+# Candidatos guardados: el endpoint filtra los no disponibles y se queda con K
+CANDIDATES_FACTOR = 3
+
+
+def decay_rate():
+    return math.log(2) / (settings.POPULARITY_HALF_LIFE_DAYS * 24 * 3600)
+
+
+def sale_weight(quantity, when, anchor):
+    """Peso de una venta de `quantity` unidades en `when` relativo al instante `anchor` (timestamps)"""
+    return quantity * math.exp(decay_rate() * (when - anchor))
+
+
+def decayed_score(popularity, epoch, now=None):
+    """popularity expresado en 'unidades vendidas hoy' (para mostrar)"""
+    return popularity * math.exp(-decay_rate() * ((now or time.time()) - epoch))
+
+
+def current_epoch(now):
+    """
+    Época vigente (bloqueando su fila hasta el fin de la transacción)
+
+    Si quedó más de REBASE_AFTER_HALF_LIVES vidas medias atrás, avanza a `now`
+    y reescala todos los puntajes por el mismo factor: el orden no cambia.
+    """
+    state, _ = PopularityEpoch.objects.select_for_update().get_or_create(pk=1, defaults={'epoch': now})
+    elapsed = now - state.epoch
+    if elapsed * decay_rate() > REBASE_AFTER_HALF_LIVES * math.log(2):
+        # Los puntajes de hace muchísimas vidas medias quedan en 0
+        ProductSales.objects.filter(popularity__gt=0).update(
+            popularity=F('popularity') * Value(math.exp(-decay_rate() * elapsed), output_field=FloatField())
+        )
+        state.epoch = now
+        state.save(update_fields=['epoch'])
+        logger.info("Época de popularidad reescalada", extra={'elapsed_days': elapsed / 86400})
+    return state.epoch
+
+
+def apply_sales(units, weights, anchor):
+    """
+    Sumar ventas a los contadores (pocos queries sin importar cuántos productos)
+
+    weights son relativos al instante `anchor` (ver sale_weight)
+    """
+    product_ids = list(Product.objects.filter(id__in=list(units)).values_list('id', flat=True))
+    if not product_ids:
+        return
+
+    with transaction.atomic():
+        scale = math.exp(decay_rate() * (anchor - current_epoch(anchor)))
+        ProductSales.objects.bulk_create(
+            [ProductSales(product_id=product_id) for product_id in product_ids],
+            ignore_conflicts=True,
+        )
+        ProductSales.objects.filter(product_id__in=product_ids).update(
+            units_sold=F('units_sold') + Case(
+                *[When(product_id=pid, then=Value(units[pid])) for pid in product_ids],
+                output_field=IntegerField(),
+            ),
+            popularity=F('popularity') + Case(
+                *[When(product_id=pid, then=Value(weights[pid] * scale)) for pid in product_ids],
+                output_field=FloatField(),
+            ),
+        )
+
+
+def refresh_top_products():
+    """Recalcular y publicar en cache el top-K (usa el índice de popularity)"""
+    limit = settings.POPULARITY_TOP_K * CANDIDATES_FACTOR
+    top = list(
+        ProductSales.objects.filter(popularity__gt=0)
+        .order_by('-popularity')
+        .values_list('product_id', flat=True)[:limit]
+    )
+    cache.set(POPULAR_KEY, top, timeout=None)
+    return top
+
+
+def get_top_products():
+    """Ids de los productos más vendidos (precalculados)"""
+    top = cache_lookup('menu_popular', cache.get(POPULAR_KEY))
+    if top is None:
+        top = refresh_top_products()
+    return top
+
+
+class SalesBuffer:
+    """Acumula ventas en memoria y las vuelca periódicamente"""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._units = defaultdict(int)
+        self._weights = defaultdict(float)
+        # Instante de referencia de los pesos acumulados (ver sale_weight)
+        self._anchor = time.time()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, lines, when=None):
+        with self._lock:
+            if not self._weights:
+                self._anchor = time.time()
+            for product_id, quantity in lines:
+                self._units[product_id] += quantity
+                self._weights[product_id] += sale_weight(quantity, when or time.time(), self._anchor)
+            if self.flush_interval > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.warning("No se pudieron guardar los contadores de ventas", exc_info=True)
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        with self._lock:
+            units, weights, anchor = self._units, self._weights, self._anchor
+            self._units, self._weights = defaultdict(int), defaultdict(float)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if units:
+            apply_sales(units, weights, anchor)
+            refresh_top_products()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = SalesBuffer(settings.POPULARITY_FLUSH_INTERVAL)
+            # Al apagar el worker se vuelca lo pendiente
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def record_delivered_order(order):
+    """Sumar las ventas de un pedido entregado (al confirmar la transacción)"""
+    lines = list(order.items.values_list('product_id', 'quantity'))
+    transaction.on_commit(lambda: get_buffer().add(lines), robust=True)
@@ -0,0 +1,256 @@
+# menu/recommendations.py
+"""
+"Se compran juntos": co-ocurrencia de productos en pedidos entregados
+
+El cálculo es incremental y se corre fuera de los requests
+(python manage.py build_recommendations):
+
+1. Se leen en streaming solo los order_items de pedidos entregados desde la
+   última ejecución (RecommendationRun.delivered_until), agrupados por pedido
+2. Los pares de cada canasta se generan con NumPy agrupando canastas del mismo
+   tamaño (sin bucles por par) y se cuentan como claves a*n + b de una matriz
+   dispersa; cada lote se reduce con np.unique
+3. Se suman a los conteos guardados (ProductPair) y se recalcula el lift
+   de todos los pares: lift = pedidos(a,b) * N / (pedidos(a) * pedidos(b))
+4. Se guardan los N vecinos de mayor lift por producto en
+   ProductRecommendations; los endpoints solo leen esa fila
+"""
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.lazy import lazy_import
+
+from .models import Product, ProductPair, ProductRecommendations, RecommendationRun
+
+# NumPy solo hace falta para el cálculo (comando), no para los endpoints
+np = lazy_import('numpy')
+
+# Canastas por lote de NumPy
+BATCH_ORDERS = 50_000
+WRITE_BATCH = 5_000
+# Margen para pedidos marcados como entregados cuya transacción aún no confirmó
+DELIVERY_LAG = timedelta(minutes=5)
+
+
+@dataclass
+class RecommendationResult:
+    orders: int = 0
+    orders_total: int = 0
+    pairs: int = 0
+    products: int = 0
+
+
+def _reduce(keys, counts):
+    """Sumar los conteos de claves repetidas"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+
+
+def _pair_keys(baskets, n):
+    """Claves a*n + b (a < b) de todos los pares de cada canasta"""
+    by_size = defaultdict(list)
+    for basket in baskets:
+        if len(basket) > 1:
+            by_size[len(basket)].append(basket)
+
+    keys = [np.empty(0, dtype=np.int64)]
+    for size, rows in by_size.items():
+        matrix = np.array(rows, dtype=np.int64)
+        first, second = np.triu_indices(size, 1)
+        keys.append((matrix[:, first] * n + matrix[:, second]).ravel())
+    return np.concatenate(keys)
+
+
+def _upsert(model, objs, **options):
+    """bulk_create por tandas sin materializar todos los objetos"""
+    objs = iter(objs)
+    while chunk := list(islice(objs, WRITE_BATCH)):
+        model.objects.bulk_create(chunk, update_conflicts=True, **options)
+
+
+def iter_baskets(since=None, until=None):
+    """Productos de cada pedido entregado en (since, until], en streaming"""
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(order__status='delivered')
+    if since is not None:
+        items = items.filter(order__delivered_at__gt=since)
+    if until is not None:
+        items = items.filter(order__delivered_at__lte=until)
+    lines = items.order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=10_000)
+    for _, group in groupby(lines, key=lambda line: line[0]):
+        yield {product_id for _, product_id in group}
+
+
+def count_cooccurrences(baskets, index):
+    """
+    Contar pedidos por producto y por par de productos
+
+    index: {product_id: posición}. Devuelve (pedidos, conteo por producto,
+    claves de pares, conteo por par).
+    """
+    n = len(index)
+    item_counts = np.zeros(n, dtype=np.int64)
+    keys = np.empty(0, dtype=np.int64)
+    counts = np.empty(0, dtype=np.int64)
+    orders = 0
+
+    batch = []
+
+    def flush():
+        nonlocal keys, counts
+        items = np.fromiter((i for basket in batch for i in basket), dtype=np.int64)
+        item_counts[:] += np.bincount(items, minlength=n)
+        batch_keys = _pair_keys(batch, n)
+        keys, counts = _reduce(
+            np.concatenate([keys, batch_keys]),
+            np.concatenate([counts, np.ones(len(batch_keys), dtype=np.int64)]),
+        )
+        batch.clear()
+
+    for basket in baskets:
+        positions = sorted(index[product_id] for product_id in basket if product_id in index)
+        if not positions:
+            continue
+        orders += 1
+        batch.append(positions)
+        if len(batch) >= BATCH_ORDERS:
+            flush()
+    if batch:
+        flush()
+
+    return orders, item_counts, keys, counts
+
+
+def top_neighbours(keys, counts, item_counts, orders_total, n, top_n, min_support):
+    """{posición: [(posición, lift), ...]} con los top_n vecinos por lift"""
+    keep = counts >= min_support
+    keys, counts = keys[keep], counts[keep]
+    a, b = keys // n, keys % n
+    lift = counts * orders_total / (item_counts[a] * item_counts[b])
+
+    # Cada par cuenta para ambos productos
+    source = np.concatenate([a, b])
+    target = np.concatenate([b, a])
+    lift = np.concatenate([lift, lift])
+    support = np.concatenate([counts, counts])
+
+    order = np.lexsort((-support, -lift, source))
+    source, target, lift = source[order], target[order], lift[order]
+    rank = np.arange(len(source)) - np.searchsorted(source, source, side='left')
+    keep = rank < top_n
+
+    neighbours = defaultdict(list)
+    for src, dst, value in zip(source[keep].tolist(), target[keep].tolist(), lift[keep].tolist()):
+        neighbours[src].append((dst, value))
+    return neighbours
+
+
+@transaction.atomic
+def build_recommendations(full=False, top_n=None, min_support=None, until=None):
+    """
+    Procesar los pedidos entregados desde la última ejecución (o todos con full)
+    hasta `until` (por defecto ahora menos DELIVERY_LAG)
+    """
+    top_n = top_n or settings.RECOMMENDATIONS_TOP_N
+    min_support = min_support or settings.RECOMMENDATIONS_MIN_SUPPORT
+
+    last = None if full else RecommendationRun.objects.first()
+    until = until or timezone.now() - DELIVERY_LAG
+    if full:
+        ProductPair.objects.all().delete()
+        ProductRecommendations.objects.all().delete()
+
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+    index = {product_id: position for position, product_id in enumerate(product_ids)}
+    n = len(product_ids)
+
+    since = last.delivered_until if last else None
+    orders, item_counts, new_keys, new_counts = count_cooccurrences(iter_baskets(since, until), index)
+
+    # Sumar lo acumulado en ejecuciones anteriores
+    orders_total = orders + (last.orders_total if last else 0)
+    for product_id, product_orders in ProductRecommendations.objects.values_list('product_id', 'orders'):
+        if product_id in index:
+            item_counts[index[product_id]] += product_orders
+    stored = np.array(
+        [
+            (index[a] * n + index[b], count)
+            for a, b, count in ProductPair.objects.values_list('product_id', 'related_id', 'orders').iterator()
+            if a in index and b in index
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    keys, counts = _reduce(
+        np.concatenate([stored[:, 0], new_keys]),
+        np.concatenate([stored[:, 1], new_counts]),
+    )
+
+    # Solo se escriben los pares que cambiaron
+    changed = np.isin(keys, new_keys)
+    _upsert(
+        ProductPair,
+        (
+            ProductPair(product_id=product_ids[key // n], related_id=product_ids[key % n], orders=count)
+            for key, count in zip(keys[changed].tolist(), counts[changed].tolist())
+        ),
+        unique_fields=['product', 'related'],
+        update_fields=['orders'],
+    )
+
+    # El lift depende del total de pedidos: se recalculan todos los productos
+    neighbours = top_neighbours(keys, counts, item_counts, orders_total, n, top_n, min_support)
+    sold = np.flatnonzero(item_counts).tolist()
+    _upsert(
+        ProductRecommendations,
+        (
+            ProductRecommendations(
+                product_id=product_ids[position],
+                orders=int(item_counts[position]),
+                related=[
+                    [product_ids[other], round(value, 3)]
+                    for other, value in neighbours.get(position, ())
+                ],
+            )
+            for position in sold
+        ),
+        unique_fields=['product'],
+        update_fields=['orders', 'related', 'updated_at'],
+    )
+
+    RecommendationRun.objects.create(
+        delivered_until=until,
+        orders=orders,
+        orders_total=orders_total,
+        pairs=len(keys),
+        full=full,
+    )
+    return RecommendationResult(orders=orders, orders_total=orders_total, pairs=len(keys), products=len(sold))
+
+
+def related_products(product_id):
+    """[product_id, ...] que se compran junto a product_id"""
+    related = (
+        ProductRecommendations.objects.filter(product_id=product_id)
+        .values_list('related', flat=True)
+        .first()
+    )
+    return [other for other, _ in related or ()]
+
+
+def recommend_for_cart(product_ids, limit=None):
+    """Productos para sugerir con un carrito: suma del lift de cada producto del carrito"""
+    cart = set(product_ids)
+    scores = Counter()
+    for related in ProductRecommendations.objects.filter(product_id__in=cart).values_list('related', flat=True):
+        for other, lift in related:
+            if other not in cart:
+                scores[other] += lift
+    return [other for other, _ in scores.most_common(limit or settings.RECOMMENDATIONS_TOP_N)]
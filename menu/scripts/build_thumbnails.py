@@ -0,0 +1,32 @@
+# menu/scripts/build_thumbnails.py
+
+from menu.images import ImageFetchError, process_image
+from menu.models import Product
+from menu.snapshot import bump_menu_assets
+
+
+def run():
+    """
+    Generar las miniaturas de todas las imágenes de productos
+    Uso: python manage.py runscript build_thumbnails
+    Las que ya existen en disco se saltan
+    """
+
+    urls = set(
+        Product.objects.exclude(image_url__isnull=True)
+        .exclude(image_url='')
+        .values_list('image_url', flat=True)
+    )
+    print(f"Procesando {len(urls)} imágenes...")
+
+    failed = 0
+    for url in sorted(urls):
+        try:
+            process_image(url)
+        except (ImageFetchError, OSError) as exc:
+            failed += 1
+            print(f"  ✗ {url}: {exc}")
+
+    # Los payloads cacheados del menú pasan a incluir las miniaturas
+    bump_menu_assets()
+    print(f"✅ Miniaturas listas ({len(urls) - failed} ok, {failed} con error)")
@@ -0,0 +1,37 @@
+# menu/scripts/rebuild_popularity.py
+
+import time
+from collections import defaultdict
+
+from django.db import transaction
+
+from menu.models import ProductSales
+from menu.popularity import apply_sales, refresh_top_products, sale_weight
+from orders.models import OrderItem
+
+
+def run():
+    """
+    Recalcular los contadores de ventas desde todos los pedidos entregados
+    Uso: python manage.py runscript rebuild_popularity
+    Los pedidos nuevos se suman solos al marcarse como entregados
+    """
+
+    units = defaultdict(int)
+    weights = defaultdict(float)
+    now = time.time()
+    lines = (
+        OrderItem.objects.filter(order__status='delivered')
+        .values_list('product_id', 'quantity', 'order__delivered_at')
+        .iterator(chunk_size=5000)
+    )
+    for product_id, quantity, delivered_at in lines:
+        units[product_id] += quantity
+        weights[product_id] += sale_weight(quantity, delivered_at.timestamp() if delivered_at else now, now)
+
+    with transaction.atomic():
+        ProductSales.objects.all().delete()
+        apply_sales(units, weights, now)
+    top = refresh_top_products()
+
+    print(f"✅ Ventas recalculadas: {len(units)} productos, top {len(top)} en cache")
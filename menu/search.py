@@ -0,0 +1,206 @@
+# menu/search.py
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, IntegerField, When
+from rest_framework import filters
+
+from .snapshot import get_snapshot
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Minúsculas y sin acentos: 'Champiñones' → 'champinones'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold(text))
+
+
+class SearchIndex:
+    """
+    Índice invertido en memoria sobre el snapshot del menú
+
+    - Coincidencias en el nombre pesan más que en la descripción
+    - Cada término de la búsqueda también se compara como prefijo (type-ahead),
+      con menor puntaje que una coincidencia exacta
+    - Todos los términos deben coincidir (AND)
+
+    Las listas de cada término se guardan ordenadas por puntaje, así una
+    búsqueda recorre solo los primeros candidatos en vez de todo el catálogo.
+    """
+
+    NAME_WEIGHT = 3.0
+    DESCRIPTION_WEIGHT = 1.0
+    PREFIX_FACTOR = 0.5
+    # Prefijos muy cortos ("p") no recorren todo el vocabulario
+    MAX_PREFIX_TERMS = 50
+
+    def __init__(self, products):
+        self.products = products
+        postings = defaultdict(dict)
+
+        for product in products.values():
+            for token in set(tokenize(product.name)):
+                postings[token][product.id] = self.NAME_WEIGHT
+            for token in set(tokenize(product.description)):
+                weights = postings[token]
+                weights[product.id] = weights.get(product.id, 0) + self.DESCRIPTION_WEIGHT
+
+        self.postings = dict(postings)
+        self.ranked = {
+            term: sorted(weights.items(), key=lambda item: (-item[1], item[0]))
+            for term, weights in self.postings.items()
+        }
+        self.terms = sorted(self.postings)
+
+    def _expand(self, token):
+        """
+        [(término, factor)] del vocabulario que empiezan con token
+
+        Con más de MAX_PREFIX_TERMS se quedan los que aparecen en más
+        productos (y siempre el término exacto), no los primeros por orden
+        alfabético.
+        """
+        start = bisect_left(self.terms, token)
+        end = bisect_left(self.terms, token + '\U0010ffff', start)
+        terms = self.terms[start:end]
+        if len(terms) > self.MAX_PREFIX_TERMS:
+            terms = heapq.nsmallest(
+                self.MAX_PREFIX_TERMS, terms,
+                key=lambda term: (term != token, -len(self.postings[term]), term),
+            )
+        return [(term, 1.0 if term == token else self.PREFIX_FACTOR) for term in terms]
+
+    def _candidates(self, expanded):
+        """Productos que coinciden, de mayor a menor puntaje (lazy)"""
+        streams = [
+            ((weight * factor, product_id) for product_id, weight in self.ranked[term])
+            for term, factor in expanded
+        ]
+        seen = set()
+        for score, product_id in heapq.merge(*streams, key=lambda item: (-item[0], item[1])):
+            if product_id not in seen:
+                seen.add(product_id)
+                yield product_id, score
+
+    def _score(self, expanded, product_id):
+        best = 0
+        for term, factor in expanded:
+            weight = self.postings[term].get(product_id)
+            if weight and weight * factor > best:
+                best = weight * factor
+        return best
+
+    def search(self, query, limit=20, visible_only=False):
+        """Devuelve [(product_id, score), ...] ordenado por relevancia"""
+        expansions = [self._expand(token) for token in dict.fromkeys(tokenize(query))]
+        if limit < 1 or not expansions or not all(expansions):
+            return []
+
+        # El término más selectivo recorre sus candidatos; el resto solo se consulta
+        expansions.sort(key=lambda expanded: sum(len(self.postings[t]) for t, _ in expanded))
+        driver, others = expansions[0], expansions[1:]
+        max_others = len(others) * (self.NAME_WEIGHT + self.DESCRIPTION_WEIGHT)
+
+        top = []
+        for product_id, score in self._candidates(driver):
+            if len(top) == limit and score + max_others <= top[0][0]:
+                break
+            if visible_only and not self.products[product_id].is_visible:
+                continue
+
+            total = score
+            for expanded in others:
+                other = self._score(expanded, product_id)
+                if not other:
+                    break
+                total += other
+            else:
+                entry = (total, -product_id)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+
+        return [(-neg_id, total) for total, neg_id in sorted(top, reverse=True)]
+
+
+class DatabaseSearchBackend:
+    """
+    Full-text de PostgreSQL (MENU_SEARCH_BACKEND='database')
+
+    Sin acentos igual que SearchIndex: las columnas pasan por unaccent()
+    (extensión creada en la migración 0010) y la búsqueda por fold()
+    """
+
+    def search(self, query, limit=20, visible_only=False):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+        from django.db.models import F, Func
+        from .models import Product
+
+        vector = (
+            SearchVector(Func(F('name'), function='unaccent'), weight='A', config='spanish')
+            + SearchVector(Func(F('description'), function='unaccent'), weight='B', config='spanish')
+        )
+        search_query = SearchQuery(fold(query), search_type='websearch', config='spanish')
+        queryset = Product.objects.annotate(
+            rank=SearchRank(vector, search_query)
+        ).filter(rank__gt=0)
+        if visible_only:
+            queryset = queryset.filter(is_available=True, category__is_active=True)
+
+        return list(queryset.order_by('-rank', 'id').values_list('id', 'rank')[:limit])
+
+
+def search_products(query, limit=None, visible_only=False):
+    """Buscar productos con el backend configurado"""
+    if limit is None:
+        limit = settings.MENU_SEARCH_MAX_RESULTS
+    if settings.MENU_SEARCH_BACKEND == 'database':
+        return DatabaseSearchBackend().search(query, limit, visible_only)
+    return get_snapshot().search_index.search(query, limit, visible_only)
+
+
+class MenuSearchFilter(filters.BaseFilterBackend):
+    """
+    Reemplazo de SearchFilter para productos: ?search= rankeado
+    Sin ?ordering= explícito, el resultado queda ordenado por relevancia
+    """
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        results = search_products(query, visible_only=not request.user.is_staff)
+        ranked_ids = [product_id for product_id, _ in results]
+        queryset = queryset.filter(id__in=ranked_ids)
+
+        if request.query_params.get(filters.OrderingFilter.ordering_param) or not ranked_ids:
+            return queryset
+
+        rank = Case(
+            *[When(id=product_id, then=position) for position, product_id in enumerate(ranked_ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.order_by(rank)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Búsqueda por nombre y descripción (sin acentos, por prefijo)',
+            'schema': {'type': 'string'},
+        }]
@@ -1,9 +1,20 @@
 from rest_framework import serializers
-from .models import Category, Product
+from core.sparse import SparseFieldsMixin
+from .images import thumbnail_urls
+from .models import Category, MenuVersion, Product
+
+
+class ThumbnailsMixin(serializers.Serializer):
+    """Agrega las miniaturas (sm/md/lg en webp y jpg) junto a image_url"""
+    
+    thumbnails = serializers.SerializerMethodField()
+    
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj.image_url)
 
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, ThumbnailsMixin, serializers.ModelSerializer):
     """Serializer básico para productos"""
     
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -18,18 +29,20 @@ class ProductSerializer(serializers.ModelSerializer):
             'description',
             'price',
             'image_url',
+            'thumbnails',
             'is_available',
             'is_featured',
             'preparation_time',
             'created_at',
         ]
         read_only_fields = ['id', 'created_at']
+        field_sources = {'thumbnails': ['image_url']}
 
 
 # -------------------------------------------------------
 # Serializer: Product (Para bot de Telegram - vista simplificada)
 # -------------------------------------------------------
-class ProductBotSerializer(serializers.ModelSerializer):
+class ProductBotSerializer(SparseFieldsMixin, ThumbnailsMixin, serializers.ModelSerializer):
     """Serializer simplificado para el bot de Telegram"""
     
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -43,8 +56,10 @@ class ProductBotSerializer(serializers.ModelSerializer):
             'description',
             'price',
             'image_url',
+            'thumbnails',
             'preparation_time',
         ]
+        field_sources = {'thumbnails': ['image_url']}
 
 
 
@@ -101,9 +116,11 @@ class CategoryWithProductsBotSerializer(serializers.ModelSerializer):
         ]
     
     def get_products(self, obj):
-        """Solo productos disponibles"""
-        products = obj.products.filter(is_available=True)
-        return ProductBotSerializer(products, many=True).data
+        """Solo productos disponibles (prefetch en `available_products`)"""
+        products = getattr(obj, 'available_products', None)
+        if products is None:
+            products = obj.products.filter(is_available=True)
+        return ProductBotSerializer(products, many=True, context=self.context).data
 
 
 
@@ -121,6 +138,7 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
             'is_available',
             'is_featured',
             'preparation_time',
+            'stock',
         ]
     
     def validate_price(self, value):
@@ -151,4 +169,28 @@ class CategoryCreateUpdateSerializer(serializers.ModelSerializer):
         instance = self.instance
         if Category.objects.filter(name__iexact=value).exclude(id=instance.id if instance else None).exists():
             raise serializers.ValidationError("Ya existe una categoría con este nombre")
-        return value
\ No newline at end of file
+        return value
+
+
+class MenuVersionSerializer(serializers.ModelSerializer):
+    """Versión publicada del menú (sin el contenido completo)"""
+    
+    published_by_email = serializers.EmailField(source='published_by.email', read_only=True, default=None)
+    
+    class Meta:
+        model = MenuVersion
+        fields = [
+            'id',
+            'checksum',
+            'product_count',
+            'notes',
+            'published_by_email',
+            'published_at',
+        ]
+        read_only_fields = fields
+
+
+class MenuPublishSerializer(serializers.Serializer):
+    """Serializer para publicar el borrador actual"""
+    
+    notes = serializers.CharField(required=False, allow_blank=True, default='', max_length=255)
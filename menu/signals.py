@@ -0,0 +1,31 @@
+# menu/signals.py
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .images import get_worker
+from .models import Category, Product
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def menu_changed(sender, **kwargs):
+    """
+    Los cambios quedan en el borrador hasta publicar
+    Con MENU_AUTO_PUBLISH se publica al confirmar la transacción
+    """
+    if settings.MENU_AUTO_PUBLISH:
+        from .versions import publish_menu
+        transaction.on_commit(publish_menu)
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, **kwargs):
+    """Generar las miniaturas de la imagen nueva en segundo plano"""
+    if instance.image_url and settings.THUMBNAIL_AUTO_ENQUEUE:
+        image_url = instance.image_url
+        transaction.on_commit(lambda: get_worker().enqueue(image_url))
@@ -0,0 +1,246 @@
+# menu/snapshot.py
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from functools import cached_property
+
+from django.conf import settings
+from django.core.cache import cache
+
+MENU_STATE_KEY = 'menu:state'
+
+
+def get_menu_state():
+    """
+    (id, tag, assets) vigentes: copia en cache de la fila de MenuState
+
+    La BD es la fuente de verdad (contadores atómicos, sin desalojo); quien
+    la cambia refresca la copia al confirmar. El vencimiento corto
+    (MENU_STATE_TTL) acota cuánto puede durar una copia vieja guardada por
+    una escritura concurrente o que la cache haya descartado.
+    """
+    state = cache.get(MENU_STATE_KEY)
+    if not isinstance(state, (list, tuple)):
+        from .versions import refresh_menu_state
+
+        state = refresh_menu_state()
+    return tuple(state)
+
+
+def get_menu_release():
+    """
+    (id, tag) de la MenuVersion publicada vigente
+
+    El tag (prefijo del checksum) distingue contenidos aunque un id se repita
+    (BD reseteada en desarrollo, rollbacks de tests). Las versiones son
+    inmutables: todo lo cacheado por (id, tag) es válido para siempre.
+    """
+    return get_menu_state()[:2]
+
+
+def get_menu_version():
+    """Id de la MenuVersion publicada vigente"""
+    return get_menu_release()[0]
+
+
+def get_menu_assets():
+    """Generación de assets derivados (miniaturas) que no cambian la versión del menú"""
+    return get_menu_state()[2]
+
+
+def bump_menu_assets():
+    """Re-renderizar los payloads del menú (p. ej. hay miniaturas nuevas)"""
+    from .versions import bump_assets
+
+    return bump_assets()
+
+
+@dataclass(frozen=True, slots=True)
+class ProductEntry:
+    """Datos de un producto tal como quedan en el snapshot"""
+
+    id: int
+    category_id: int
+    name: str
+    description: str
+    price: Decimal
+    is_available: bool
+    preparation_time: int
+    category_is_active: bool
+    image_url: str
+    is_featured: bool
+    tracks_stock: bool
+    created_at: str
+
+    @property
+    def is_visible(self):
+        """Visible para clientes (mismo criterio que ProductViewSet)"""
+        return self.is_available and self.category_is_active
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryEntry:
+    id: int
+    name: str
+    description: str
+    is_active: bool
+    created_at: str
+
+
+PRODUCT_FIELDS = [
+    'id', 'category_id', 'name', 'description', 'price', 'is_available',
+    'preparation_time', 'category__is_active', 'image_url', 'is_featured', 'stock', 'created_at',
+]
+CATEGORY_FIELDS = ['id', 'name', 'description', 'is_active', 'created_at']
+
+
+def fetch_menu_rows():
+    """
+    Productos y categorías del borrador en el orden del menú (2 queries,
+    siempre a la primaria) - es lo que se copia al publicar una versión
+    """
+    from .models import Category, Product
+
+    products = Product.objects.using('default').values_list(*PRODUCT_FIELDS)
+    categories = Category.objects.using('default').values_list(*CATEGORY_FIELDS)
+    return (
+        # El snapshot solo guarda si el producto controla stock, no la cantidad
+        [row[:-2] + (row[-2] is not None, row[-1].isoformat()) for row in products],
+        [row[:-1] + (row[-1].isoformat(),) for row in categories],
+    )
+
+
+def fetch_version_rows(version):
+    """Filas de una versión publicada (1 query)"""
+    from .models import MenuVersion
+
+    return MenuVersion.objects.using('default').get(pk=version).rows()
+
+
+class MenuSnapshot:
+    """Foto en memoria del menú (productos y categorías) para una versión"""
+
+    def __init__(self, version, products, categories):
+        self.version = version
+        # Ambos en el orden del menú: categorías por nombre, productos por categoría y nombre
+        self.products = products
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.products)
+
+    def get(self, product_id):
+        return self.products.get(product_id)
+
+    @cached_property
+    def search_index(self):
+        """Índice invertido de búsqueda, se arma una vez por versión"""
+        from .search import SearchIndex
+
+        return SearchIndex(self.products)
+
+    @classmethod
+    def build(cls, version):
+        products, categories = fetch_version_rows(version)
+        return cls(
+            version,
+            {row[0]: ProductEntry(*row) for row in products},
+            [CategoryEntry(*row) for row in categories],
+        )
+
+
+def hydrate_menu(snapshot):
+    """
+    Categorías activas como instancias de modelo con sus productos ya
+    cargados, para pasarlas a los serializers sin tocar la base de datos
+
+    - category.products.all() → todos sus productos
+    - category.available_products → solo disponibles
+    - category.active_products_count → sin COUNT
+    """
+    from .models import Category, Product
+
+    categories = {}
+    products_by_category = {}
+    for entry in snapshot.categories:
+        if not entry.is_active:
+            continue
+        category = Category(
+            id=entry.id,
+            name=entry.name,
+            description=entry.description,
+            is_active=entry.is_active,
+            created_at=datetime.fromisoformat(entry.created_at),
+        )
+        category._state.adding = False
+        category._state.db = 'default'
+        category.available_products = []
+        categories[entry.id] = category
+        products_by_category[entry.id] = []
+
+    for entry in snapshot.products.values():
+        category = categories.get(entry.category_id)
+        if category is None:
+            continue
+        product = Product(
+            id=entry.id,
+            category=category,
+            name=entry.name,
+            description=entry.description,
+            price=entry.price,
+            image_url=entry.image_url,
+            is_available=entry.is_available,
+            preparation_time=entry.preparation_time,
+            is_featured=entry.is_featured,
+            created_at=datetime.fromisoformat(entry.created_at),
+        )
+        product._state.adding = False
+        product._state.db = 'default'
+        products_by_category[category.id].append(product)
+        if entry.is_available:
+            category.available_products.append(product)
+
+    for category in categories.values():
+        category.num_active_products = len(category.available_products)
+        # Igual que prefetch_related('products'): el manager devuelve esta lista
+        products = Product.objects.filter(category=category)
+        products._result_cache = products_by_category[category.id]
+        products._prefetch_done = True
+        category._prefetched_objects_cache = {'products': products}
+
+    return list(categories.values())
+
+
+_lock = threading.Lock()
+_snapshot = None
+_release = None
+
+
+def get_snapshot():
+    """
+    Snapshot de la versión publicada vigente
+
+    Con MENU_SNAPSHOT_DIR configurado se usa el archivo compilado y mapeado
+    en memoria (compartido entre workers); si no, un snapshot por proceso.
+    Solo se reconstruye/re-mapea cuando se publica otra versión.
+    """
+    global _snapshot, _release
+
+    release = get_menu_release()
+    snapshot = _snapshot
+    if snapshot is not None and _release == release:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _release != release:
+            version, tag = release
+            if settings.MENU_SNAPSHOT_DIR:
+                from .snapshot_file import load_snapshot_file
+
+                _snapshot = load_snapshot_file(settings.MENU_SNAPSHOT_DIR, version, tag)
+            else:
+                _snapshot = MenuSnapshot.build(version)
+            _release = release
+        return _snapshot
@@ -0,0 +1,266 @@
+# menu/snapshot_file.py
+"""
+Snapshot del menú compilado a un archivo binario y mapeado en memoria
+
+Un solo worker lee la versión publicada y escribe menu-<versión>.bin; el
+resto de los workers lo abre con mmap de solo lectura, así todos comparten
+las mismas páginas del sistema operativo. Las lecturas (precio,
+disponibilidad) se decodifican directamente del buffer, sin queries.
+
+Formato (little endian):
+    header | productos (orden del menú) | categorías | índice id→fila | strings UTF-8
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping
+from decimal import Decimal
+from functools import cached_property
+from pathlib import Path
+
+from .snapshot import CategoryEntry, ProductEntry, fetch_version_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock, a lo sumo dos workers compilan la misma versión
+    fcntl = None
+
+MAGIC = b'DIHCMENU'
+FORMAT_VERSION = 2
+KEEP_FILES = 3
+
+# magic, formato, versión del menú, n productos, n categorías
+HEADER = struct.Struct('<8sHxxqII')
+# id, category_id, precio en centavos, preparación, flags, (offset, largo) x4 strings
+PRODUCT = struct.Struct('<qqqiB3x8I')
+# id, flags, (offset, largo) x3 strings
+CATEGORY = struct.Struct('<qB7x6I')
+# id, fila (ordenado por id para búsqueda binaria)
+INDEX = struct.Struct('<qq')
+
+AVAILABLE, FEATURED, CATEGORY_ACTIVE, TRACKS_STOCK = 1, 2, 4, 8
+
+
+def snapshot_path(directory, version, tag):
+    # Tag y formato van en el nombre: nunca se reutiliza un archivo de otro contenido
+    return Path(directory) / f'menu-{version}-{tag}.v{FORMAT_VERSION}.bin'
+
+
+class _Strings:
+    """Acumula strings UTF-8 y devuelve (offset, largo) de cada una"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add(self, value):
+        data = (value or '').encode()
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        return offset, len(data)
+
+
+def compile_snapshot(path, version):
+    """Leer la versión publicada (1 query) y escribir el archivo de forma atómica"""
+    products, categories = fetch_version_rows(version)
+    strings = _Strings()
+
+    product_records = []
+    for (pid, category_id, name, description, price, is_available,
+         preparation_time, category_is_active, image_url, is_featured, tracks_stock, created_at) in products:
+        flags = (
+            (AVAILABLE if is_available else 0)
+            | (FEATURED if is_featured else 0)
+            | (CATEGORY_ACTIVE if category_is_active else 0)
+            | (TRACKS_STOCK if tracks_stock else 0)
+        )
+        product_records.append(PRODUCT.pack(
+            pid, category_id, int(price * 100), preparation_time, flags,
+            *strings.add(name), *strings.add(description),
+            *strings.add(image_url), *strings.add(created_at),
+        ))
+
+    category_records = [
+        CATEGORY.pack(
+            cid, CATEGORY_ACTIVE if is_active else 0,
+            *strings.add(name), *strings.add(description), *strings.add(created_at),
+        )
+        for cid, name, description, is_active, created_at in categories
+    ]
+
+    index = sorted((row[0], position) for position, row in enumerate(products))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.menu-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(HEADER.pack(MAGIC, FORMAT_VERSION, version, len(products), len(categories)))
+            fh.writelines(product_records)
+            fh.writelines(category_records)
+            fh.writelines(INDEX.pack(pid, position) for pid, position in index)
+            fh.writelines(strings.chunks)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class _ProductTable(Mapping):
+    """Vista id → ProductEntry sobre el archivo (decodifica bajo demanda)"""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __getitem__(self, product_id):
+        position = self._snapshot._find(product_id)
+        if position is None:
+            raise KeyError(product_id)
+        return self._snapshot._product(position)
+
+    def __iter__(self):
+        snapshot = self._snapshot
+        for position in range(snapshot.product_count):
+            yield PRODUCT.unpack_from(snapshot._buffer, snapshot._products_offset + position * PRODUCT.size)[0]
+
+    def __len__(self):
+        return self._snapshot.product_count
+
+    def values(self):
+        # Recorrido secuencial en el orden del menú
+        return (self._snapshot._product(position) for position in range(len(self)))
+
+
+class MappedMenuSnapshot:
+    """Misma interfaz que MenuSnapshot, respaldado por el archivo mapeado"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        magic, file_format, version, product_count, category_count = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or file_format != FORMAT_VERSION:
+            raise ValueError(f"Snapshot de menú inválido: {path}")
+
+        self.version = version
+        self.product_count = product_count
+        self.category_count = category_count
+        self._products_offset = HEADER.size
+        self._categories_offset = self._products_offset + product_count * PRODUCT.size
+        self._index_offset = self._categories_offset + category_count * CATEGORY.size
+        self._strings_offset = self._index_offset + product_count * INDEX.size
+        self.products = _ProductTable(self)
+
+    def __len__(self):
+        return self.product_count
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return str(self._buffer[start:start + length], 'utf-8')
+
+    def _find(self, product_id):
+        """Búsqueda binaria sobre el índice ordenado por id"""
+        low, high = 0, self.product_count
+        while low < high:
+            middle = (low + high) // 2
+            pid, position = INDEX.unpack_from(self._buffer, self._index_offset + middle * INDEX.size)
+            if pid == product_id:
+                return position
+            if pid < product_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _product(self, position):
+        (pid, category_id, cents, preparation_time, flags,
+         name_offset, name_length, description_offset, description_length,
+         image_offset, image_length, created_offset, created_length) = PRODUCT.unpack_from(
+            self._buffer, self._products_offset + position * PRODUCT.size
+        )
+        return ProductEntry(
+            id=pid,
+            category_id=category_id,
+            name=self._string(name_offset, name_length),
+            description=self._string(description_offset, description_length),
+            price=Decimal(cents).scaleb(-2),
+            is_available=bool(flags & AVAILABLE),
+            preparation_time=preparation_time,
+            category_is_active=bool(flags & CATEGORY_ACTIVE),
+            image_url=self._string(image_offset, image_length),
+            is_featured=bool(flags & FEATURED),
+            tracks_stock=bool(flags & TRACKS_STOCK),
+            created_at=self._string(created_offset, created_length),
+        )
+
+    def get(self, product_id):
+        position = self._find(product_id)
+        return None if position is None else self._product(position)
+
+    @cached_property
+    def categories(self):
+        entries = []
+        for position in range(self.category_count):
+            (cid, flags, name_offset, name_length, description_offset, description_length,
+             created_offset, created_length) = CATEGORY.unpack_from(
+                self._buffer, self._categories_offset + position * CATEGORY.size
+            )
+            entries.append(CategoryEntry(
+                id=cid,
+                name=self._string(name_offset, name_length),
+                description=self._string(description_offset, description_length),
+                is_active=bool(flags & CATEGORY_ACTIVE),
+                created_at=self._string(created_offset, created_length),
+            ))
+        return entries
+
+    @cached_property
+    def search_index(self):
+        from .search import SearchIndex
+
+        return SearchIndex(self.products)
+
+
+class _CompileLock:
+    """Lock entre procesos para que un solo worker compile cada versión"""
+
+    def __init__(self, directory):
+        self.path = Path(directory) / '.compile.lock'
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fh = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fh, fcntl.LOCK_UN)
+        self.fh.close()
+
+
+def _cleanup(directory, keep):
+    """Borrar versiones viejas (los workers que aún las tengan mapeadas no se ven afectados)"""
+    files = sorted(Path(directory).glob('menu-*.bin'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def load_snapshot_file(directory, version, tag):
+    """Mapear el snapshot de la versión, compilándolo si ningún worker lo hizo aún"""
+    path = snapshot_path(directory, version, tag)
+    if not path.exists():
+        with _CompileLock(directory):
+            if not path.exists():
+                compile_snapshot(path, version)
+                _cleanup(directory, KEEP_FILES)
+    return MappedMenuSnapshot(path)
@@ -1,3 +1,618 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import images, versions
+from .catalog import CatalogError, import_catalog, iter_json, read_catalog
+from .images import LocalFileFetcher, process_image, thumbnail_urls
+from .models import Category, MenuState, MenuVersion, PopularityEpoch, Product, ProductSales
+from .popularity import get_buffer
+from .recommendations import build_recommendations
+from .search import SearchIndex
+from .snapshot import bump_menu_assets, fetch_menu_rows, get_menu_assets, get_menu_version
+from .versions import publish_menu
+from .views import CategoryViewSet, ProductViewSet
+
+
+class MenuQueryCountTests(TestCase):
+    """El menú completo se arma con 1 query (la versión publicada) sin importar su tamaño"""
+
+    def setUp(self):
+        # Sin payloads cacheados: medir la construcción real
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for c in range(5):
+                category = Category.objects.create(name=f'Categoría {c}')
+                for p in range(4):
+                    Product.objects.create(
+                        category=category,
+                        name=f'Producto {c}-{p}',
+                        price='10.00',
+                        is_available=p != 0,
+                    )
+            publish_menu()
+
+    def test_bot_menu_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/menu/categories/bot-menu/')
+
+        data = response.json()
+        self.assertEqual(data['total_categories'], 5)
+        self.assertEqual(len(data['categories'][0]['products']), 3)
+        self.assertEqual(data['categories'][0]['products'][0]['category_name'], 'Categoría 0')
+
+    def reset_to_draft(self):
+        """Sin versión publicada ni caches: el próximo request lee el borrador (tablas vivas)"""
+        from . import snapshot
+
+        MenuVersion.objects.all().delete()
+        cache.clear()
+        snapshot._snapshot = snapshot._release = None
+
+    def get_menu(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = CategoryViewSet.as_view({'get': action})(APIRequestFactory().get('/api/menu/categories/'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_live_menu_two_queries(self):
+        # Borrador en 2 queries (productos con su categoría + categorías), sin N+1
+        with self.assertNumQueries(2):
+            fetch_menu_rows()
+        more = Category.objects.create(name='Extra')
+        for p in range(4):
+            Product.objects.create(category=more, name=f'Extra {p}', price='5.00')
+        with self.assertNumQueries(2):
+            fetch_menu_rows()
+
+    def test_live_menu_endpoints_query_count_is_constant(self):
+        for action in ('bot_menu', 'with_products'):
+            with self.subTest(action=action):
+                self.reset_to_draft()
+                with CaptureQueriesContext(connection) as queries:
+                    self.get_menu(action)
+                live = [q['sql'] for q in queries if 'FROM "products"' in q['sql'] or 'FROM "categories"' in q['sql']]
+                self.assertEqual(len(live), 2, live)
+
+                more = Category.objects.create(name=f'Extra {action}')
+                for p in range(4):
+                    Product.objects.create(category=more, name=f'Extra {p}', price='5.00')
+                self.reset_to_draft()
+                with self.assertNumQueries(len(queries)):
+                    self.get_menu(action)
+
+    def test_menu_reads_from_compiled_snapshot(self):
+        # bot-menu compila el snapshot de esta versión
+        self.client.get('/api/menu/categories/bot-menu/')
+
+        # with-products (otro payload) ya no consulta la base de datos
+        view = CategoryViewSet.as_view({'get': 'with_products'})
+        request = APIRequestFactory().get('/api/menu/categories/with-products/')
+        with self.assertNumQueries(0):
+            response = view(request)
+
+        data = json.loads(response.content)
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['active_products_count'], 3)
+        self.assertEqual(len(data[0]['products']), 4)
+        self.assertEqual(data[0]['products'][0]['price'], '10.00')
+
+    def test_compressed_payload_is_cached(self):
+        import brotli
+
+        plain = self.client.get('/api/menu/categories/bot-menu/')
+        first = self.client.get('/api/menu/categories/bot-menu/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(first['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(first.content), plain.content)
+
+        # Repetido: sale de la cache ya comprimido, sin BD ni compresión
+        with self.assertNumQueries(0), mock.patch('menu.cache.compress') as compress:
+            second = self.client.get('/api/menu/categories/bot-menu/', HTTP_ACCEPT_ENCODING='br')
+        compress.assert_not_called()
+        self.assertEqual(second.content, first.content)
+
+        # El ETag débil de la versión comprimida también valida
+        revalidated = self.client.get('/api/menu/categories/bot-menu/', HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_with_products_single_query(self):
+        view = CategoryViewSet.as_view({'get': 'with_products'})
+        request = APIRequestFactory().get('/api/menu/categories/with-products/')
+
+        with self.assertNumQueries(1):
+            response = view(request)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_category_list_annotates_active_count(self):
+        view = CategoryViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/api/menu/categories/')
+
+        with self.assertNumQueries(1):
+            response = view(request)
+            response.render()
+
+        self.assertEqual(response.data[0]['active_products_count'], 3)
+
+
+class MenuETagTests(TestCase):
+    """El menú cacheado se revalida por ETag y cambia con cada versión publicada"""
+
+    URL = '/api/menu/categories/bot-menu/'
+
+    def setUp(self):
+        from core.models import User
+
+        cache.clear()
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        category = Category.objects.create(name='Pizzas')
+        self.product = Product.objects.create(category=category, name='Pizza', price='45.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_menu()
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"bot-menu-'))
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+    def test_etag_changes_after_toggle_availability(self):
+        etag = self.client.get(self.URL)['ETag']
+
+        request = APIRequestFactory().post(f'/api/menu/products/{self.product.id}/toggle_availability/')
+        force_authenticate(request, user=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = ProductViewSet.as_view({'post': 'toggle_availability'})(request, pk=self.product.id)
+        self.assertEqual(response.status_code, 200)
+
+        fresh = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(fresh.json()['categories'][0]['products'], [])
+
+    def test_etag_changes_after_publish(self):
+        etag = self.client.get(self.URL)['ETag']
+
+        Product.objects.filter(id=self.product.id).update(price='50.00')
+        # Sin publicar, el borrador no cambia lo que se sirve
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_menu()
+        fresh = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(fresh.json()['categories'][0]['products'][0]['price'], '50.00')
+
+
+class SearchTests(TestCase):
+    """Búsqueda sin acentos, por prefijo y con el nombre por encima de la descripción"""
+
+    URL = '/api/menu/products/search/'
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Pizzas')
+        self.mushroom = Product.objects.create(
+            category=category, name='Pizza de Champiñones', description='Con queso', price='45.00'
+        )
+        self.pepperoni = Product.objects.create(
+            category=category, name='Pizza Pepperoni', description='Con champiñones extra', price='50.00'
+        )
+        self.soda = Product.objects.create(category=category, name='Gaseosa', price='8.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_menu()
+
+    def search(self, q, **params):
+        response = self.client.get(self.URL, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['products']]
+
+    def test_accent_folding(self):
+        self.assertEqual(self.search('champinones')[0], self.mushroom.id)
+        self.assertEqual(self.search('CHAMPIÑONES')[0], self.mushroom.id)
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('pepp'), [self.pepperoni.id])
+        self.assertEqual(self.search('gase'), [self.soda.id])
+        self.assertEqual(self.search('pizza pep'), [self.pepperoni.id])
+
+    def test_name_ranks_above_description(self):
+        self.assertEqual(self.search('champiñones'), [self.mushroom.id, self.pepperoni.id])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.search('pizza', limit=-1)), 1)
+        self.assertEqual(len(self.search('pizza', limit=0)), 1)
+        self.assertEqual(len(self.search('pizza', limit=1000)), 2)
+
+    def test_prefix_cap_keeps_most_frequent_terms(self):
+        names = [f'pa{i:03d}' for i in range(SearchIndex.MAX_PREFIX_TERMS + 10)] + ['pulpo'] * 5
+        index = SearchIndex({
+            product_id: SimpleNamespace(id=product_id, name=name, description='', is_visible=True)
+            for product_id, name in enumerate(names, start=1)
+        })
+        # Alfabéticamente 'pulpo' queda fuera de los primeros 50 términos con 'p'
+        results = index.search('p', limit=len(names))
+        # 49 términos 'paNNN' de un producto + 'pulpo' con sus 5
+        self.assertEqual(len(results), SearchIndex.MAX_PREFIX_TERMS - 1 + 5)
+        self.assertIn('pulpo', {names[product_id - 1] for product_id, _ in results})
+
+
+@override_settings(MENU_AUTO_PUBLISH=False)
+class MenuVersionTests(TestCase):
+    """Los cambios del staff quedan en borrador hasta publicar una versión nueva"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Pizzas')
+        self.category = category
+        self.product = Product.objects.create(category=category, name='Margarita', price='45.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.version = publish_menu()
+
+    def bot_menu_price(self):
+        data = self.client.get('/api/menu/categories/bot-menu/').json()
+        return data['categories'][0]['products'][0]['price']
+
+    def test_draft_changes_need_publish(self):
+        self.product.price = '50.00'
+        self.product.save()
+        self.assertEqual(self.bot_menu_price(), '45.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_version = publish_menu()
+
+        self.assertGreater(new_version.id, self.version.id)
+        self.assertEqual(get_menu_version(), new_version.id)
+        self.assertEqual(self.bot_menu_price(), '50.00')
+
+    def test_public_product_reads_use_published_version(self):
+        from core.models import User
+
+        self.product.price = '50.00'
+        self.product.save()
+        draft = Product.objects.create(category=self.category, name='Napolitana', price='48.00')
+
+        def get(action, user=None, params=None, **kwargs):
+            request = APIRequestFactory().get('/api/menu/products/', params)
+            if user is not None:
+                force_authenticate(request, user=user)
+            return ProductViewSet.as_view({'get': action})(request, **kwargs)
+
+        self.assertEqual([(p['id'], p['price']) for p in get('list').data], [(self.product.id, '45.00')])
+        self.assertEqual(get('retrieve', pk=self.product.id).data['price'], '45.00')
+        self.assertEqual(get('retrieve', pk=draft.id).status_code, 404)
+        self.assertEqual(get('available').data['total'], 1)
+        self.assertEqual(len(get('list', params={'search': 'marga', 'ordering': '-price'}).data), 1)
+        self.assertEqual(get('list', params={'category': self.category.id + 1}).data, [])
+
+        staff = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.assertEqual({p['price'] for p in get('list', user=staff).data}, {'48.00', '50.00'})
+
+    @override_settings(MENU_AUTO_PUBLISH=True)
+    def test_auto_publish(self):
+        self.product.price = '50.00'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.bot_menu_price(), '50.00')
+
+    def test_unchanged_draft_reuses_version(self):
+        self.assertEqual(publish_menu().id, self.version.id)
+        self.assertEqual(MenuVersion.objects.count(), 1)
+
+    def test_published_versions_are_immutable(self):
+        with self.assertRaises(ValueError):
+            self.version.save()
+        with self.assertRaises(ValueError):
+            self.version.delete()
+
+    def test_state_survives_cache_eviction(self):
+        bump_menu_assets()
+        cache.clear()
+        bump_menu_assets()
+        cache.clear()
+        self.assertEqual(get_menu_assets(), 2)
+        self.assertEqual(get_menu_version(), self.version.id)
+
+    def test_current_version_never_goes_back(self):
+        self.product.price = '50.00'
+        self.product.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            new_version = publish_menu()
+        # Una publicación más vieja que confirma tarde no pisa a la nueva
+        with self.captureOnCommitCallbacks(execute=True):
+            versions._advance(self.version.id)
+        self.assertEqual(MenuState.objects.get().version_id, new_version.id)
+        self.assertEqual(get_menu_version(), new_version.id)
+
+
+class ThumbnailTests(TestCase):
+    """Las miniaturas se generan una vez y se sirven inmutables con rutas relativas"""
+
+    def setUp(self):
+        cache.clear()
+        images._resolved.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        originals = os.path.join(root, 'originals')
+        os.makedirs(originals)
+        Image.new('RGB', (800, 600), 'red').save(os.path.join(originals, 'pizza.png'))
+        settings_override = self.settings(IMAGE_FETCHER_ROOT=originals, THUMBNAIL_ROOT=os.path.join(root, 'thumbs'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.url = 'https://cdn.example.com/img/pizza.png'
+        category = Category.objects.create(name='Pizzas')
+        Product.objects.create(category=category, name='Margarita', price='45.00', image_url=self.url)
+
+    def test_thumbnail_rendered_and_served(self):
+        self.assertIsNone(thumbnail_urls(self.url))
+        key = process_image(self.url, LocalFileFetcher())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_menu()
+        product = self.client.get('/api/menu/categories/bot-menu/').json()['categories'][0]['products'][0]
+        path = f'/media/thumbs/{key}/md.webp'
+        self.assertEqual(product['thumbnails']['md']['webp'], path)
+        # El ref ya se leyó: las siguientes serializaciones no tocan el disco
+        with mock.patch.object(images, '_ref_path') as ref_path:
+            self.assertEqual(thumbnail_urls(self.url)['md']['webp'], path)
+        ref_path.assert_not_called()
+
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as thumb:
+            self.assertEqual(thumb.size, (320, 240))
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.assertEqual(self.client.get(f'/media/thumbs/{key}/xl.webp').status_code, 404)
+        self.assertEqual(self.client.get(f'/media/thumbs/{key}/md.gif').status_code, 404)
+
+
+class PopularityTests(TestCase):
+    """Los destacados en modo popular siguen las ventas entregadas"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Pizzas')
+        self.old, self.recent, self.manual = [
+            Product.objects.create(category=category, name=name, price='10.00')
+            for name in ('Antigua', 'Reciente', 'Manual')
+        ]
+        self.manual.is_featured = True
+        self.manual.save()
+
+    def featured_ids(self):
+        view = ProductViewSet.as_view({'get': 'featured'})
+        response = view(APIRequestFactory().get('/api/menu/products/featured/', {'ranking': 'popular'}))
+        return [product['id'] for product in response.data]
+
+    def test_falls_back_to_manual_without_sales(self):
+        self.assertEqual(self.featured_ids(), [self.manual.id])
+
+    def test_recent_sales_outrank_older_ones(self):
+        month_ago = time.time() - 30 * 24 * 3600
+        get_buffer().add([(self.old.id, 5)], when=month_ago)
+        get_buffer().add([(self.recent.id, 2)])
+
+        self.old.sales.refresh_from_db()
+        self.assertEqual(self.old.sales.units_sold, 5)
+        self.assertEqual(self.featured_ids(), [self.recent.id, self.old.id])
+
+    @override_settings(POPULARITY_HALF_LIFE_DAYS=1)
+    def test_old_epoch_is_rebased_instead_of_overflowing(self):
+        # 30 años con vida media de 1 día: e^(λ·t) no entra en un float
+        years_ago = time.time() - 30 * 365 * 24 * 3600
+        PopularityEpoch.objects.update_or_create(pk=1, defaults={'epoch': years_ago})
+        ProductSales.objects.create(product=self.old, units_sold=100, popularity=100)
+
+        get_buffer().add([(self.recent.id, 1)])
+
+        self.assertGreater(PopularityEpoch.objects.get().epoch, time.time() - 60)
+        self.assertAlmostEqual(self.recent.sales.popularity, 1, places=3)
+        # Las ventas de hace 30 años ya no cuentan
+        self.assertEqual(ProductSales.objects.get(product=self.old).popularity, 0)
+        self.assertEqual(self.featured_ids(), [self.recent.id])
+
+
+class RecommendationTests(TestCase):
+    """Se compran juntos: lift sobre pedidos entregados, calculado de forma incremental"""
+
+    def setUp(self):
+        from core.models import User
+
+        cache.clear()
+        self.user = User.objects.create_user(email='cliente@example.com', password='x', role='CUSTOMER')
+        category = Category.objects.create(name='Combos')
+        self.burger, self.fries, self.soda, self.salad = [
+            Product.objects.create(category=category, name=name, price='10.00')
+            for name in ('Hamburguesa', 'Papas', 'Gaseosa', 'Ensalada')
+        ]
+
+    def deliver(self, *products, ago=timedelta(hours=1)):
+        from orders.models import Order, OrderItem
+
+        order = Order.objects.create(
+            client=self.user,
+            status='delivered',
+            delivery_latitude='-17.783300',
+            delivery_longitude='-63.182100',
+            subtotal=Decimal('20.00'),
+            delivery_fee=Decimal('10.00'),
+            delivered_at=timezone.now() - ago,
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, unit_price='10.00')
+
+    def related_ids(self, product):
+        view = ProductViewSet.as_view({'get': 'related'})
+        response = view(APIRequestFactory().get(f'/api/menu/products/{product.id}/related/'), pk=product.id)
+        return [item['id'] for item in response.data]
+
+    def test_incremental_runs_only_read_new_orders(self):
+        for _ in range(3):
+            self.deliver(self.burger, self.fries)
+        self.deliver(self.burger, self.soda)
+        self.deliver(self.salad)
+
+        first = build_recommendations(min_support=1, until=timezone.now() - timedelta(minutes=20))
+        self.assertEqual(first.orders, 5)
+        self.assertEqual(self.related_ids(self.burger), [self.fries.id, self.soda.id])
+        self.assertEqual(self.related_ids(self.salad), [])
+
+        for _ in range(3):
+            self.deliver(self.soda, self.fries, ago=timedelta(minutes=10))
+        second = build_recommendations(min_support=1)
+        self.assertEqual(second.orders, 3)
+        self.assertEqual(second.orders_total, 8)
+        self.assertEqual(self.related_ids(self.soda), [self.fries.id, self.burger.id])
+
+        view = ProductViewSet.as_view({'get': 'cart_recommendations'})
+        request = APIRequestFactory().get(
+            '/api/menu/products/cart-recommendations/', {'products': f'{self.burger.id},{self.fries.id}'}
+        )
+        self.assertEqual([item['id'] for item in view(request).data], [self.soda.id])
+
+    def test_related_unknown_product_is_404(self):
+        view = ProductViewSet.as_view({'get': 'related'})
+        for pk in ('abc', '999999'):
+            response = view(APIRequestFactory().get(f'/api/menu/products/{pk}/related/'), pk=pk)
+            self.assertEqual(response.status_code, 404)
+
+
+class LoadMenuTests(TestCase):
+    """El menú inicial solo se vuelve a cargar si cambiaron los datos (checksum)"""
+
+    def test_second_run_skips_import(self):
+        from .scripts import load_menu
+
+        with mock.patch('builtins.print'):
+            load_menu.run()
+            self.assertEqual(Product.objects.count(), len(load_menu.PRODUCTS))
+
+            with mock.patch.object(load_menu, 'import_catalog') as import_catalog, self.assertNumQueries(1):
+                load_menu.run()
+            import_catalog.assert_not_called()
+
+            with mock.patch.object(load_menu, 'import_catalog', wraps=load_menu.import_catalog) as import_catalog:
+                load_menu.run('force')
+            import_catalog.assert_called_once()
+
+            with mock.patch.object(load_menu, 'data_checksum', return_value='otro'):
+                with mock.patch.object(load_menu, 'import_catalog', wraps=load_menu.import_catalog) as import_catalog:
+                    load_menu.run()
+            import_catalog.assert_called_once()
+
+
+class CatalogImportTests(TestCase):
+    """Importación en streaming: re-importar sin cambios no escribe y prune respeta las órdenes"""
+
+    ROWS = [
+        {'category': 'Pizzas', 'name': 'Margarita', 'price': '45.00', 'description': 'Tomate y queso'},
+        {'category': 'Pizzas', 'name': 'Napolitana', 'price': '50.00'},
+        {'category': 'Bebidas', 'name': 'Limonada', 'price': '12.50', 'is_available': 'no'},
+    ]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, 'w', newline='', encoding='utf-8') as fh:
+            fh.write(content)
+        return path
+
+    def write_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['category', 'name', 'price', 'description', 'is_available'])
+        writer.writeheader()
+        writer.writerows(rows)
+        return self.write('catalogo.csv', buffer.getvalue())
+
+    def products(self):
+        return {
+            name: (str(price), available)
+            for name, price, available in Product.objects.values_list('name', 'price', 'is_available')
+        }
+
+    def test_csv_import_and_noop_reimport(self):
+        path = self.write_csv(self.ROWS)
+        out = io.StringIO()
+        call_command('import_catalog', path, stdout=out)
+        self.assertIn('3 creados', out.getvalue())
+        self.assertEqual(self.products(), {
+            'Margarita': ('45.00', True), 'Napolitana': ('50.00', True), 'Limonada': ('12.50', False),
+        })
+
+        with CaptureQueriesContext(connection) as queries:
+            result = import_catalog(read_catalog(path))
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 3))
+        self.assertFalse(result.changed)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+    def test_json_array_and_lines_are_streamed(self):
+        array = self.write('catalogo.json', json.dumps(self.ROWS, indent=2))
+        lines = self.write('catalogo.jsonl', '\n'.join(json.dumps(row) for row in self.ROWS) + '\n')
+
+        # Trozos más chicos que un objeto: cada fila se arma con varias lecturas
+        with open(array, encoding='utf-8') as fh:
+            self.assertEqual(list(iter_json(fh, chunk_size=16)), self.ROWS)
+        with open(lines, encoding='utf-8') as fh:
+            self.assertEqual(list(iter_json(fh, chunk_size=16)), self.ROWS)
+        with open(self.write('roto.json', json.dumps(self.ROWS)[:-5]), encoding='utf-8') as fh:
+            with self.assertRaises(CatalogError):
+                list(iter_json(fh, chunk_size=16))
+
+        result = import_catalog(read_catalog(array), chunk_size=2)
+        self.assertEqual((result.created, result.categories_created), (3, 2))
+        result = import_catalog(read_catalog(lines))
+        self.assertEqual((result.created, result.unchanged), (0, 3))
+        result = import_catalog([dict(self.ROWS[0], price='47.00')])
+        self.assertEqual((result.updated, result.unchanged), (1, 0))
+        self.assertEqual(self.products()['Margarita'], ('47.00', True))
+
+    def test_prune_keeps_products_with_orders(self):
+        from core.models import User
+        from orders.models import Order, OrderItem
+
+        import_catalog(self.ROWS)
+        ordered = Product.objects.get(name='Napolitana')
+        order = Order.objects.create(
+            client=User.objects.create_user(email='cliente@example.com', password='x', role='CUSTOMER'),
+            delivery_latitude='-17.783300',
+            delivery_longitude='-63.182100',
+            subtotal=Decimal('50.00'),
+            delivery_fee=Decimal('10.00'),
+        )
+        OrderItem.objects.create(order=order, product=ordered, quantity=1, unit_price=ordered.price)
+
+        result = import_catalog(self.ROWS[:1], prune=True, chunk_size=1)
+        self.assertEqual((result.unchanged, result.deleted, result.deactivated), (1, 1, 1))
+        self.assertEqual(self.products(), {'Margarita': ('45.00', True), 'Napolitana': ('50.00', False)})
+        self.assertTrue(OrderItem.objects.filter(product=ordered).exists())
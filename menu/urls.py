@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, ProductViewSet
+from .views import CategoryViewSet, MenuVersionViewSet, ProductViewSet
 
 # Router para los ViewSets
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'products', ProductViewSet, basename='product')
+router.register(r'versions', MenuVersionViewSet, basename='menu-version')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,127 @@
+# menu/versions.py
+"""
+Publicación de versiones inmutables del menú
+
+- publish_menu: copia el borrador (Category/Product) a una MenuVersion nueva
+- publish_availability: versión nueva = la vigente con la disponibilidad
+  actual de algunos productos (agotados por stock, toggle_availability),
+  sin publicar otros cambios pendientes del borrador
+- Si el contenido no cambió (mismo checksum) no se crea otra versión
+- La versión vigente y la generación de assets viven en MenuState (una
+  fila, UPDATE atómicos); la cache solo tiene una copia corta
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import MenuState, MenuVersion, Product
+from .snapshot import MENU_STATE_KEY, fetch_menu_rows
+
+STATE_ID = 1
+
+# Posición de is_available en las filas de productos (ver snapshot.PRODUCT_FIELDS)
+IS_AVAILABLE = 5
+
+
+def _checksum(data):
+    encoded = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def release_tag(checksum):
+    return checksum[:12]
+
+
+def _state():
+    return MenuState.objects.using('default').filter(pk=STATE_ID)
+
+
+def refresh_menu_state():
+    """
+    Leer MenuState y dejar la copia en cache para todos los workers
+
+    Si nunca se publicó, publica el borrador.
+    """
+    row = _state().values_list('version_id', 'version__checksum', 'assets').first()
+    if row is None or row[0] is None:
+        latest = MenuVersion.objects.using('default').only('id').first()
+        if latest is None:
+            publish_menu(notes='Publicación inicial')
+        else:
+            _advance(latest.id)
+        row = _state().values_list('version_id', 'version__checksum', 'assets').first()
+
+    state = [row[0], release_tag(row[1]), row[2]]
+    cache.set(MENU_STATE_KEY, state, timeout=settings.MENU_STATE_TTL)
+    return state
+
+
+def _advance(version_id):
+    """Apuntar MenuState a version_id; con publicaciones simultáneas nunca retrocede"""
+    MenuState.objects.get_or_create(pk=STATE_ID)
+    _state().filter(Q(version__isnull=True) | Q(version_id__lt=version_id)).update(version_id=version_id)
+    transaction.on_commit(refresh_menu_state)
+
+
+def bump_assets():
+    """Nueva generación de assets (F() + 1: sin incrementos perdidos entre workers)"""
+    MenuState.objects.get_or_create(pk=STATE_ID)
+    _state().update(assets=F('assets') + 1)
+    return refresh_menu_state()[2]
+
+
+def _publish(data, user=None, notes=''):
+    checksum = _checksum(data)
+    latest = MenuVersion.objects.using('default').only('id', 'checksum').first()
+    if latest is not None and latest.checksum == checksum:
+        version = latest
+    else:
+        version = MenuVersion.objects.create(
+            data=data,
+            checksum=checksum,
+            product_count=len(data['products']),
+            published_by=user,
+            notes=notes,
+        )
+    _advance(version.id)
+    return version
+
+
+@transaction.atomic
+def publish_menu(user=None, notes=''):
+    """Publicar el borrador actual como versión nueva"""
+    products, categories = fetch_menu_rows()
+    return _publish({'categories': categories, 'products': products}, user, notes)
+
+
+@transaction.atomic
+def publish_availability(product_ids=(), notes='Disponibilidad actualizada'):
+    """
+    Versión nueva con la disponibilidad real de los productos con stock
+    (y de product_ids), partiendo de la versión vigente
+
+    Se lee la disponibilidad de todos los productos con stock, no solo de
+    los que cambiaron, así dos publicaciones simultáneas no se pisan.
+    """
+    latest = MenuVersion.objects.using('default').first()
+    if latest is None:
+        return publish_menu(notes=notes)
+
+    live = dict(
+        Product.objects.using('default')
+        .filter(Q(stock__isnull=False) | Q(id__in=list(product_ids)))
+        .values_list('id', 'is_available')
+    )
+    products = []
+    for row in latest.data['products']:
+        if row[0] in live:
+            row = [*row[:IS_AVAILABLE], live[row[0]], *row[IS_AVAILABLE + 1:]]
+        products.append(row)
+
+    return _publish({'categories': latest.data['categories'], 'products': products}, notes=notes)
@@ -3,8 +3,23 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
 
-from .models import Category, Product
+from core.routers import ReplicaReadMixin
+from core.sparse import SparseQuerysetMixin
+from .cache import cached_menu_response
+from .popularity import get_top_products
+from .recommendations import recommend_for_cart, related_products
+from .images import CONTENT_TYPES, thumbnail_path
+from .search import MenuSearchFilter, search_products
+from .snapshot import get_snapshot, hydrate_menu
+
+from .models import Category, MenuVersion, Product
+from .versions import publish_availability, publish_menu
 from .serializers import (
     CategorySerializer,
     CategoryWithProductsSerializer,
@@ -13,13 +28,19 @@ from .serializers import (
     ProductSerializer,
     ProductBotSerializer,
     ProductCreateUpdateSerializer,
+    MenuVersionSerializer,
+    MenuPublishSerializer,
 )
 
 
+# Valores de ?is_featured= / ?is_available= (los mismos que acepta django-filter)
+BOOLEAN_PARAMS = {'true': True, 'True': True, '1': True, 'false': False, 'False': False, '0': False}
+
+
 # -------------------------------------------------------
 # ViewSet: Category
 # -------------------------------------------------------
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de categorías del menú
     
@@ -36,6 +57,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    replica_actions = ['list', 'retrieve', 'with_products', 'bot_menu']
     
     def get_permissions(self):
         """
@@ -57,7 +79,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filtrar solo categorías activas para clientes"""
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().with_active_products_count()
         
         # Si el usuario es admin, mostrar todas
         if self.request.user.is_staff:
@@ -71,10 +93,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
         """
         Endpoint: GET /api/menu/categories/with-products/
         Devuelve todas las categorías activas con sus productos disponibles
+        Cacheado por versión del menú (ETag / 304), armado desde el snapshot
         """
-        categories = self.get_queryset().filter(is_active=True).prefetch_related('products')
-        serializer = self.get_serializer(categories, many=True)
-        return Response(serializer.data)
+        def build():
+            categories = hydrate_menu(get_snapshot())
+            return self.get_serializer(categories, many=True).data
+        
+        return cached_menu_response(request, 'with-products', build)
     
     @action(detail=False, methods=['get'], url_path='bot-menu')
     def bot_menu(self, request):
@@ -82,24 +107,23 @@ class CategoryViewSet(viewsets.ModelViewSet):
         Endpoint: GET /api/menu/categories/bot-menu/
         Menú simplificado para el bot de Telegram
         Solo categorías y productos disponibles
+        Cacheado por versión del menú (ETag / 304), armado desde el snapshot
         """
-        categories = Category.objects.filter(
-            is_active=True
-        ).prefetch_related(
-            'products'
-        )
+        def build():
+            categories = hydrate_menu(get_snapshot())
+            serializer = self.get_serializer(categories, many=True)
+            return {
+                'categories': serializer.data,
+                'total_categories': len(categories),
+            }
         
-        serializer = self.get_serializer(categories, many=True)
-        return Response({
-            'categories': serializer.data,
-            'total_categories': categories.count(),
-        })
+        return cached_menu_response(request, 'bot-menu', build)
 
 
 # -------------------------------------------------------
 # ViewSet: Product
 # -------------------------------------------------------
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SparseQuerysetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de productos del menú
     
@@ -110,21 +134,34 @@ class ProductViewSet(viewsets.ModelViewSet):
     - destroy: Eliminar producto (admin)
     - featured: Ver productos destacados (público)
     - by_category: Ver productos de una categoría (público)
+    - search: Búsqueda rápida para type-ahead (público)
+    - related / cart_recommendations: Se compran juntos (público)
+    
+    Los clientes leen la versión publicada del menú (snapshot); el staff, el
+    borrador de la base de datos.
+    Lecturas aceptan ?fields= / ?expand= (ver core.sparse)
     """
+    published_actions = [
+        'list', 'retrieve', 'featured', 'by_category', 'available', 'related', 'cart_recommendations',
+    ]
     queryset = Product.objects.select_related('category').all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # MenuSearchFilter va al final: ordena por relevancia si no hay ?ordering=
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, MenuSearchFilter]
     filterset_fields = ['category', 'is_available', 'is_featured']
-    search_fields = ['name', 'description']
     ordering_fields = ['name', 'price', 'created_at']
     ordering = ['category__name', 'name']
+    replica_actions = ['list', 'retrieve', 'related', 'cart_recommendations']
     
     def get_permissions(self):
         """
         - GET (list, retrieve): Público
         - POST, PUT, PATCH, DELETE: Solo admin
         """
-        if self.action in ['list', 'retrieve', 'featured', 'by_category', 'available']:
+        if self.action in [
+            'list', 'retrieve', 'featured', 'by_category', 'available', 'search',
+            'related', 'cart_recommendations',
+        ]:
             return [AllowAny()]
         return [IsAdminUser()]
     
@@ -146,13 +183,95 @@ class ProductViewSet(viewsets.ModelViewSet):
         # Para otros usuarios, solo productos disponibles
         return queryset.filter(is_available=True, category__is_active=True)
     
+    def _serves_published(self):
+        return self.action in self.published_actions and not self.request.user.is_staff
+    
+    def _published(self):
+        """Productos visibles de la versión publicada, en el orden del menú"""
+        return [
+            product
+            for category in hydrate_menu(get_snapshot())
+            for product in category.available_products
+        ]
+    
+    def _filter_published(self, products):
+        """?category= / ?is_featured= / ?is_available= / ?search= / ?ordering= sobre el snapshot"""
+        params = self.request.query_params
+        if params.get('category'):
+            products = [p for p in products if str(p.category_id) == params['category']]
+        for name in ('is_featured', 'is_available'):
+            value = BOOLEAN_PARAMS.get(params.get(name))
+            if value is not None:
+                products = [p for p in products if getattr(p, name) == value]
+        
+        query = params.get(MenuSearchFilter.search_param, '').strip()
+        if query:
+            rank = {
+                product_id: position
+                for position, (product_id, _) in enumerate(search_products(query, visible_only=True))
+            }
+            products = sorted((p for p in products if p.id in rank), key=lambda p: rank[p.id])
+        
+        ordering = [
+            field.strip() for field in params.get(filters.OrderingFilter.ordering_param, '').split(',')
+            if field.strip().lstrip('-') in self.ordering_fields
+        ]
+        # Orden estable: se aplica del último criterio al primero
+        for field in reversed(ordering):
+            name = field.lstrip('-')
+            products = sorted(products, key=lambda p: getattr(p, name), reverse=field.startswith('-'))
+        return products
+    
+    def get_object(self):
+        if not self._serves_published():
+            return super().get_object()
+        pk = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        for product in self._published():
+            if str(product.id) == pk:
+                self.check_object_permissions(self.request, product)
+                return product
+        raise Http404
+    
+    def list(self, request, *args, **kwargs):
+        if not self._serves_published():
+            return super().list(request, *args, **kwargs)
+        products = self._filter_published(self._published())
+        page = self.paginate_queryset(products)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(products, many=True).data)
+    
+    def _in_order(self, product_ids):
+        """Productos disponibles de product_ids, en ese mismo orden"""
+        if self._serves_published():
+            found = {product.id: product for product in self._published()}
+        else:
+            found = {
+                product.id: product
+                for product in self.get_queryset().filter(id__in=product_ids, is_available=True)
+            }
+        return [found[product_id] for product_id in product_ids if product_id in found]
+    
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """
         Endpoint: GET /api/menu/products/featured/
         Devuelve productos destacados y disponibles
+        ?ranking=popular|manual (por defecto FEATURED_RANKING)
+        - manual: productos marcados con is_featured
+        - popular: más vendidos según el top-K precalculado (sin ventas aún → manual)
         """
-        products = self.get_queryset().filter(is_featured=True, is_available=True)[:10]
+        ranking = request.query_params.get('ranking', settings.FEATURED_RANKING)
+        if ranking == 'popular':
+            products = self._in_order(get_top_products())
+            if products:
+                serializer = self.get_serializer(products[:settings.POPULARITY_TOP_K], many=True)
+                return Response(serializer.data)
+        
+        if self._serves_published():
+            products = [product for product in self._published() if product.is_featured][:10]
+        else:
+            products = self.get_queryset().filter(is_featured=True, is_available=True)[:10]
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
     
@@ -162,15 +281,15 @@ class ProductViewSet(viewsets.ModelViewSet):
         Endpoint: GET /api/menu/products/category/{category_id}/
         Devuelve productos de una categoría específica
         """
-        products = self.get_queryset().filter(
-            category_id=category_id,
-            is_available=True
-        )
+        if self._serves_published():
+            products = [product for product in self._published() if str(product.category_id) == category_id]
+        else:
+            products = list(self.get_queryset().filter(category_id=category_id, is_available=True))
         serializer = self.get_serializer(products, many=True)
         return Response({
             'category_id': category_id,
             'products': serializer.data,
-            'total': products.count(),
+            'total': len(products),
         })
     
     @action(detail=False, methods=['get'])
@@ -179,13 +298,79 @@ class ProductViewSet(viewsets.ModelViewSet):
         Endpoint: GET /api/menu/products/available/
         Todos los productos disponibles (para el bot)
         """
-        products = self.get_queryset().filter(is_available=True)
+        if self._serves_published():
+            products = self._published()
+        else:
+            products = list(self.get_queryset().filter(is_available=True))
         serializer = self.get_serializer(products, many=True)
         return Response({
             'products': serializer.data,
-            'total': products.count(),
+            'total': len(products),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Endpoint: GET /api/menu/products/search/?q=champi
+        Búsqueda rankeada para type-ahead, servida desde el snapshot del menú
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            limit = 10
+        
+        results = search_products(query, limit=limit, visible_only=not request.user.is_staff)
+        snapshot = get_snapshot()
+        products = []
+        for product_id, score in results:
+            product = snapshot.get(product_id)
+            if product is None:
+                continue
+            products.append({
+                'id': product.id,
+                'category': product.category_id,
+                'name': product.name,
+                'price': str(product.price),
+                'score': round(float(score), 3),
+            })
+        
+        return Response({
+            'query': query,
+            'products': products,
+            'total': len(products),
         })
     
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        Endpoint: GET /api/menu/products/{id}/related/
+        Productos que se suelen comprar junto a este (precalculados)
+        """
+        # 404 para ids inexistentes o no numéricos
+        product = self.get_object()
+        products = self._in_order(related_products(product.id))
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='cart-recommendations')
+    def cart_recommendations(self, request):
+        """
+        Endpoint: GET /api/menu/products/cart-recommendations/?products=1,2,3
+        Sugerencias para el carrito: los vecinos de todos sus productos
+        """
+        try:
+            product_ids = [int(value) for value in request.query_params.get('products', '').split(',') if value]
+        except ValueError:
+            return Response(
+                {'error': 'products debe ser una lista de ids separados por coma'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        products = self._in_order(recommend_for_cart(product_ids)) if product_ids else []
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['post'])
     def toggle_availability(self, request, pk=None):
         """
@@ -193,11 +378,85 @@ class ProductViewSet(viewsets.ModelViewSet):
         Cambiar disponibilidad de un producto (solo admin)
         """
         product = self.get_object()
-        product.is_available = not product.is_available
-        product.save()
+        if product.auto_disabled:
+            # Agotado: apagarlo a mano evita que se reactive solo al reponer stock
+            product.auto_disabled = False
+        else:
+            product.is_available = not product.is_available
+        product.save(update_fields=['is_available', 'auto_disabled', 'updated_at'])
+        # La disponibilidad se publica de inmediato, sin arrastrar otros cambios del borrador
+        transaction.on_commit(lambda: publish_availability([product.id]))
         
         serializer = self.get_serializer(product)
         return Response({
             'message': f"Producto {'activado' if product.is_available else 'desactivado'}",
             'product': serializer.data
-        })
\ No newline at end of file
+        })
+
+
+# -------------------------------------------------------
+# ViewSet: MenuVersion
+# -------------------------------------------------------
+class MenuVersionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Versiones publicadas del menú (solo admin)
+    
+    - list / retrieve: historial de versiones
+    - publish: publicar el borrador actual (Category/Product)
+    - content: menú completo de una versión (reproducir lo que vio un pedido)
+    """
+    queryset = MenuVersion.objects.select_related('published_by').defer('data')
+    serializer_class = MenuVersionSerializer
+    permission_classes = [IsAdminUser]
+    
+    def get_serializer_class(self):
+        if self.action == 'publish':
+            return MenuPublishSerializer
+        return MenuVersionSerializer
+    
+    @action(detail=False, methods=['post'])
+    def publish(self, request):
+        """
+        Endpoint: POST /api/menu/versions/publish/
+        Body: {"notes": "Precios de temporada"}
+        Si el borrador no cambió, devuelve la versión vigente
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        version = publish_menu(user=request.user, notes=serializer.validated_data['notes'])
+        return Response(MenuVersionSerializer(version).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'])
+    def content(self, request, pk=None):
+        """
+        Endpoint: GET /api/menu/versions/{id}/content/
+        """
+        version = self.get_object()
+        return Response({
+            **MenuVersionSerializer(version).data,
+            'data': version.data,
+        })
+
+
+# -------------------------------------------------------
+# Miniaturas de productos
+# -------------------------------------------------------
+@require_safe
+def product_thumbnail(request, key, size, fmt):
+    """
+    Sirve una miniatura ya generada desde el cache en disco
+
+    La URL cambia si cambia image_url, así que la respuesta es inmutable
+    """
+    path, content_hash = thumbnail_path(key, size, fmt)
+    if path is None:
+        raise Http404("Miniatura no disponible")
+
+    etag = f'"{content_hash[:16]}-{size}-{fmt}"'
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Order, OrderItem, OrderStatusHistory
+from core.routers import ReplicaChangeListMixin
 
 
 class OrderItemInline(admin.TabularInline):
@@ -18,7 +19,7 @@ class OrderStatusHistoryInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = [
         'order_number',
         'client',
@@ -91,7 +92,7 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['order', 'product', 'quantity', 'unit_price', 'subtotal']
     list_filter = ['order__status']
     search_fields = ['order__order_number', 'product__name']
@@ -99,7 +100,7 @@ class OrderItemAdmin(admin.ModelAdmin):
 
 
 @admin.register(OrderStatusHistory)
-class OrderStatusHistoryAdmin(admin.ModelAdmin):
+class OrderStatusHistoryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['order', 'status', 'changed_by', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['order__order_number']
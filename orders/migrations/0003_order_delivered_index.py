@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0002_order_menu_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["status", "delivered_at"], name="orders_status_fa5e99_idx"
+            ),
+        ),
+    ]
@@ -82,6 +82,16 @@ class Order(models.Model):
         verbose_name="Total"
     )
     
+    # Versión publicada del menú con la que se cotizó (precios y productos)
+    menu_version = models.ForeignKey(
+        'menu.MenuVersion',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='orders',
+        verbose_name="Versión del menú"
+    )
+    
     # Observaciones del cliente
     notes = models.TextField(
         blank=True,
@@ -116,6 +126,7 @@ class Order(models.Model):
             models.Index(fields=['client', '-created_at']),
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['driver', 'status']),
+            models.Index(fields=['status', 'delivered_at']),
         ]
     
     def __str__(self):
@@ -132,6 +143,19 @@ class Order(models.Model):
         
         super().save(*args, **kwargs)
     
+    def release_stock(self):
+        """
+        Marcar como cancelado y devolver el stock de sus productos
+        El UPDATE condicional asegura que dos cancelaciones simultáneas
+        no devuelvan el stock dos veces. Retorna False si ya estaba cancelado.
+        """
+        from menu.inventory import release_stock
+
+        claimed = Order.objects.filter(pk=self.pk).exclude(status='cancelled').update(status='cancelled')
+        if claimed:
+            release_stock(self.items.values_list('product_id', 'quantity'))
+        return bool(claimed)
+    
     @staticmethod
     def generate_order_number():
         """Genera un número de orden único: ORD-20250117-XXXX"""
@@ -0,0 +1,101 @@
+# orders/quotes.py
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from rest_framework import serializers
+
+from menu.snapshot import get_snapshot
+
+QUOTE_SALT = 'orders.quote'
+DEFAULT_DELIVERY_FEE = Decimal('10.00')
+
+
+def quote_ttl():
+    """Segundos de validez del token de cotización"""
+    return getattr(settings, 'ORDER_QUOTE_TTL', 300)
+
+
+def build_quote(items, delivery_fee=DEFAULT_DELIVERY_FEE):
+    """
+    Cotizar un carrito contra el snapshot del menú (sin tocar la BD)
+
+    items: [{'product_id': 1, 'quantity': 2, 'notes': ''}, ...]
+    """
+    snapshot = get_snapshot()
+    lines = []
+    subtotal = Decimal('0.00')
+
+    for item in items:
+        product = snapshot.get(item['product_id'])
+        if product is None:
+            raise serializers.ValidationError(
+                f"El producto con ID {item['product_id']} no existe"
+            )
+        if not product.is_available:
+            raise serializers.ValidationError(
+                f"El producto '{product.name}' no está disponible"
+            )
+
+        line_subtotal = product.price * item['quantity']
+        subtotal += line_subtotal
+        lines.append({
+            'product_id': product.id,
+            'name': product.name,
+            'quantity': item['quantity'],
+            'unit_price': product.price,
+            'subtotal': line_subtotal,
+        })
+
+    return {
+        'menu_version': snapshot.version,
+        'items': lines,
+        'subtotal': subtotal,
+        'delivery_fee': delivery_fee,
+        'total': subtotal + delivery_fee,
+    }
+
+
+def sign_quote(quote, user):
+    """Token firmado con lo necesario para crear el pedido sin re-validar"""
+    payload = {
+        'v': quote['menu_version'],
+        'u': user.pk,
+        'i': [
+            [line['product_id'], line['quantity'], str(line['unit_price'])]
+            for line in quote['items']
+        ],
+        'f': str(quote['delivery_fee']),
+    }
+    return signing.dumps(payload, salt=QUOTE_SALT, compress=True)
+
+
+def load_quote(token, user, items, menu_version):
+    """
+    Recuperar una cotización firmada para crear el pedido
+
+    Devuelve None si expiró, si el menú cambió o si el carrito no coincide,
+    en cuyo caso el pedido se valida de nuevo contra la base de datos.
+    """
+    try:
+        payload = signing.loads(token, salt=QUOTE_SALT, max_age=quote_ttl())
+    except signing.SignatureExpired:
+        return None
+    except signing.BadSignature:
+        raise serializers.ValidationError("Token de cotización inválido")
+
+    if payload['u'] != user.pk or payload['v'] != menu_version:
+        return None
+
+    cart = [[item['product_id'], item['quantity']] for item in items]
+    if cart != [line[:2] for line in payload['i']]:
+        return None
+
+    return {
+        'items': [
+            {'product_id': pid, 'quantity': qty, 'unit_price': Decimal(price)}
+            for pid, qty, price in payload['i']
+        ],
+        'delivery_fee': Decimal(payload['f']),
+    }
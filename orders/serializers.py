@@ -1,18 +1,27 @@
 # orders/serializers.py
 
+import logging
+
 from rest_framework import serializers
 from django.db import transaction
 from decimal import Decimal
 from .models import Order, OrderItem, OrderStatusHistory
+from menu.inventory import OutOfStock, reserve_stock
 from menu.models import Product
+from menu.popularity import record_delivered_order
+from menu.snapshot import get_menu_version, get_snapshot
 from menu.serializers import ProductSerializer
 from core.serializers import UserSerializer
+from core.sparse import SparseFieldsMixin
+from .quotes import DEFAULT_DELIVERY_FEE, build_quote, load_quote
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------------------------------
 # Serializer: OrderItem (para lectura)
 # -------------------------------------------------------
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer para mostrar items del pedido"""
     
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -33,6 +42,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'notes',
         ]
         read_only_fields = ['id', 'unit_price', 'subtotal']
+        # Con ?fields= / ?expand= el producto completo solo se envía si se pide
+        expandable_fields = ['product_details']
 
 
 # -------------------------------------------------------
@@ -44,35 +55,13 @@ class OrderItemCreateSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
     notes = serializers.CharField(required=False, allow_blank=True, default='')
-    
-    def validate_product_id(self, value):
-        """Validar que el producto exista y esté disponible"""
-        print(f"[DEBUG-PRODUCT-ID] Validando product_id: {value}")
-        
-        try:
-            product = Product.objects.get(id=value)
-            print(f"[DEBUG-PRODUCT-ID] ✓ Producto encontrado: {product.name}")
-            
-            if not product.is_available:
-                print(f"[DEBUG-PRODUCT-ID] ✗ Producto NO disponible")
-                raise serializers.ValidationError(
-                    f"El producto '{product.name}' no está disponible"
-                )
-            
-            print(f"[DEBUG-PRODUCT-ID] ✓ Validación OK")
-            return value
-            
-        except Product.DoesNotExist:
-            print(f"[DEBUG-PRODUCT-ID] ✗ Producto NO EXISTE con id={value}")
-            raise serializers.ValidationError(
-                f"El producto con ID {value} no existe"
-            )
+    # Existencia y disponibilidad se validan en conjunto en el serializer padre
 
 
 # -------------------------------------------------------
 # Serializer: Order (para lectura completa)
 # -------------------------------------------------------
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer completo para mostrar pedidos"""
     
     client_details = UserSerializer(source='client', read_only=True)
@@ -101,6 +90,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'delivery_fee',
             'total',
             'notes',
+            'menu_version',
             'items',
             'estimated_preparation_time',
             'total_items',
@@ -113,17 +103,24 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id',
             'order_number',
+            'menu_version',
             'subtotal',
             'total',
             'created_at',
             'updated_at',
         ]
+        expandable_fields = ['client_details', 'driver_details']
+        field_sources = {
+            'status_display': ['status'],
+            'estimated_preparation_time': ['items__product__preparation_time'],
+            'total_items': [],
+        }
 
 
 # -------------------------------------------------------
 # Serializer: Order (vista simplificada para listas)
 # -------------------------------------------------------
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer simplificado para listar pedidos"""
     
     client_email = serializers.EmailField(source='client.email', read_only=True)
@@ -144,6 +141,10 @@ class OrderListSerializer(serializers.ModelSerializer):
             'total_items',
             'created_at',
         ]
+        field_sources = {
+            'status_display': ['status'],
+            'total_items': [],
+        }
 
 
 # -------------------------------------------------------
@@ -171,53 +172,57 @@ class OrderCreateSerializer(serializers.Serializer):
     # Items del pedido
     items = OrderItemCreateSerializer(many=True)
 
+    # Token de /orders/quote/ (opcional)
+    quote_token = serializers.CharField(required=False, allow_blank=True, write_only=True)
+
     def validate_items(self, value):
         """Validar que haya al menos un item"""
-        print(f"[DEBUG-VALIDATE-ITEMS] Validando {len(value)} items")
-        
         if not value:
             raise serializers.ValidationError("Debe incluir al menos un producto")
         
         return value
 
     def validate(self, attrs):
-        """Validaciones generales - validar cada producto individualmente"""
-        print(f"[DEBUG-VALIDATE] Iniciando validación general")
-        print(f"[DEBUG-VALIDATE] Datos recibidos: {attrs}")
-        
+        """Validaciones generales - productos contra el snapshot del menú (sin queries)"""
         items_data = attrs.get('items', [])
-        print(f"[DEBUG-VALIDATE] Total items: {len(items_data)}")
+        logger.debug("Validando pedido", extra={'items': len(items_data)})
+        
+        # Con una cotización vigente y el menú sin cambios no se re-valida
+        quote_token = attrs.pop('quote_token', '')
+        request = self.context.get('request')
+        if quote_token and request:
+            menu_version = get_menu_version()
+            quote = load_quote(quote_token, request.user, items_data, menu_version)
+            if quote:
+                logger.debug("Cotización vigente, se omite re-validación")
+                attrs['quote'] = quote
+                attrs['menu_version'] = menu_version
+                return attrs
         
         # Validar que todos los productos existan y estén disponibles
-        for idx, item in enumerate(items_data):
+        snapshot = get_snapshot()
+        products = {}
+        for item in items_data:
             product_id = item.get('product_id')
-            print(f"[DEBUG-VALIDATE] Item {idx+1}: product_id={product_id}")
-            
-            try:
-                product = Product.objects.get(id=product_id)
-                print(f"[DEBUG-VALIDATE] Producto: {product.name}, disponible={product.is_available}")
-                
-                if not product.is_available:
-                    raise serializers.ValidationError(
-                        f"El producto '{product.name}' no está disponible"
-                    )
-                    
-            except Product.DoesNotExist:
-                print(f"[DEBUG-VALIDATE] ERROR: Producto {product_id} no existe")
+            product = products[product_id] = snapshot.get(product_id)
+            if product is None:
+                logger.debug("Producto inexistente en el pedido", extra={'product_id': product_id})
                 raise serializers.ValidationError(
                     f"El producto con ID {product_id} no existe"
                 )
+            
+            if not product.is_available:
+                raise serializers.ValidationError(
+                    f"El producto '{product.name}' no está disponible"
+                )
         
-        print(f"[DEBUG-VALIDATE] ✓ Validación completada")
+        attrs['products'] = products
+        attrs['menu_version'] = snapshot.version
         return attrs
 
     @transaction.atomic
     def create(self, validated_data):
         """Crear el pedido con sus items"""
-        print("="*60)
-        print(f"[DEBUG-CREATE] 🚀 INICIANDO CREACIÓN DE ORDEN")
-        print("="*60)
-        
         try:
             # Obtener usuario del contexto
             request = self.context.get('request')
@@ -225,60 +230,78 @@ class OrderCreateSerializer(serializers.Serializer):
                 raise serializers.ValidationError("Usuario no autenticado")
             
             user = request.user
-            print(f"[DEBUG-CREATE] Usuario: {user.id} - {user.email}")
-            print(f"[DEBUG-CREATE] Role: {user.role}")
             
             # Extraer items
             items_data = validated_data.pop('items')
-            print(f"[DEBUG-CREATE] Items a procesar: {len(items_data)}")
             
             # Calcular subtotal
             subtotal = Decimal('0.00')
             items_to_create = []
             
-            for idx, item_data in enumerate(items_data):
-                product_id = item_data['product_id']
-                quantity = item_data['quantity']
-                
-                print(f"[DEBUG-CREATE] Procesando item {idx+1}:")
-                print(f"  - product_id: {product_id}")
-                print(f"  - quantity: {quantity}")
-                
-                try:
-                    product = Product.objects.get(id=product_id)
+            quote = validated_data.pop('quote', None)
+            products = validated_data.pop('products', {})
+            # Versión publicada de la que salieron los precios
+            menu_version = validated_data.pop('menu_version', None)
+            if quote:
+                # Precios de la cotización firmada (misma versión del menú)
+                for item_data, quoted in zip(items_data, quote['items']):
+                    item_subtotal = quoted['unit_price'] * quoted['quantity']
+                    subtotal += item_subtotal
+                    items_to_create.append({
+                        'product_id': quoted['product_id'],
+                        'quantity': quoted['quantity'],
+                        'unit_price': quoted['unit_price'],
+                        'subtotal': item_subtotal,
+                        'notes': item_data.get('notes', ''),
+                    })
+                validated_data['delivery_fee'] = quote['delivery_fee']
+            else:
+                for item_data in items_data:
+                    product_id = item_data['product_id']
+                    quantity = item_data['quantity']
+                    
+                    product = products[product_id]
                     unit_price = product.price
                     item_subtotal = unit_price * quantity
                     subtotal += item_subtotal
                     
-                    print(f"  - product: {product.name}")
-                    print(f"  - unit_price: {unit_price}")
-                    print(f"  - item_subtotal: {item_subtotal}")
-                    
                     items_to_create.append({
-                        'product': product,
+                        'product_id': product.id,
                         'quantity': quantity,
                         'unit_price': unit_price,
                         'subtotal': item_subtotal,
                         'notes': item_data.get('notes', ''),
                     })
-                    
-                except Product.DoesNotExist:
-                    print(f"  ❌ ERROR: Producto {product_id} no existe")
-                    raise serializers.ValidationError(
-                        f"Producto con ID {product_id} no encontrado"
-                    )
             
-            print(f"[DEBUG-CREATE] Subtotal calculado: {subtotal}")
+            # La versión publicada puede incluir productos ya borrados del borrador:
+            # sin esta verificación el INSERT del item violaría la FK
+            product_ids = {item['product_id'] for item in items_to_create}
+            missing = product_ids - set(
+                Product.objects.filter(id__in=product_ids).values_list('id', flat=True)
+            )
+            if missing:
+                logger.info("Pedido con productos eliminados", extra={'user_id': user.id, 'product_ids': sorted(missing)})
+                snapshot = get_snapshot()
+                names = ', '.join(
+                    entry.name if (entry := snapshot.get(product_id)) else str(product_id)
+                    for product_id in sorted(missing)
+                )
+                raise serializers.ValidationError({'items': f"Productos que ya no están en el menú: {names}"})
+
+            # Descontar stock de todas las líneas en un solo UPDATE condicional
+            try:
+                reserve_stock((item['product_id'], item['quantity']) for item in items_to_create)
+            except OutOfStock as e:
+                logger.info("Pedido rechazado por stock", extra={'user_id': user.id, 'detail': str(e)})
+                raise serializers.ValidationError({'items': str(e)})
             
             # Obtener delivery_fee
             delivery_fee = validated_data.get('delivery_fee', Decimal('10.00'))
-            print(f"[DEBUG-CREATE] Delivery fee: {delivery_fee}")
             
             # Dirección (por implementar con Google Maps)
             delivery_address = ""
             
             # Crear el pedido
-            print(f"[DEBUG-CREATE] 📦 Creando Order...")
             order = Order.objects.create(
                 client=user,
                 delivery_latitude=validated_data['delivery_latitude'],
@@ -288,47 +311,66 @@ class OrderCreateSerializer(serializers.Serializer):
                 delivery_fee=delivery_fee,
                 notes=validated_data.get('notes', ''),
                 subtotal=subtotal,
+                menu_version_id=menu_version,
             )
-            print(f"[DEBUG-CREATE] ✅ Order creada: {order.order_number} (ID: {order.id})")
             
             # Crear los items
-            print(f"[DEBUG-CREATE] 📝 Creando {len(items_to_create)} OrderItems...")
             for item_data in items_to_create:
                 OrderItem.objects.create(order=order, **item_data)
-            print(f"[DEBUG-CREATE] ✅ OrderItems creados")
             
             # Crear registro en historial
-            print(f"[DEBUG-CREATE] 📋 Creando OrderStatusHistory...")
             OrderStatusHistory.objects.create(
                 order=order,
                 status='pending',
                 changed_by=user,
                 notes='Pedido creado desde Mini App'
             )
-            print(f"[DEBUG-CREATE] ✅ OrderStatusHistory creado")
-            
-            print("="*60)
-            print(f"[DEBUG-CREATE] 🎉 ORDEN CREADA EXITOSAMENTE")
-            print(f"[DEBUG-CREATE] Order Number: {order.order_number}")
-            print(f"[DEBUG-CREATE] Total: {order.total}")
-            print("="*60)
             
+            logger.debug(
+                "Pedido creado",
+                extra={
+                    'order_number': order.order_number,
+                    'user_id': user.id,
+                    'items': len(items_to_create),
+                    'total': order.total,
+                    'quoted': quote is not None,
+                },
+            )
             return order
             
-        except Exception as e:
-            print("="*60)
-            print(f"[DEBUG-CREATE] ❌ ERROR CRÍTICO")
-            print(f"[DEBUG-CREATE] Tipo: {type(e).__name__}")
-            print(f"[DEBUG-CREATE] Mensaje: {str(e)}")
-            print("="*60)
-            
-            import traceback
-            traceback.print_exc()
-            
+        except serializers.ValidationError:
+            raise
+        except Exception:
+            logger.exception("Error creando el pedido")
             # Re-lanzar la excepción para que DRF la maneje
             raise
 
 
+# -------------------------------------------------------
+# Serializer: Cotizar carrito (sin crear pedido)
+# -------------------------------------------------------
+class CartQuoteSerializer(serializers.Serializer):
+    """Serializer para cotizar el carrito de la Mini App"""
+
+    delivery_fee = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=DEFAULT_DELIVERY_FEE,
+        required=False
+    )
+    items = OrderItemCreateSerializer(many=True)
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("Debe incluir al menos un producto")
+        return value
+
+    def validate(self, attrs):
+        """Precios y disponibilidad desde el snapshot del menú"""
+        attrs['quote'] = build_quote(attrs['items'], attrs['delivery_fee'])
+        return attrs
+
+
 # -------------------------------------------------------
 # Serializer: Actualizar estado del pedido
 # -------------------------------------------------------
@@ -369,6 +411,10 @@ class OrderUpdateStatusSerializer(serializers.Serializer):
         notes = validated_data.get('notes', '')
         user = self.context['request'].user
         
+        # Al cancelar se devuelve el stock (una sola vez)
+        if new_status == 'cancelled' and not instance.release_stock():
+            raise serializers.ValidationError({'status': "El pedido ya fue cancelado"})
+        
         # Actualizar el pedido
         instance.status = new_status
         
@@ -385,6 +431,10 @@ class OrderUpdateStatusSerializer(serializers.Serializer):
         
         instance.save()
         
+        # Ventas para el ranking de populares
+        if new_status == 'delivered':
+            record_delivered_order(instance)
+        
         # Registrar en historial
         OrderStatusHistory.objects.create(
             order=instance,
@@ -1,3 +1,346 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.exceptions import ValidationError
+
+from core.auth import CachedJWTAuthentication
+from core.models import User
+from menu import inventory
+from menu.models import Category, Product
+from menu.versions import publish_menu
+from menu.views import ProductViewSet
+from . import serializers as order_serializers
+from .models import Order
+from .serializers import OrderCreateSerializer
+from .views import OrderViewSet
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    """Checkouts en paralelo nunca venden más unidades que el stock"""
+
+    databases = {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cliente@example.com', password='x', role='CUSTOMER'
+        )
+        category = Category.objects.create(name='Pizzas')
+        self.product = Product.objects.create(category=category, name='Pizza', price='45.00', stock=3)
+        self.untracked = Product.objects.create(category=category, name='Coca Cola', price='8.00')
+        self.version = publish_menu()
+
+    def checkout(self, quantity=1):
+        serializer = OrderCreateSerializer(
+            data={
+                'delivery_latitude': '-17.783300',
+                'delivery_longitude': '-63.182100',
+                'items': [
+                    {'product_id': self.product.id, 'quantity': quantity},
+                    {'product_id': self.untracked.id, 'quantity': 1},
+                ],
+            },
+            context={'request': SimpleNamespace(user=self.user)},
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        workers = 8
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(200):
+                    try:
+                        self.checkout()
+                        results.append('ok')
+                        return
+                    except OperationalError:
+                        # SQLite serializa escrituras: reintentar como lo haría el cliente
+                        time.sleep(0.01)
+                    except ValidationError:
+                        results.append('rejected')
+                        return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        # Los bloqueos de SQLite se registran como error antes de reintentar; la
+        # publicación de disponibilidad también choca con ellos y no es lo que se prueba
+        with mock.patch.object(order_serializers.logger, 'exception') as log_exception, \
+                mock.patch.object(inventory, 'schedule_availability_publish'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        for call in log_exception.call_args_list:
+            self.assertEqual(call.args, ("Error creando el pedido",))
+
+        self.product.refresh_from_db()
+        self.assertEqual(results.count('ok'), 3)
+        self.assertEqual(results.count('rejected'), workers - 3)
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(set(Order.objects.values_list('menu_version', flat=True)), {self.version.id})
+        self.assertEqual(self.product.stock, 0)
+        self.assertFalse(self.product.is_available)
+
+    def test_shortfall_rejects_whole_order(self):
+        with self.assertRaises(ValidationError):
+            self.checkout(quantity=4)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_draft_stock_is_enforced(self):
+        # Stock cargado después de publicar: el snapshot dice "sin control", la BD no
+        Product.objects.filter(id=self.untracked.id).update(stock=1)
+        self.checkout()
+        with self.assertRaises(ValidationError):
+            self.checkout()
+
+        self.untracked.refresh_from_db()
+        self.assertEqual(self.untracked.stock, 0)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cancel_restores_stock(self):
+        order = self.checkout(quantity=3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertFalse(self.product.is_available)
+
+        self.assertTrue(order.release_stock())
+        # Una segunda cancelación no devuelve el stock otra vez
+        self.assertFalse(order.release_stock())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertTrue(self.product.is_available)
+        self.assertFalse(self.product.auto_disabled)
+
+    def test_cancel_keeps_staff_disabled_products_off(self):
+        order = self.checkout(quantity=3)
+        # El staff lo apaga a mano mientras está agotado
+        staff = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        request = APIRequestFactory().post(f'/api/menu/products/{self.product.id}/toggle_availability/')
+        force_authenticate(request, user=staff)
+        view = ProductViewSet.as_view({'post': 'toggle_availability'})
+        self.assertEqual(view(request, pk=self.product.id).status_code, 200)
+
+        self.assertTrue(order.release_stock())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertFalse(self.product.is_available)
+
+    def test_availability_publishes_are_coalesced(self):
+        publisher = inventory.AvailabilityPublisher(delay=60)
+        with mock.patch('menu.versions.publish_availability') as publish:
+            for _ in range(5):
+                publisher.request()
+            publisher._timer.cancel()
+            publisher._publish_in_background()
+            publisher.request()
+            publisher._timer.cancel()
+
+        self.assertEqual(publish.call_count, 1)
+        self.assertIsNotNone(publisher._timer)
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= / ?expand= recortan la respuesta y las columnas consultadas"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='cliente@example.com', password='x', role='CUSTOMER')
+        category = Category.objects.create(name='Pizzas')
+        product = Product.objects.create(
+            category=category, name='Pizza', description='x' * 500, price='45.00'
+        )
+        self.order = Order.objects.create(
+            client=self.user,
+            delivery_latitude='-17.783300',
+            delivery_longitude='-63.182100',
+            subtotal=Decimal('90.00'),
+            delivery_fee=Decimal('10.00'),
+        )
+        self.order.items.create(product=product, quantity=2, unit_price=Decimal('45.00'))
+
+    def retrieve(self, **params):
+        request = APIRequestFactory().get(f'/api/orders/orders/{self.order.id}/', params)
+        force_authenticate(request, user=self.user)
+        view = OrderViewSet.as_view({'get': 'retrieve'})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, pk=self.order.id)
+        return response.data, [query['sql'] for query in queries.captured_queries]
+
+    def test_default_payload_unchanged(self):
+        data, _ = self.retrieve()
+        self.assertIn('client_details', data)
+        self.assertIn('description', data['items'][0]['product_details'])
+
+    def test_fields_trim_payload_and_columns(self):
+        data, queries = self.retrieve(fields='id,status,items.product_name,items.quantity')
+
+        self.assertEqual(set(data), {'id', 'status', 'items'})
+        self.assertEqual(data['items'], [{'product_name': 'Pizza', 'quantity': 2}])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"delivery_address"', queries[0])
+        self.assertNotIn('"description"', queries[1])
+        self.assertNotIn('"users"', queries[0])
+
+    def test_expand_opts_into_nested_objects(self):
+        data, _ = self.retrieve(expand='items.product_details')
+
+        self.assertNotIn('client_details', data)
+        self.assertIn('status_display', data)
+        self.assertEqual(data['items'][0]['product_details']['name'], 'Pizza')
+
+
+class CachedJWTUserTests(TestCase):
+    """Un conductor que consulta my-deliveries seguido no paga la query del usuario"""
+
+    def setUp(self):
+        cache.clear()
+        self.driver = User.objects.create_user(email='driver@example.com', password='x', role='DRIVER')
+        self.token = str(AccessToken.for_user(self.driver))
+
+    def my_deliveries(self):
+        request = APIRequestFactory().get(
+            '/api/orders/orders/my-deliveries/', HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        return OrderViewSet.as_view({'get': 'my_deliveries'})(request)
+
+    def test_repeat_requests_skip_user_lookup(self):
+        self.assertEqual(self.my_deliveries().status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.my_deliveries().status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT "users"')])
+
+    def test_deactivation_invalidates_cached_user(self):
+        self.my_deliveries()
+        self.driver.is_active = False
+        self.driver.save()
+
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    def test_password_change_revokes_tokens(self):
+        self.assertEqual(self.my_deliveries().status_code, 200)
+        self.driver.set_password('nueva')
+        self.driver.save()
+
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+        # Un token nuevo sigue funcionando desde la cache
+        self.token = str(AccessToken.for_user(self.driver))
+        self.assertEqual(self.my_deliveries().status_code, 200)
+
+
+class QuoteTests(TestCase):
+    """Pedido con quote_token: sin re-validar mientras la cotización siga vigente"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='cliente@example.com', password='x', role='CUSTOMER')
+        self.other = User.objects.create_user(email='otro@example.com', password='x', role='CUSTOMER')
+        category = Category.objects.create(name='Pizzas')
+        self.pizza = Product.objects.create(category=category, name='Pizza', price='45.00')
+        self.soda = Product.objects.create(category=category, name='Coca Cola', price='8.00')
+        publish_menu()
+        self.items = [{'product_id': self.pizza.id, 'quantity': 2}, {'product_id': self.soda.id, 'quantity': 1}]
+
+    def call(self, action, data, user=None):
+        request = APIRequestFactory().post(f'/api/orders/orders/{action}/', data, format='json')
+        force_authenticate(request, user=user or self.user)
+        method = 'quote' if action == 'quote' else 'create'
+        return OrderViewSet.as_view({'post': method})(request)
+
+    def quote(self, user=None):
+        response = self.call('quote', {'items': self.items}, user)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def create(self, token, items=None, user=None):
+        return self.call('', {
+            'delivery_latitude': '-17.783300',
+            'delivery_longitude': '-63.182100',
+            'items': items or self.items,
+            'quote_token': token,
+        }, user)
+
+    def assert_revalidated(self, token, revalidated, **kwargs):
+        with mock.patch.object(
+            order_serializers, 'get_snapshot', wraps=order_serializers.get_snapshot
+        ) as get_snapshot:
+            response = self.create(token, **kwargs)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(get_snapshot.called, revalidated)
+        return Order.objects.latest('id')
+
+    def test_quote_returns_totals_and_token(self):
+        quote = self.quote()
+        self.assertEqual(quote['subtotal'], '98.00')
+        self.assertEqual(quote['total'], '108.00')
+        self.assertEqual([line['subtotal'] for line in quote['items']], ['90.00', '8.00'])
+        self.assertTrue(quote['quote_token'])
+
+    def test_product_deleted_from_draft_is_rejected(self):
+        token = self.quote()['quote_token']
+        # Borrado en el borrador: la versión publicada todavía lo incluye
+        self.soda.delete()
+
+        for quote_token in (token, ''):
+            response = self.create(quote_token)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Coca Cola', str(response.data['items']))
+        self.assertFalse(Order.objects.exists())
+
+    def test_valid_token_skips_revalidation(self):
+        order = self.assert_revalidated(self.quote()['quote_token'], revalidated=False)
+        self.assertEqual(order.total, Decimal('108.00'))
+        self.assertEqual(order.items.count(), 2)
+
+    def test_expired_token_revalidates(self):
+        token = self.quote()['quote_token']
+        with override_settings(ORDER_QUOTE_TTL=-1):
+            self.assert_revalidated(token, revalidated=True)
+
+    def test_other_users_token_revalidates(self):
+        token = self.quote(user=self.other)['quote_token']
+        order = self.assert_revalidated(token, revalidated=True)
+        self.assertEqual(order.client, self.user)
+
+    def test_cart_mismatch_revalidates(self):
+        token = self.quote()['quote_token']
+        order = self.assert_revalidated(token, revalidated=True, items=[{'product_id': self.pizza.id, 'quantity': 1}])
+        self.assertEqual(order.subtotal, Decimal('45.00'))
+
+    def test_menu_change_uses_new_prices(self):
+        token = self.quote()['quote_token']
+        Product.objects.filter(id=self.pizza.id).update(price='50.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_menu()
+        order = self.assert_revalidated(token, revalidated=True)
+        self.assertEqual(order.subtotal, Decimal('108.00'))
+
+    def test_tampered_token_is_rejected(self):
+        response = self.create(self.quote()['quote_token'] + 'x')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
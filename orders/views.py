@@ -1,9 +1,16 @@
+import logging
+
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+
+from core.routers import ReplicaReadMixin
+from core.sparse import SparseQuerysetMixin
+from core.throttling import OrderCreateThrottle
 
 from .models import Order, OrderStatusHistory
 from .serializers import (
@@ -11,10 +18,14 @@ from .serializers import (
     OrderListSerializer,
     OrderCreateSerializer,
     OrderUpdateStatusSerializer,
+    CartQuoteSerializer,
 )
+from .quotes import quote_ttl, sign_quote
+
+logger = logging.getLogger(__name__)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseQuerysetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de pedidos
     
@@ -25,7 +36,10 @@ class OrderViewSet(viewsets.ModelViewSet):
     - update_status: Cambiar estado del pedido
     - my_orders: Mis pedidos (para bot)
     - my_deliveries: Mis entregas (para app conductor)
+    - quote: Cotizar carrito sin crear pedido
     - cancel: Cancelar pedido
+    
+    Lecturas aceptan ?fields= / ?expand= (ver core.sparse)
     """
     
     queryset = Order.objects.select_related('client', 'driver').prefetch_related('items__product')
@@ -36,16 +50,25 @@ class OrderViewSet(viewsets.ModelViewSet):
     search_fields = ['order_number']
     ordering_fields = ['created_at', 'total']
     ordering = ['-created_at']
+    replica_actions = ['my_orders']
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'my_orders']:
             return OrderListSerializer
         if self.action == 'create':
             return OrderCreateSerializer
         if self.action == 'update_status':
             return OrderUpdateStatusSerializer
+        if self.action == 'quote':
+            return CartQuoteSerializer
         return OrderSerializer
     
+    def get_throttles(self):
+        # Crear un pedido es una transacción con bloqueo de stock: se limita por usuario
+        if self.action == 'create':
+            return [OrderCreateThrottle()]
+        return super().get_throttles()
+    
     def get_queryset(self):
         """
         - Admin: Ve todos los pedidos
@@ -66,30 +89,17 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def create(self, request, *args, **kwargs):
         """Override create para mejor logging y manejo de errores"""
-        print("="*60)
-        print(f"[DEBUG-VIEW] 📥 CREATE REQUEST RECIBIDO")
-        print(f"[DEBUG-VIEW] Usuario: {request.user.id} - {request.user.email}")
-        print(f"[DEBUG-VIEW] Role: {request.user.role}")
-        print(f"[DEBUG-VIEW] Data recibida: {request.data}")
-        print("="*60)
+        logger.debug("Crear pedido", extra={'user_id': request.user.id, 'role': request.user.role})
         
         # Verificar que sea CUSTOMER
         if request.user.role != 'CUSTOMER':
-            print(f"[DEBUG-VIEW] ❌ Usuario no es CUSTOMER")
             raise PermissionDenied("Solo clientes pueden crear pedidos")
         
         # Validar y crear
         serializer = self.get_serializer(data=request.data)
-        
-        print(f"[DEBUG-VIEW] Validando datos...")
         serializer.is_valid(raise_exception=True)
-        print(f"[DEBUG-VIEW] ✓ Datos válidos")
-        
-        print(f"[DEBUG-VIEW] Llamando a perform_create...")
         self.perform_create(serializer)
         
-        print(f"[DEBUG-VIEW] ✓ Orden creada exitosamente")
-        
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data,
@@ -102,9 +112,39 @@ class OrderViewSet(viewsets.ModelViewSet):
         Guardar la orden
         El serializer maneja toda la lógica de creación
         """
-        print(f"[DEBUG-VIEW] perform_create - guardando orden...")
         serializer.save()
-        print(f"[DEBUG-VIEW] ✓ perform_create completado")
+    
+    @action(detail=False, methods=['post'])
+    def quote(self, request):
+        """
+        Endpoint: POST /api/orders/orders/quote/
+        Cotizar el carrito antes de crear el pedido (no escribe en la BD)
+        
+        Body: {"items": [{"product_id": 1, "quantity": 2}], "delivery_fee": 10.00}
+        
+        El quote_token devuelto se envía en POST /orders/ para crear el
+        pedido sin re-validar mientras el menú no cambie.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        quote = serializer.validated_data['quote']
+        return Response({
+            'items': [
+                {
+                    **line,
+                    'unit_price': str(line['unit_price']),
+                    'subtotal': str(line['subtotal']),
+                }
+                for line in quote['items']
+            ],
+            'subtotal': str(quote['subtotal']),
+            'delivery_fee': str(quote['delivery_fee']),
+            'total': str(quote['total']),
+            'menu_version': quote['menu_version'],
+            'quote_token': sign_quote(quote, request.user),
+            'expires_in': quote_ttl(),
+        })
     
     @action(detail=False, methods=['get'], url_path='my-orders')
     def my_orders(self, request):
@@ -119,7 +159,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         if status_filter:
             orders = orders.filter(status=status_filter)
         
-        serializer = OrderListSerializer(orders, many=True)
+        serializer = self.get_serializer(orders, many=True)
         return Response({
             'count': orders.count(),
             'orders': serializer.data
@@ -143,7 +183,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             status__in=['assigned', 'in_transit']
         )
         
-        serializer = OrderSerializer(orders, many=True)
+        serializer = self.get_serializer(orders, many=True)
         return Response({
             'count': orders.count(),
             'orders': serializer.data
@@ -207,15 +247,23 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         reason = request.data.get('reason', 'Sin razón especificada')
         
-        order.status = 'cancelled'
-        order.save()
-        
-        OrderStatusHistory.objects.create(
-            order=order,
-            status='cancelled',
-            changed_by=request.user,
-            notes=f'Cancelado: {reason}'
-        )
+        with transaction.atomic():
+            # Devuelve el stock; falla si otra petición lo canceló primero
+            if not order.release_stock():
+                return Response(
+                    {'error': 'El pedido ya fue cancelado'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            order.status = 'cancelled'
+            order.save()
+            
+            OrderStatusHistory.objects.create(
+                order=order,
+                status='cancelled',
+                changed_by=request.user,
+                notes=f'Cancelado: {reason}'
+            )
         
         return Response(
             OrderSerializer(order).data,
@@ -0,0 +1,60 @@
+# payments/management/commands/fake_bank.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.models import Payment
+from payments.provider import FakeBankProvider
+
+
+class Command(BaseCommand):
+    help = (
+        "Banco falso: paga los pagos pendientes escribiendo un extracto CSV "
+        "y/o enviando el webhook firmado (PAYMENT_WEBHOOK_SECRET)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--statement', help="Archivo del extracto CSV ('-' para stdout)")
+        parser.add_argument('--webhook', help="URL del webhook, ej. http://localhost:8000/api/payments/webhook/")
+        parser.add_argument('--limit', type=int, help="Cantidad máxima de pagos a pagar")
+
+    def handle(self, *args, **options):
+        if not options['statement'] and not options['webhook']:
+            raise CommandError("Indicar --statement y/o --webhook")
+
+        bank = FakeBankProvider()
+        if options['webhook'] and not bank.secret:
+            raise CommandError("Falta PAYMENT_WEBHOOK_SECRET")
+
+        payments = Payment.objects.filter(status='pending').only('qr_reference', 'amount').order_by('id')
+        if options['limit']:
+            payments = payments[:options['limit']]
+        transactions = [bank.transaction(payment) for payment in payments.iterator()]
+
+        if options['statement'] == '-':
+            bank.write_statement(self.stdout, transactions)
+        elif options['statement']:
+            with open(options['statement'], 'w', newline='', encoding='utf-8') as fh:
+                bank.write_statement(fh, transactions)
+
+        sent = self.send_webhooks(bank, transactions, options['webhook']) if options['webhook'] else 0
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ {len(transactions)} pagos simulados, {sent} webhooks aceptados"
+        ))
+
+    def send_webhooks(self, bank, transactions, url):
+        import requests
+
+        sent = 0
+        for transaction in transactions:
+            body, headers = bank.webhook(transaction)
+            try:
+                response = requests.post(
+                    url, data=body, timeout=10, headers={**headers, 'Content-Type': 'application/json'}
+                )
+            except requests.RequestException as exc:
+                raise CommandError(str(exc))
+            if response.ok:
+                sent += 1
+            else:
+                self.stderr.write(f"  ✗ {transaction['reference']}: {response.status_code} {response.text[:200]}")
+        return sent
@@ -0,0 +1,43 @@
+# payments/management/commands/reconcile_payments.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.settlement import CHUNK_SIZE, read_statement, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Concilia un extracto bancario CSV (columnas: reference, transaction_id, amount) "
+        "con los pagos pendientes y acredita los que coinciden"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Extracto .csv")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Pagos acreditados por transacción")
+        parser.add_argument('--dry-run', action='store_true', help="Solo reportar, sin acreditar")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            result = reconcile(
+                read_statement(options['path']),
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+            )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        for line, reference, reason in result.mismatches[:50]:
+            self.stderr.write(f"  ✗ Fila {line} ({reference or 'sin referencia'}): {reason}")
+        if len(result.mismatches) > 50:
+            self.stderr.write(f"  ... y {len(result.mismatches) - 50} diferencias más")
+
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}✅ Extracto conciliado en {elapsed:.2f}s: "
+            f"{result.matched} acreditados, {result.already_settled} ya acreditados, "
+            f"{len(result.mismatches)} diferencias, {result.unpaid} pagos pendientes sin movimiento"
+        ))
@@ -0,0 +1,50 @@
+# payments/provider.py
+"""
+Banco falso para desarrollo y tests
+
+Hace de proveedor QR sin salir de la máquina: "paga" pagos pendientes,
+arma los eventos firmados del webhook (los mismos que mandaría el banco)
+y escribe el extracto CSV que consume reconcile_payments.
+"""
+
+import csv
+import json
+import uuid
+
+from django.conf import settings
+
+from .settlement import STATEMENT_COLUMNS
+from .webhooks import sign
+
+
+class FakeBankProvider:
+
+    def __init__(self, secret=None):
+        self.secret = settings.PAYMENT_WEBHOOK_SECRET if secret is None else secret
+
+    @staticmethod
+    def transaction_id():
+        return f"TX-{uuid.uuid4().hex[:16].upper()}"
+
+    def transaction(self, payment, amount=None, transaction_id=None):
+        """Movimiento del banco para un pago (por defecto, por el monto exacto)"""
+        return {
+            'reference': payment.qr_reference,
+            'transaction_id': transaction_id or self.transaction_id(),
+            'amount': str(payment.amount if amount is None else amount),
+        }
+
+    def webhook(self, transaction, status='completed', timestamp=None):
+        """(body, headers) del POST que el banco haría al webhook"""
+        body = json.dumps({**transaction, 'status': status}).encode()
+        return body, {'X-Payment-Signature': sign(body, self.secret, timestamp)}
+
+    def write_statement(self, fh, transactions):
+        """Extracto CSV con una fila por movimiento"""
+        writer = csv.DictWriter(fh, fieldnames=STATEMENT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        count = 0
+        for transaction in transactions:
+            writer.writerow(transaction)
+            count += 1
+        return count
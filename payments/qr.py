@@ -0,0 +1,134 @@
+# payments/qr.py
+"""
+Imágenes de los QR de pago
+
+- El QR se genera recién cuando alguien pide la imagen (no al crear el pago)
+  y no viaja en los payloads: PaymentSerializer solo devuelve su URL
+- Se guarda direccionado por contenido: <sha del contenido>.<formato> en
+  QR_CACHE_ROOT, así que cada QR se dibuja una sola vez aunque haya varios
+  workers, y los más pedidos quedan además en un LRU en memoria
+- PNG (qrcode + Pillow) o SVG (qrcode puro, sin Pillow)
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+
+from core import profiling
+from core.lazy import lazy_import
+
+# qrcode (y PIL) solo se cargan al generar el primer QR
+qrcode = lazy_import('qrcode')
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+# Forman parte de la clave del cache: si cambian, los QR viejos no se reutilizan
+QR_OPTIONS = {'box_size': 10, 'border': 4}
+
+
+def qr_data(reference, amount, order_number):
+    """Contenido del QR de un pago"""
+    return f"PAGO|{reference}|Bs.{amount}|{order_number}"
+
+
+def qr_url(reference, fmt='png', request=None):
+    path = reverse('payment-qr', kwargs={'reference': reference, 'fmt': fmt})
+    return request.build_absolute_uri(path) if request else path
+
+
+def content_key(data):
+    payload = f"{data}|{QR_OPTIONS['box_size']}|{QR_OPTIONS['border']}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_qr(data, fmt):
+    """Bytes de la imagen del QR en el formato pedido"""
+    with profiling.span('qr'):
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, **QR_OPTIONS)
+        qr.add_data(data)
+        qr.make(fit=True)
+        buffer = BytesIO()
+        if fmt == 'svg':
+            from qrcode.image.svg import SvgPathImage
+
+            qr.make_image(image_factory=SvgPathImage).save(buffer)
+        else:
+            qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+        return buffer.getvalue()
+
+
+class QRCache:
+    """LRU en memoria delante del cache en disco"""
+
+    def __init__(self, root, size):
+        self.root = Path(root) if root else None
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key, fmt):
+        return self.root / key[:2] / f'{key}.{fmt}'
+
+    def get(self, data, fmt):
+        """(bytes, clave de contenido) de la imagen; se dibuja solo si no está en ningún cache"""
+        key = content_key(data)
+        with self._lock:
+            image = self._entries.get((key, fmt))
+            if image is not None:
+                self._entries.move_to_end((key, fmt))
+                return image, key
+
+        image = self._read(key, fmt)
+        if image is None:
+            image = render_qr(data, fmt)
+            self._write(key, fmt, image)
+
+        with self._lock:
+            self._entries[(key, fmt)] = image
+            self._entries.move_to_end((key, fmt))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return image, key
+
+    def _read(self, key, fmt):
+        if self.root is None:
+            return None
+        try:
+            return self._path(key, fmt).read_bytes()
+        except OSError:
+            return None
+
+    def _write(self, key, fmt, image):
+        if self.root is None:
+            return
+        path = self._path(key, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(image)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QRCache(settings.QR_CACHE_ROOT, settings.QR_CACHE_SIZE)
+        return _cache
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Payment, PaymentHistory
+from .qr import qr_url
 
 
 class PaymentHistorySerializer(serializers.ModelSerializer):
@@ -16,6 +17,9 @@ class PaymentSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     order_number = serializers.CharField(source='order.order_number', read_only=True)
     history = PaymentHistorySerializer(many=True, read_only=True)
+    # URLs de la imagen (payments.views.payment_qr), no la imagen en base64
+    qr_code = serializers.SerializerMethodField()
+    qr_code_svg = serializers.SerializerMethodField()
     
     class Meta:
         model = Payment
@@ -27,12 +31,19 @@ class PaymentSerializer(serializers.ModelSerializer):
             'status',
             'status_display',
             'qr_code',
+            'qr_code_svg',
             'qr_reference',
             'created_at',
             'confirmed_at',
             'history',
         ]
-        read_only_fields = ['id', 'qr_code', 'qr_reference', 'created_at']
+        read_only_fields = ['id', 'qr_reference', 'created_at']
+    
+    def get_qr_code(self, obj):
+        return qr_url(obj.qr_reference, 'png', self.context.get('request'))
+    
+    def get_qr_code_svg(self, obj):
+        return qr_url(obj.qr_reference, 'svg', self.context.get('request'))
 
 
 class PaymentListSerializer(serializers.ModelSerializer):
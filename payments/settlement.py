@@ -0,0 +1,210 @@
+# payments/settlement.py
+"""
+Acreditación de pagos QR reales (webhook del banco y conciliación)
+
+- settle() completa un lote de pagos pendientes y confirma sus pedidos en
+  una sola transacción: bulk_update/bulk_create en vez de un save() por
+  pago. Solo toca los que siguen pendientes, así que el webhook y la
+  conciliación pueden cruzarse sin acreditar dos veces
+- reconcile() lee el extracto del banco (CSV) en streaming y lo cruza con
+  un índice en memoria {qr_reference: pago pendiente} armado con una sola
+  lectura. Los cruces se aplican por lotes; lo que no cuadra se reporta
+"""
+
+import csv
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import metrics
+from orders.models import Order, OrderStatusHistory
+from .models import Payment, PaymentHistory
+
+CHUNK_SIZE = 500
+
+
+def settle(matches, notes):
+    """
+    Completar pagos pendientes y confirmar sus pedidos
+
+    matches: {payment_id: transaction_id}
+    Devuelve los ids de los pagos completados (los que ya no estaban
+    pendientes se ignoran)
+    """
+    if not matches:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update()
+            .filter(id__in=list(matches), status='pending')
+            .only('id', 'order_id')
+        )
+        for payment in payments:
+            payment.status = 'completed'
+            payment.transaction_id = matches[payment.id]
+            payment.confirmed_at = now
+            payment.updated_at = now
+        Payment.objects.bulk_update(payments, ['status', 'transaction_id', 'confirmed_at', 'updated_at'])
+
+        order_ids = list(
+            Order.objects.select_for_update()
+            .filter(id__in=[payment.order_id for payment in payments], status='pending')
+            .values_list('id', flat=True)
+        )
+        Order.objects.filter(id__in=order_ids).update(status='confirmed', confirmed_at=now, updated_at=now)
+
+        PaymentHistory.objects.bulk_create([
+            PaymentHistory(payment_id=payment.id, old_status='pending', new_status='completed', notes=notes)
+            for payment in payments
+        ])
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order_id=order_id, status='confirmed', notes=notes)
+            for order_id in order_ids
+        ])
+
+    # bulk_create no emite post_save: las métricas se cuentan acá
+    if payments:
+        metrics.payment_outcomes.inc('completed', amount=len(payments))
+    if order_ids:
+        metrics.order_transitions.inc('confirmed', amount=len(order_ids))
+    return [payment.id for payment in payments]
+
+
+def parse_amount(value):
+    try:
+        return Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+# -------------------------------------------------------
+# Conciliación con el extracto bancario
+# -------------------------------------------------------
+STATEMENT_COLUMNS = ('reference', 'transaction_id', 'amount')
+
+
+def read_statement(path):
+    """Filas del extracto CSV (reference, transaction_id, amount, ...) en streaming"""
+    with open(Path(path), newline='', encoding='utf-8-sig') as fh:
+        yield from csv.DictReader(fh)
+
+
+@dataclass
+class ReconciliationResult:
+    matched: int = 0
+    already_settled: int = 0
+    # Pagos pendientes que no aparecen en el extracto
+    unpaid: int = 0
+    # [(línea, referencia, motivo)]
+    mismatches: list = field(default_factory=list)
+
+
+class Reconciler:
+
+    def __init__(self, chunk_size=CHUNK_SIZE, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+
+    def run(self, rows):
+        self.result = ReconciliationResult()
+        self._load()
+        self.seen_references = set()
+        self.seen_transactions = set()
+        # Referencias que no son pagos pendientes: se clasifican por lotes al final
+        self.unknown = {}
+        self.batch = {}
+
+        for line, row in enumerate(rows, start=2):
+            self._add(line, row)
+        self._flush()
+        self._classify_unknown()
+        self.result.unpaid = len(self.index) - self.result.matched
+        return self.result
+
+    def _load(self):
+        """Única lectura de los pagos pendientes: {qr_reference: (id, monto)}"""
+        self.index = {
+            reference: (payment_id, amount)
+            for payment_id, reference, amount in Payment.objects.filter(status='pending').values_list(
+                'id', 'qr_reference', 'amount'
+            )
+        }
+
+    def _mismatch(self, line, reference, reason):
+        self.result.mismatches.append((line, reference, reason))
+
+    def _add(self, line, row):
+        reference = (row.get('reference') or '').strip()
+        transaction_id = (row.get('transaction_id') or '').strip()
+        amount = parse_amount(row.get('amount') or '')
+        if not reference or not transaction_id or amount is None:
+            self._mismatch(line, reference, "Fila incompleta o monto inválido")
+            return
+        if transaction_id in self.seen_transactions:
+            self._mismatch(line, reference, f"Transacción repetida en el extracto: {transaction_id}")
+            return
+        if reference in self.seen_references:
+            self._mismatch(line, reference, "Referencia pagada más de una vez en el extracto")
+            return
+        self.seen_references.add(reference)
+        self.seen_transactions.add(transaction_id)
+
+        match = self.index.get(reference)
+        if match is None:
+            self.unknown[reference] = line
+            return
+        payment_id, expected = match
+        if amount != expected:
+            self._mismatch(line, reference, f"Monto distinto: extracto Bs. {amount}, pago Bs. {expected}")
+            return
+        self.batch[payment_id] = (line, reference, transaction_id)
+        if len(self.batch) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, {}
+
+        # transaction_id es único: uno ya registrado en otro pago no se puede reutilizar
+        used = set(
+            Payment.objects.filter(transaction_id__in=[tx for _, _, tx in batch.values()])
+            .values_list('transaction_id', flat=True)
+        )
+        matches = {}
+        for payment_id, (line, reference, transaction_id) in batch.items():
+            if transaction_id in used:
+                self._mismatch(line, reference, f"Transacción ya registrada en otro pago: {transaction_id}")
+            else:
+                matches[payment_id] = transaction_id
+
+        if self.dry_run:
+            self.result.matched += len(matches)
+            return
+        settled = set(settle(matches, notes='Conciliado con extracto bancario'))
+        self.result.matched += len(settled)
+        # Los que dejaron de estar pendientes mientras tanto (webhook) ya están acreditados
+        self.result.already_settled += len(matches) - len(settled)
+
+    def _classify_unknown(self):
+        references = list(self.unknown)
+        for start in range(0, len(references), self.chunk_size):
+            chunk = references[start:start + self.chunk_size]
+            statuses = dict(Payment.objects.filter(qr_reference__in=chunk).values_list('qr_reference', 'status'))
+            for reference in chunk:
+                status = statuses.get(reference)
+                if status == 'completed':
+                    self.result.already_settled += 1
+                elif status is None:
+                    self._mismatch(self.unknown[reference], reference, "Referencia desconocida")
+                else:
+                    self._mismatch(self.unknown[reference], reference, f"El pago está {status}")
+        self.result.mismatches.sort()
+
+
+def reconcile(rows, **options):
+    return Reconciler(**options).run(rows)
@@ -1,3 +1,207 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import User
+from orders.models import Order, OrderStatusHistory
+
+from . import qr
+from .models import Payment, PaymentHistory
+from .provider import FakeBankProvider
+from .settlement import reconcile
+from .views import PaymentViewSet
+
+
+class PaymentQRTests(TestCase):
+    """El QR se sirve como imagen cacheada; los payloads de pago solo llevan su URL"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='cliente@example.com', password='x', role='CUSTOMER')
+        self.order = Order.objects.create(
+            client=self.user,
+            delivery_latitude='-17.783300',
+            delivery_longitude='-63.182100',
+            subtotal=Decimal('90.00'),
+            delivery_fee=Decimal('10.00'),
+        )
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root, ignore_errors=True)
+        patcher = mock.patch.object(qr, '_cache', qr.QRCache(self.cache_root, size=8))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, actions, method='get', path='/api/payments/', data=None, **kwargs):
+        request = getattr(APIRequestFactory(), method)(path, data, format='json')
+        force_authenticate(request, user=self.user)
+        return PaymentViewSet.as_view(actions)(request, **kwargs)
+
+    def test_payment_payloads_carry_qr_urls(self):
+        response = self.call({'post': 'create_qr'}, 'post', '/api/payments/create_qr/', {'order_id': self.order.id})
+        self.assertEqual(response.status_code, 201)
+        reference = response.data['qr_reference']
+        self.assertEqual(response.data['qr_code'], f'http://testserver/media/qr/{reference}.png')
+        self.assertEqual(response.data['qr_code_svg'], f'http://testserver/media/qr/{reference}.svg')
+        self.assertEqual(Payment.objects.get().qr_code, '')
+
+        with CaptureQueriesContext(connection) as queries:
+            detail = self.call({'get': 'retrieve'}, pk=response.data['id'])
+        self.assertEqual(detail.status_code, 200)
+        self.assertFalse([q for q in queries if '"qr_code"' in q['sql']])
+
+    def test_image_is_rendered_once_and_immutable(self):
+        payment = Payment.objects.create(order=self.order, amount=self.order.total, qr_reference='QR-ABC123')
+        url = '/media/qr/QR-ABC123.png'
+
+        with mock.patch.object(qr, 'render_qr', wraps=qr.render_qr) as render:
+            response = self.client.get(url)
+            self.assertEqual(self.client.get(url).content, response.content)
+            # Otro proceso (LRU vacío) lo lee del disco sin volver a dibujarlo
+            qr.get_cache().clear()
+            self.assertEqual(self.client.get(url).content, response.content)
+        render.assert_called_once_with(qr.qr_data(payment.qr_reference, payment.amount, self.order.order_number), 'png')
+
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        svg = self.client.get('/media/qr/QR-ABC123.svg')
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+
+        self.assertEqual(self.client.get('/media/qr/QR-OTRO.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/qr/QR-ABC123.gif').status_code, 404)
+
+    def test_simulated_confirm_only_in_simulation(self):
+        payment = Payment.objects.create(order=self.order, amount=self.order.total, qr_reference='QR-SIM')
+
+        def confirm():
+            return self.call({'post': 'confirm'}, 'post', f'/api/payments/{payment.id}/confirm/', {}, pk=payment.id)
+
+        for overrides in ({'PAYMENT_SIMULATION': False},
+                          {'PAYMENT_SIMULATION': True, 'PAYMENT_WEBHOOK_SECRET': 'secreto'}):
+            with override_settings(**overrides):
+                self.assertEqual(confirm().status_code, 404)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+        with override_settings(PAYMENT_SIMULATION=True, PAYMENT_WEBHOOK_SECRET=''):
+            self.assertEqual(confirm().status_code, 200)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRET='secreto-de-prueba')
+class PaymentSettlementTests(TestCase):
+    """Pagos reales: webhook firmado e idempotente y conciliación del extracto por lotes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='cliente@example.com', password='x', role='CUSTOMER')
+        self.payments = [self.create_payment(index) for index in range(5)]
+        self.bank = FakeBankProvider()
+
+    def create_payment(self, index):
+        order = Order.objects.create(
+            client=self.user,
+            delivery_latitude='-17.783300',
+            delivery_longitude='-63.182100',
+            subtotal=Decimal('50.00') + index,
+            delivery_fee=Decimal('10.00'),
+        )
+        return Payment.objects.create(order=order, amount=order.total, qr_reference=f'QR-{index:04d}')
+
+    def post_webhook(self, body, headers):
+        return self.client.post(
+            '/api/payments/webhook/', body, content_type='application/json',
+            **{f'HTTP_{name.upper().replace("-", "_")}': value for name, value in headers.items()},
+        )
+
+    def test_webhook_confirms_once(self):
+        payment = self.payments[0]
+        body, headers = self.bank.webhook(self.bank.transaction(payment, transaction_id='TX-1'))
+
+        response = self.post_webhook(body, headers)
+        self.assertEqual(response.status_code, 200)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.transaction_id), ('completed', 'TX-1'))
+        self.assertEqual(payment.order.status, 'confirmed')
+
+        # Reintento del banco: 200 sin volver a acreditar
+        self.assertEqual(self.post_webhook(body, headers).json(), {'message': 'Evento ya procesado'})
+        self.assertEqual(PaymentHistory.objects.filter(payment=payment).count(), 1)
+        self.assertEqual(OrderStatusHistory.objects.filter(order=payment.order).count(), 1)
+
+    def test_webhook_for_payment_settled_elsewhere_is_acknowledged(self):
+        payment = self.payments[0]
+        reconcile(iter([self.bank.transaction(payment, transaction_id='TX-STATEMENT')]))
+
+        # El banco manda el evento con otro id de transacción: 200 para que no reintente
+        response = self.post_webhook(*self.bank.webhook(self.bank.transaction(payment, transaction_id='TX-WEB')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'message': 'Evento ya procesado'})
+        payment.refresh_from_db()
+        self.assertEqual(payment.transaction_id, 'TX-STATEMENT')
+        self.assertEqual(PaymentHistory.objects.filter(payment=payment).count(), 1)
+
+    def test_webhook_rejects_bad_signature_and_amount(self):
+        payment = self.payments[0]
+        body, headers = self.bank.webhook(self.bank.transaction(payment))
+        _, other_secret = FakeBankProvider('otro').webhook(self.bank.transaction(payment))
+        _, expired = self.bank.webhook(self.bank.transaction(payment), timestamp=1)
+        wrong_amount = self.bank.webhook(self.bank.transaction(payment, amount='1.00'))
+
+        with self.assertLogs('payments.views', 'WARNING'):
+            self.assertEqual(self.post_webhook(body + b' ', headers).status_code, 401)
+            self.assertEqual(self.post_webhook(body, other_secret).status_code, 401)
+            self.assertEqual(self.post_webhook(body, expired).status_code, 401)
+            self.assertEqual(self.post_webhook(*wrong_amount).status_code, 422)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_reconcile_statement_in_batches(self):
+        first, second, third, fourth, _ = self.payments
+        # Uno ya acreditado por webhook antes de la conciliación
+        self.post_webhook(*self.bank.webhook(self.bank.transaction(first, transaction_id='TX-WEB')))
+
+        statement = io.StringIO()
+        self.bank.write_statement(statement, [
+            self.bank.transaction(first, transaction_id='TX-STATEMENT'),
+            self.bank.transaction(second),
+            self.bank.transaction(third),
+            self.bank.transaction(fourth, amount='1.00'),
+            {'reference': 'QR-DESCONOCIDO', 'transaction_id': 'TX-X', 'amount': '10.00'},
+        ])
+        path = os.path.join(tempfile.mkdtemp(), 'extracto.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w', newline='') as fh:
+            fh.write(statement.getvalue())
+
+        with CaptureQueriesContext(connection) as queries:
+            out, err = io.StringIO(), io.StringIO()
+            call_command('reconcile_payments', path, '--chunk-size', '2', stdout=out, stderr=err)
+        self.assertIn('2 acreditados, 1 ya acreditados, 2 diferencias, 2 pagos pendientes sin movimiento', out.getvalue())
+        self.assertIn('Monto distinto', err.getvalue())
+        self.assertIn('Referencia desconocida', err.getvalue())
+        # Un solo SELECT de pagos pendientes para armar el índice, no uno por fila
+        self.assertEqual(len([q for q in queries if 'WHERE "payments"."status" = \'pending\'' in q['sql']]), 1)
+
+        statuses = dict(Payment.objects.values_list('qr_reference', 'status'))
+        self.assertEqual(
+            statuses, {'QR-0000': 'completed', 'QR-0001': 'completed', 'QR-0002': 'completed',
+                       'QR-0003': 'pending', 'QR-0004': 'pending'},
+        )
+        self.assertEqual(Order.objects.filter(status='confirmed').count(), 3)
+        self.assertEqual(Payment.objects.get(qr_reference='QR-0000').transaction_id, 'TX-WEB')
+
+        # Correr de nuevo no acredita nada
+        result = reconcile(iter([self.bank.transaction(second)]))
+        self.assertEqual((result.matched, result.already_settled), (0, 1))
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PaymentViewSet
+from .views import PaymentViewSet, payment_webhook
 
 router = DefaultRouter()
 router.register(r'payments', PaymentViewSet, basename='payment')
 
 urlpatterns = [
+    # Antes del router: 'webhook' no es un id de pago
+    path('payments/webhook/', payment_webhook, name='payment-webhook'),
     path('', include(router.urls)),
 ]
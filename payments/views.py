@@ -2,10 +2,13 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import qrcode
-from io import BytesIO
-import base64
+import logging
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
 
 from .models import Payment, PaymentHistory
 from .serializers import (
@@ -13,18 +16,26 @@ from .serializers import (
     PaymentListSerializer,
     PaymentCreateSerializer,
 )
+from .qr import CONTENT_TYPES, get_cache, qr_data
+from .webhooks import SIGNATURE_HEADER, WebhookError, process_event, verify
 from orders.models import Order
 
+logger = logging.getLogger(__name__)
+
 
 class PaymentViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestión de pagos con código QR (simulado)
     
     - create: Crear pago y generar QR
-    - confirm: Confirmar pago (cambios automáticos)
+    - confirm: Confirmar pago simulado (solo con PAYMENT_SIMULATION)
+    
+    Los pagos reales se acreditan con el webhook del banco (payment_webhook)
+    o conciliando el extracto (manage.py reconcile_payments)
     """
     
-    queryset = Payment.objects.select_related('order').prefetch_related('history')
+    # qr_code (base64 de pagos viejos) ya no se serializa: no se lee de la BD
+    queryset = Payment.objects.select_related('order').prefetch_related('history').defer('qr_code')
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
     
@@ -59,7 +70,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
             "id": 1,
             "order": 1,
             "amount": 100.00,
-            "qr_code": "data:image/png;base64,...",
+            "qr_code": "https://.../media/qr/QR-ABC123DEF456.png",
+            "qr_code_svg": "https://.../media/qr/QR-ABC123DEF456.svg",
             "qr_reference": "QR-ABC123DEF456",
             "status": "pending"
         }
@@ -91,7 +103,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Crear pago
+        # Crear pago (la imagen del QR se genera al pedirla: payment_qr)
         qr_reference = Payment.generate_qr_reference()
         payment = Payment.objects.create(
             order=order,
@@ -100,10 +112,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
             status='pending'
         )
         
-        # Generar código QR (simulado)
-        payment.qr_code = self._generate_qr_code(payment)
-        payment.save()
-        
         # Registrar en historial
         PaymentHistory.objects.create(
             payment=payment,
@@ -113,7 +121,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         )
         
         return Response(
-            PaymentSerializer(payment).data,
+            PaymentSerializer(payment, context=self.get_serializer_context()).data,
             status=status.HTTP_201_CREATED
         )
     
@@ -128,7 +136,13 @@ class PaymentViewSet(viewsets.ModelViewSet):
         Cambios automáticos:
         - Payment status: pending → completed
         - Order status: pending → confirmed
+        
+        Solo con PAYMENT_SIMULATION y sin PAYMENT_WEBHOOK_SECRET: con el
+        banco real los pagos se acreditan por webhook o conciliación
         """
+        if not settings.PAYMENT_SIMULATION or settings.PAYMENT_WEBHOOK_SECRET:
+            raise Http404("Pago simulado deshabilitado")
+        
         payment = self.get_object()
         
         # Validar que sea del cliente
@@ -179,38 +193,60 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return Response(
             {
                 'message': '✅ Pago confirmado - Pedido confirmado',
-                'payment': PaymentSerializer(payment).data,
+                'payment': PaymentSerializer(payment, context=self.get_serializer_context()).data,
                 'order_status': order.get_status_display()
             },
             status=status.HTTP_200_OK
         )
-    
-    @staticmethod
-    def _generate_qr_code(payment):
-        """Generar QR visual (solo para MVP)"""
-        try:
-            # Datos del QR
-            qr_data = f"PAGO|{payment.qr_reference}|Bs.{payment.amount}|{payment.order.order_number}"
-            
-            # Crear QR
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            # Convertir a imagen
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convertir a base64
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            return f"data:image/png;base64,{img_str}"
-        except Exception as e:
-            print(f"Error generando QR: {e}")
-            return ""
+
+
+# -------------------------------------------------------
+# Imagen del QR de pago
+# -------------------------------------------------------
+@require_safe
+def payment_qr(request, reference, fmt):
+    """
+    Sirve la imagen del QR de un pago (PNG o SVG)
+
+    La referencia es aleatoria y su contenido (monto y pedido) no cambia,
+    así que la respuesta es inmutable
+    """
+    if fmt not in CONTENT_TYPES:
+        raise Http404("Formato no soportado")
+    row = Payment.objects.filter(qr_reference=reference).values_list('amount', 'order__order_number').first()
+    if row is None:
+        raise Http404("Pago no encontrado")
+
+    image, key = get_cache().get(qr_data(reference, *row), fmt)
+    etag = f'"{key[:16]}-{fmt}"'
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(image, content_type=CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# -------------------------------------------------------
+# Webhook del banco
+# -------------------------------------------------------
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    """
+    Endpoint: POST /api/payments/webhook/
+    Acredita un pago por qr_reference/transaction_id (firmado, idempotente)
+    """
+    secret = settings.PAYMENT_WEBHOOK_SECRET
+    if not secret:
+        raise Http404("Webhook no configurado")
+    body = request.body
+    try:
+        verify(body, request.META.get(SIGNATURE_HEADER, ''), secret)
+        code, message = process_event(body)
+    except WebhookError as exc:
+        logger.warning("Webhook de pago rechazado", extra={'reason': str(exc), 'status': exc.status})
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    logger.info("Webhook de pago", extra={'result': message})
+    return JsonResponse({'message': message}, status=code)
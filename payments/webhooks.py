@@ -0,0 +1,117 @@
+# payments/webhooks.py
+"""
+Webhook de pagos del banco/proveedor QR
+
+El proveedor hace POST con un JSON
+    {"reference": "QR-...", "transaction_id": "...", "amount": "100.00", "status": "completed"}
+y el header
+    X-Payment-Signature: t=<unix>,v1=<hex HMAC-SHA256(secreto, "<t>.<body>")>
+
+- La firma se verifica sobre el body crudo, con un margen de
+  PAYMENT_WEBHOOK_TOLERANCE segundos para no aceptar reenvíos viejos
+- Es idempotente: el proveedor reintenta hasta recibir 2xx, y un evento
+  con un transaction_id ya aplicado o sobre un pago ya completado responde
+  200 sin volver a acreditar
+"""
+
+import hashlib
+import hmac
+import json
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Payment, PaymentHistory
+from .settlement import parse_amount, settle
+
+SIGNATURE_HEADER = 'HTTP_X_PAYMENT_SIGNATURE'
+
+
+class WebhookError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def sign(body, secret, timestamp=None):
+    """Valor del header X-Payment-Signature para `body` (bytes)"""
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def verify(body, header, secret, tolerance=None, now=None):
+    tolerance = settings.PAYMENT_WEBHOOK_TOLERANCE if tolerance is None else tolerance
+    now = time.time() if now is None else now
+    try:
+        parts = dict(item.split('=', 1) for item in header.split(','))
+        timestamp = int(parts['t'])
+        received = parts['v1']
+    except (KeyError, ValueError):
+        raise WebhookError("Firma ausente o mal formada", status=401)
+    if abs(now - timestamp) > tolerance:
+        raise WebhookError("Firma vencida", status=401)
+    expected = sign(body, secret, timestamp).rsplit('=', 1)[1]
+    if not hmac.compare_digest(expected, received):
+        raise WebhookError("Firma inválida", status=401)
+
+
+def parse_event(body):
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise WebhookError("JSON inválido")
+    if not isinstance(event, dict):
+        raise WebhookError("JSON inválido")
+    reference = str(event.get('reference') or '').strip()
+    transaction_id = str(event.get('transaction_id') or '').strip()
+    amount = parse_amount(event.get('amount', ''))
+    status = event.get('status', 'completed')
+    if not reference or not transaction_id or amount is None:
+        raise WebhookError("Faltan reference, transaction_id o amount")
+    if status not in ('completed', 'failed'):
+        raise WebhookError(f"Estado no soportado: {status}")
+    return reference, transaction_id, amount, status
+
+
+def process_event(body):
+    """
+    Aplicar un evento del proveedor
+
+    Returns:
+        (código HTTP, mensaje)
+    """
+    reference, transaction_id, amount, status = parse_event(body)
+
+    existing = Payment.objects.filter(transaction_id=transaction_id).values_list('qr_reference', flat=True).first()
+    if existing is not None:
+        if existing != reference:
+            raise WebhookError("La transacción ya se aplicó a otro pago", status=409)
+        return 200, "Evento ya procesado"
+
+    payment = Payment.objects.filter(qr_reference=reference).only('id', 'amount', 'status').first()
+    if payment is None:
+        raise WebhookError("Pago no encontrado", status=404)
+    if payment.status == 'completed':
+        # Acreditado por otra vía (conciliación, pago simulado): el banco no debe reintentar
+        return 200, "Evento ya procesado"
+    if payment.status != 'pending':
+        raise WebhookError(f"El pago ya está {payment.get_status_display()}", status=409)
+    if amount != payment.amount:
+        raise WebhookError(f"Monto distinto: evento Bs. {amount}, pago Bs. {payment.amount}", status=422)
+
+    if status == 'failed':
+        updated = Payment.objects.filter(id=payment.id, status='pending').update(
+            status='failed', transaction_id=transaction_id, updated_at=timezone.now()
+        )
+        if updated:
+            PaymentHistory.objects.create(
+                payment_id=payment.id, old_status='pending', new_status='failed', notes='Rechazado por el banco'
+            )
+        return 200, "Pago rechazado"
+
+    if not settle({payment.id: transaction_id}, notes='Confirmado por webhook del banco'):
+        # Otro proceso (conciliación u otro reintento) lo completó en el medio
+        return 200, "Evento ya procesado"
+    return 200, "Pago confirmado"
@@ -1,11 +1,8 @@
 #!/usr/bin/env bash
 set -o errexit
 
-# 1. Ejecutar la Migración
-python manage.py migrate --no-input
+# 1. Migraciones pendientes + menú inicial (se omite si no cambió), en un solo proceso
+python manage.py prestart
 
-echo "Cargando datos iniciales de prueba usando runscript..."
-python manage.py runscript load_menu 
-
-
-gunicorn --bind 0.0.0.0:$PORT config.wsgi:application
\ No newline at end of file
+# 2. --preload: la app se importa una vez en el master y los workers la heredan
+gunicorn --preload --bind 0.0.0.0:$PORT config.wsgi:application